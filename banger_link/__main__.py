@@ -15,13 +15,23 @@ from banger_link.handlers.commands import register_commands
 from banger_link.handlers.inline import inline_query_handler
 from banger_link.handlers.messages import message_handler
 from banger_link.health import HealthServer
+from banger_link.jobs.dedupe import schedule_dedupe
 from banger_link.jobs.digests import schedule_digests
+from banger_link.jobs.refresh import schedule_refresh
+from banger_link.services.circuit import CircuitBreaker
 from banger_link.services.fallback_resolver import (
+    FALLBACK_PLATFORMS,
     FallbackResolver,
     ITunesSearchClient,
     SpotifyAnonymousClient,
     YouTubeSearchClient,
 )
+from banger_link.services.hedge import Hedger
+from banger_link.services.quota import QuotaLedger
+from banger_link.services.ratelimit import RateLimiter
+from banger_link.services.resolution_cache import MemoryResolutionCache, ResolutionCache
+from banger_link.services.scheduler import Priority, WorkScheduler
+from banger_link.services.search_cache import SearchCache, SearchTTL
 from banger_link.services.songlink import SonglinkClient
 
 logger = logging.getLogger(__name__)
@@ -42,18 +52,98 @@ def _configure_logging() -> None:
         logging.getLogger(noisy).setLevel(logging.INFO)
 
 
+def _scheduler(capacity: int) -> WorkScheduler:
+    background = settings.background_concurrency
+    return WorkScheduler(
+        capacity=capacity,
+        limits={Priority.REFRESH: background, Priority.IMPORT: background},
+    )
+
+
 async def _on_startup(application: Application) -> None:
-    db = await Database(settings.db_path).connect()
+    db = await Database(
+        settings.db_path,
+        write_batch_size=settings.db_write_batch_size,
+        write_batch_latency=settings.db_write_batch_latency_ms / 1000,
+        read_pool_size=settings.db_read_pool_size,
+    ).connect()
     repo = Repo(db)
-    songlink = SonglinkClient()
+    resolution_cache = ResolutionCache(
+        repo,
+        ttl_seconds=settings.songlink_cache_ttl_hours * 3600,
+        negative_ttl_seconds=settings.songlink_negative_cache_ttl_hours * 3600,
+        memory=MemoryResolutionCache(
+            max_entries=settings.resolution_memory_cache_entries,
+            max_bytes=int(settings.resolution_memory_cache_mb * 1024 * 1024),
+            ttl_seconds=settings.resolution_memory_cache_ttl_seconds,
+            negative_ttl_seconds=settings.resolution_memory_negative_ttl_seconds,
+        ),
+    )
+    await resolution_cache.prune()
+    songlink = SonglinkClient(
+        cache=resolution_cache,
+        limiter=RateLimiter(
+            rate=settings.songlink_rate_per_minute / 60, burst=settings.songlink_burst
+        ),
+        breaker=CircuitBreaker(
+            name="songlink",
+            failure_threshold=settings.songlink_circuit_failure_threshold,
+            reset_timeout=settings.songlink_circuit_reset_seconds,
+        ),
+        hedger=Hedger(
+            percentile=settings.songlink_hedge_percentile,
+            budget_fraction=settings.songlink_hedge_budget,
+        )
+        if settings.songlink_hedge_budget > 0
+        else None,
+        scheduler=_scheduler(settings.songlink_concurrency),
+    )
+    search_cache = SearchCache(
+        repo,
+        default_ttl=SearchTTL(
+            positive=settings.fallback_cache_ttl_hours * 3600,
+            negative=settings.fallback_negative_cache_ttl_hours * 3600,
+        ),
+        platform_ttls={
+            "youtube": SearchTTL(
+                positive=settings.youtube_cache_ttl_hours * 3600,
+                negative=settings.youtube_negative_cache_ttl_hours * 3600,
+            )
+        },
+    )
+    await search_cache.prune()
+    spotify = SpotifyAnonymousClient(cache=search_cache, token_path=settings.spotify_token_path)
+    spotify.start()
+    youtube_quota = QuotaLedger(
+        repo,
+        provider="youtube",
+        daily_budget=settings.youtube_daily_quota,
+        live_reserve=min(settings.youtube_live_reserve, settings.youtube_daily_quota),
+    )
+    await youtube_quota.load()
     fallback = FallbackResolver(
-        spotify=SpotifyAnonymousClient(),
-        itunes=ITunesSearchClient(country=settings.fallback_user_country),
-        youtube=YouTubeSearchClient(api_key=settings.youtube_api_key),
+        spotify=spotify,
+        itunes=ITunesSearchClient(country=settings.fallback_user_country, cache=search_cache),
+        youtube=YouTubeSearchClient(
+            api_key=settings.youtube_api_key, cache=search_cache, quota=youtube_quota
+        ),
+        schedulers={
+            platform: _scheduler(settings.fallback_concurrency) for platform in FALLBACK_PLATFORMS
+        },
+        catalog=repo,
     )
     _state.install(application, repo=repo, songlink=songlink, fallback=fallback)
 
-    health = HealthServer(db, port=settings.health_port)
+    health = HealthServer(
+        db,
+        port=settings.health_port,
+        reporters={
+            "songlink": songlink.stats,
+            "fallback": fallback.stats,
+            "search_cache": search_cache.stats,
+            "db": db.stats,
+        },
+    )
     await health.start()
 
     application.bot_data[LIFECYCLE_KEY_DB] = db
@@ -61,6 +151,8 @@ async def _on_startup(application: Application) -> None:
 
     await register_commands(application)
     schedule_digests(application)
+    schedule_refresh(application)
+    schedule_dedupe(application)
     logger.info("Banger Link is up and running.")
 
 
@@ -0,0 +1,245 @@
+"""Canonical form of music share URLs, used as cache and dedupe keys.
+
+The same track reaches us under many spellings: `open.spotify.com/intl-de/
+track/X?si=abc`, `open.spotify.com/track/X` and `spotify:track:X` are one
+song, as are `youtu.be/ID`, `youtube.com/watch?v=ID&t=30` and
+`music.youtube.com/watch?v=ID`. Every cache keyed by the raw link would see
+those as different entries, so `canonicalize` folds them into one stable URL
+that is still a valid link to hand to Songlink.
+
+Platforms with a known URL scheme get a dedicated rule that rebuilds the URL
+from the IDs it carries and drops everything else (locale prefixes, share
+tracking, timestamps). Anything else gets the generic treatment: lowercase
+host, https, no fragment, no known tracking parameters, sorted query.
+
+`extract_platform_id` goes one step further for track links and pulls out the
+platform's own ID, which is what the local `(platform, native_id) → song`
+index is keyed by.
+"""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Callable
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Domains we'll send to Songlink. We keep this list narrow so we don't waste
+# requests (and risk rate-limiting) on unrelated links.
+MUSIC_DOMAIN_SUFFIXES: tuple[str, ...] = (
+    "spotify.com",
+    "music.apple.com",
+    "youtube.com",
+    "youtu.be",
+    "music.youtube.com",
+    "tidal.com",
+    "deezer.com",
+    "soundcloud.com",
+    "music.amazon.com",
+    "music.amazon.co.uk",
+    "music.amazon.de",
+    "pandora.com",
+    "anghami.com",
+    "audiomack.com",
+    "boomplay.com",
+    "music.yandex.com",
+    "music.yandex.ru",
+    "napster.com",
+    "song.link",
+)
+
+# Query parameters that only carry share attribution or playback position.
+TRACKING_PARAMS: frozenset[str] = frozenset(
+    {
+        "si",
+        "feature",
+        "pp",
+        "t",
+        "start",
+        "context",
+        "nd",
+        "dl_branch",
+        "_branch_match_id",
+        "_branch_referrer",
+        "fbclid",
+        "gclid",
+        "igshid",
+        "ref",
+        "ref_src",
+        "ls",
+        "app",
+        "uo",
+        "utm_source",
+        "utm_medium",
+        "utm_campaign",
+        "utm_content",
+        "utm_term",
+    }
+)
+
+SPOTIFY_URI_RE = re.compile(
+    r"^spotify:(track|album|artist|playlist|episode|show):([A-Za-z0-9]+)$", re.IGNORECASE
+)
+_SPOTIFY_KINDS = frozenset({"track", "album", "artist", "playlist", "episode", "show"})
+_SPOTIFY_LOCALE_RE = re.compile(r"^intl-[a-z]{2}(-[a-z]{2})?$", re.IGNORECASE)
+_YOUTUBE_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+_YOUTUBE_PATH_KINDS = frozenset({"shorts", "embed", "live", "v"})
+_DEEZER_KINDS = frozenset({"track", "album", "artist", "playlist"})
+_TIDAL_KINDS = frozenset({"track", "album", "artist", "playlist", "video"})
+
+_TRACK_ID_PATTERNS: tuple[tuple[str, re.Pattern[str]], ...] = (
+    ("spotify", re.compile(r"^https://open\.spotify\.com/track/([A-Za-z0-9]+)$")),
+    # YouTube and YouTube Music share video IDs, so they share a namespace.
+    ("youtube", re.compile(r"^https://www\.youtube\.com/watch\?v=([A-Za-z0-9_-]{11})$")),
+    ("appleMusic", re.compile(r"^https://music\.apple\.com/[a-z]{2}/album/\d+\?i=(\d+)$")),
+    ("appleMusic", re.compile(r"^https://music\.apple\.com/[a-z]{2}/song/(\d+)$")),
+    ("deezer", re.compile(r"^https://www\.deezer\.com/track/(\d+)$")),
+    ("tidal", re.compile(r"^https://tidal\.com/track/(\d+)$")),
+    ("amazonMusic", re.compile(r"^https://music\.amazon\.[a-z.]+/albums/\w+\?trackAsin=(\w+)$")),
+)
+
+
+def _host_matches(host: str, domain: str) -> bool:
+    return host == domain or host.endswith("." + domain)
+
+
+def is_music_url(url: str) -> bool:
+    try:
+        host = (urlsplit(url).hostname or "").lower()
+    except ValueError:
+        return False
+    return bool(host) and any(_host_matches(host, d) for d in MUSIC_DOMAIN_SUFFIXES)
+
+
+def _segments(path: str) -> list[str]:
+    return [p for p in path.split("/") if p]
+
+
+def _spotify(host: str, segments: list[str], query: dict[str, str]) -> str | None:
+    if host not in ("open.spotify.com", "play.spotify.com"):
+        return None
+    segments = [s for s in segments if not _SPOTIFY_LOCALE_RE.match(s) and s != "embed"]
+    if len(segments) >= 2 and segments[0].lower() in _SPOTIFY_KINDS:
+        return f"https://open.spotify.com/{segments[0].lower()}/{segments[1]}"
+    return None
+
+
+def _youtube(host: str, segments: list[str], query: dict[str, str]) -> str | None:
+    video_id: str | None = None
+    if host == "youtu.be":
+        video_id = segments[0] if segments else None
+    elif _host_matches(host, "youtube.com"):
+        if segments == ["watch"]:
+            video_id = query.get("v")
+        elif len(segments) >= 2 and segments[0] in _YOUTUBE_PATH_KINDS:
+            video_id = segments[1]
+    if video_id and _YOUTUBE_ID_RE.match(video_id):
+        return f"https://www.youtube.com/watch?v={video_id}"
+    return None
+
+
+def _apple_music(host: str, segments: list[str], query: dict[str, str]) -> str | None:
+    # /{storefront}/{album|song|...}/{slug}/{id}[?i={track id}] — the slug is
+    # decoration, the storefront matters for regional availability. Songlink
+    # hands out geo.music.apple.com links; they're the same catalog.
+    if not _host_matches(host, "music.apple.com"):
+        return None
+    if len(segments) < 3 or not segments[-1].isdigit():
+        return None
+    storefront, kind, native_id = segments[0].lower(), segments[1].lower(), segments[-1]
+    url = f"https://music.apple.com/{storefront}/{kind}/{native_id}"
+    if (track := query.get("i")) and track.isdigit():
+        url += f"?i={track}"
+    return url
+
+
+def _deezer(host: str, segments: list[str], query: dict[str, str]) -> str | None:
+    if not _host_matches(host, "deezer.com"):
+        return None
+    # Drop the UI language prefix: /en/track/1 → /track/1.
+    if segments and segments[0].lower() not in _DEEZER_KINDS:
+        segments = segments[1:]
+    if len(segments) >= 2 and segments[0].lower() in _DEEZER_KINDS and segments[1].isdigit():
+        return f"https://www.deezer.com/{segments[0].lower()}/{segments[1]}"
+    return None
+
+
+def _tidal(host: str, segments: list[str], query: dict[str, str]) -> str | None:
+    if not _host_matches(host, "tidal.com"):
+        return None
+    if segments and segments[0] == "browse":
+        segments = segments[1:]
+    if len(segments) >= 2 and segments[0].lower() in _TIDAL_KINDS:
+        return f"https://tidal.com/{segments[0].lower()}/{segments[1]}"
+    return None
+
+
+def _soundcloud(host: str, segments: list[str], query: dict[str, str]) -> str | None:
+    if host not in ("soundcloud.com", "m.soundcloud.com", "www.soundcloud.com"):
+        return None
+    if not segments:
+        return None
+    return "https://soundcloud.com/" + "/".join(segments)
+
+
+_RULES: tuple[Callable[[str, list[str], dict[str, str]], str | None], ...] = (
+    _spotify,
+    _youtube,
+    _apple_music,
+    _deezer,
+    _tidal,
+    _soundcloud,
+)
+
+
+def canonicalize(url: str) -> str:
+    """Return the canonical form of a share URL.
+
+    Idempotent, and never raises: input that doesn't parse as a URL is
+    returned stripped but otherwise untouched.
+    """
+    url = url.strip()
+    if match := SPOTIFY_URI_RE.match(url):
+        return f"https://open.spotify.com/{match.group(1).lower()}/{match.group(2)}"
+
+    try:
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+    except ValueError:
+        return url
+    if parts.scheme.lower() not in ("http", "https") or not host:
+        return url
+
+    segments = _segments(parts.path)
+    query = dict(parse_qsl(parts.query))
+    for rule in _RULES:
+        if (canonical := rule(host, segments, query)) is not None:
+            return canonical
+
+    kept = sorted((k, v) for k, v in parse_qsl(parts.query) if k.lower() not in TRACKING_PARAMS)
+    if parts.port is not None:
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip("/")
+    return urlunsplit(("https", host, path, urlencode(kept), ""))
+
+
+def extract_platform_id(url: str) -> tuple[str, str] | None:
+    """`(platform, native_id)` for a link to a single track, or None.
+
+    Album, playlist and artist links deliberately return None — they don't
+    identify one song.
+    """
+    canonical = canonicalize(url)
+    for platform, pattern in _TRACK_ID_PATTERNS:
+        if match := pattern.match(canonical):
+            return platform, match.group(1)
+    if canonical.startswith("https://soundcloud.com/"):
+        segments = _segments(canonical.removeprefix("https://soundcloud.com/"))
+        # /{artist}/{track}; /{artist}/sets/{playlist} and friends are not tracks.
+        if len(segments) == 2 and segments[1] not in ("sets", "albums", "tracks", "likes"):
+            return "soundcloud", "/".join(segments).lower()
+    return None
+
+
+def platform_ids(links: dict[str, str]) -> set[tuple[str, str]]:
+    """Every `(platform, native_id)` that the given platform links identify."""
+    return {key for url in links.values() if (key := extract_platform_id(url)) is not None}
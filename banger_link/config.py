@@ -28,14 +28,91 @@ class Settings(BaseSettings):
     log_level: str = "INFO"
     health_port: int = 8080
 
+    # Group commit: the database writer commits up to `db_write_batch_size`
+    # queued writes at once, holding a batch open up to
+    # `db_write_batch_latency_ms` for more to arrive (0 = commit as soon as
+    # the queue is empty).
+    db_write_batch_size: int = 64
+    db_write_batch_latency_ms: float = 0
+    # Read-only connections for leaderboards, search and lookups, which then
+    # run alongside the writer instead of queueing behind it.
+    db_read_pool_size: int = 4
+
     songlink_api_url: HttpUrl = HttpUrl("https://api.song.link/v1-alpha.1/links")
+    # Token bucket shared by every Songlink request. The free tier allows about
+    # ten requests a minute; the limiter halves its rate on each 429 and
+    # creeps back up to this ceiling as requests succeed.
+    songlink_rate_per_minute: float = 10.0
+    songlink_burst: int = 3
+    # Consecutive Songlink failures (timeouts, 5xx) before we stop calling it,
+    # and how long to wait before probing again.
+    songlink_circuit_failure_threshold: int = 5
+    songlink_circuit_reset_seconds: float = 30.0
+    # Hedged requests: when a Songlink call is slower than this percentile of
+    # recent ones, race a second copy. The budget caps hedges at that fraction
+    # of extra traffic; 0 turns hedging off.
+    songlink_hedge_percentile: float = 0.95
+    songlink_hedge_budget: float = 0.05
+    # How long a resolved URL is served from the SQLite resolution cache before
+    # we ask Songlink again. Negative entries (404s, podcasts) expire sooner so
+    # catalog additions on Songlink's side eventually show up.
+    songlink_cache_ttl_hours: float = 24 * 7
+    songlink_negative_cache_ttl_hours: float = 24
+    # In-process LRU in front of the SQLite cache. Bounded by both entry count
+    # and an estimated memory budget, whichever is hit first.
+    resolution_memory_cache_entries: int = 4096
+    resolution_memory_cache_mb: float = 16.0
+    resolution_memory_cache_ttl_seconds: float = 3600
+    resolution_memory_negative_ttl_seconds: float = 300
 
     # YouTube Data API key — optional; when missing, the YouTube fallback is a
     # no-op and YouTube links remain blank for songs Songlink doesn't find.
     youtube_api_key: str | None = None
+    # Daily YouTube Data API units (Google's default grant is 10,000; every
+    # search costs 100). The song refresh and imports stop searching once
+    # only `youtube_live_reserve` is left, keeping that for live shares.
+    youtube_daily_quota: int = 10_000
+    youtube_live_reserve: int = 5_000
     # Country code for the iTunes Search fallback. Doesn't impact rankings much
     # but does affect availability for region-locked tracks.
     fallback_user_country: str = "US"
+    # How long fallback search answers are cached, found and not found.
+    # YouTube gets its own, longer TTLs: each search costs 100 units of the
+    # free 10,000-unit daily quota.
+    fallback_cache_ttl_hours: float = 24 * 7
+    fallback_negative_cache_ttl_hours: float = 24
+    youtube_cache_ttl_hours: float = 24 * 30
+    youtube_negative_cache_ttl_hours: float = 24 * 7
+    # Replies go out as soon as Songlink answers; the fallback searches run
+    # afterwards and edit the reply in place. This bounds how long they may take.
+    fallback_fill_timeout_seconds: float = 20.0
+
+    # Every share gets a reply (or is dropped) within this many seconds. The
+    # lookup stages shrink their timeouts and retries to fit, leaving
+    # `reply_reserve_seconds` of it for sending the reply itself.
+    reply_deadline_seconds: float = 10.0
+    reply_reserve_seconds: float = 2.0
+
+    # Concurrent requests allowed per upstream (Songlink, and each fallback
+    # search provider). Live shares always go first; background work (song
+    # refresh, imports) may use at most `background_concurrency` of them.
+    songlink_concurrency: int = 4
+    fallback_concurrency: int = 4
+    background_concurrency: int = 1
+
+    # Background refresh of stored songs: every `refresh_interval_minutes`,
+    # re-resolve up to `refresh_batch_size` songs whose links are older than
+    # `refresh_stale_days`, or older than `refresh_incomplete_hours` while
+    # still missing one of the expected platforms.
+    refresh_interval_minutes: float = 30
+    refresh_batch_size: int = 20
+    refresh_stale_days: float = 30
+    refresh_incomplete_hours: float = 24
+
+    # How often duplicate songs (sharing a platform track ID that Songlink
+    # returned) are merged into one row. Songs that only share a normalized
+    # title and artist are logged for review, never merged.
+    dedupe_interval_hours: float = 24
 
     digest_timezone: str = "UTC"
     digest_hour: int = 12  # post digests at this local hour
@@ -58,6 +135,10 @@ class Settings(BaseSettings):
     def db_path(self) -> Path:
         return self.data_dir / "banger.db"
 
+    @property
+    def spotify_token_path(self) -> Path:
+        return self.data_dir / "spotify_token.json"
+
     @property
     def digest_post_time(self) -> time:
         return time(hour=self.digest_hour, tzinfo=ZoneInfo(self.digest_timezone))
@@ -1,15 +1,169 @@
 from __future__ import annotations
 
+import json
 import logging
+from collections.abc import Awaitable, Callable
+from contextlib import AbstractAsyncContextManager
 from importlib import resources
 from pathlib import Path
 from typing import Self
 
 import aiosqlite
 
+from banger_link.canonical import platform_ids
+from banger_link.db.pool import ReadPool
+from banger_link.db.writer import Writer
+from banger_link.normalize import normalize_artist, normalize_title
+
 logger = logging.getLogger(__name__)
 
-SCHEMA_VERSION = 1
+SCHEMA_VERSION = 11
+
+# Upgrade scripts for databases created by an older schema.sql, keyed by the
+# version they migrate *to*. Fresh databases get schema.sql directly and skip
+# these entirely, so schema.sql must always describe the latest version.
+_MIGRATIONS: dict[int, str] = {
+    2: """
+    CREATE TABLE IF NOT EXISTS resolution_cache (
+        url             TEXT PRIMARY KEY,
+        payload         TEXT,
+        expires_at      REAL NOT NULL,
+        created_at      TEXT NOT NULL DEFAULT (datetime('now'))
+    );
+    """,
+    3: """
+    CREATE TABLE IF NOT EXISTS song_platform_ids (
+        platform        TEXT NOT NULL,
+        native_id       TEXT NOT NULL,
+        song_id         INTEGER NOT NULL REFERENCES songs(id) ON DELETE CASCADE,
+        PRIMARY KEY (platform, native_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS song_platform_ids_by_song ON song_platform_ids(song_id);
+    """,
+    4: """
+    ALTER TABLE songs ADD COLUMN refreshed_at TEXT;
+    CREATE INDEX IF NOT EXISTS songs_by_freshness ON songs(COALESCE(refreshed_at, created_at));
+    """,
+    5: """
+    CREATE TABLE IF NOT EXISTS search_cache (
+        platform        TEXT NOT NULL,
+        title_key       TEXT NOT NULL,
+        artist_key      TEXT NOT NULL,
+        url             TEXT,
+        expires_at      REAL NOT NULL,
+        created_at      TEXT NOT NULL DEFAULT (datetime('now')),
+        PRIMARY KEY (platform, title_key, artist_key)
+    ) WITHOUT ROWID;
+    """,
+    6: """
+    CREATE TABLE IF NOT EXISTS api_quota (
+        provider        TEXT NOT NULL,
+        day             TEXT NOT NULL,
+        used            INTEGER NOT NULL,
+        PRIMARY KEY (provider, day)
+    ) WITHOUT ROWID;
+    """,
+    7: """
+    ALTER TABLE songs ADD COLUMN title_key TEXT;
+    ALTER TABLE songs ADD COLUMN artist_key TEXT;
+    CREATE INDEX IF NOT EXISTS songs_by_key ON songs(title_key, artist_key);
+    """,
+    8: """
+    CREATE TABLE IF NOT EXISTS song_aliases (
+        entity_id       TEXT PRIMARY KEY,
+        song_id         INTEGER NOT NULL REFERENCES songs(id) ON DELETE CASCADE
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS song_aliases_by_song ON song_aliases(song_id);
+
+    CREATE TABLE IF NOT EXISTS chat_song_aliases (
+        chat_song_id    INTEGER PRIMARY KEY,
+        target_id       INTEGER NOT NULL REFERENCES chat_songs(id) ON DELETE CASCADE
+    );
+    CREATE INDEX IF NOT EXISTS chat_song_aliases_by_target ON chat_song_aliases(target_id);
+    """,
+    9: """
+    ALTER TABLE chat_songs ADD COLUMN likes INTEGER NOT NULL DEFAULT 0;
+    ALTER TABLE chat_songs ADD COLUMN dislikes INTEGER NOT NULL DEFAULT 0;
+    CREATE INDEX IF NOT EXISTS chat_songs_by_score
+        ON chat_songs(chat_id, likes - dislikes DESC, mentions DESC, last_seen_at DESC);
+
+    CREATE TRIGGER IF NOT EXISTS reactions_count_insert AFTER INSERT ON reactions
+    BEGIN
+        UPDATE chat_songs SET
+            likes    = likes    + (NEW.kind = 'like'),
+            dislikes = dislikes + (NEW.kind = 'dislike')
+        WHERE id = NEW.chat_song_id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS reactions_count_delete AFTER DELETE ON reactions
+    BEGIN
+        UPDATE chat_songs SET
+            likes    = likes    - (OLD.kind = 'like'),
+            dislikes = dislikes - (OLD.kind = 'dislike')
+        WHERE id = OLD.chat_song_id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS reactions_count_update AFTER UPDATE OF kind, chat_song_id ON reactions
+    BEGIN
+        UPDATE chat_songs SET
+            likes    = likes    - (OLD.kind = 'like'),
+            dislikes = dislikes - (OLD.kind = 'dislike')
+        WHERE id = OLD.chat_song_id;
+        UPDATE chat_songs SET
+            likes    = likes    + (NEW.kind = 'like'),
+            dislikes = dislikes + (NEW.kind = 'dislike')
+        WHERE id = NEW.chat_song_id;
+    END;
+
+    UPDATE chat_songs SET
+        likes    = (SELECT COUNT(*) FROM reactions r
+                    WHERE r.chat_song_id = chat_songs.id AND r.kind = 'like'),
+        dislikes = (SELECT COUNT(*) FROM reactions r
+                    WHERE r.chat_song_id = chat_songs.id AND r.kind = 'dislike');
+    """,
+    # Existing rows can't tell Songlink's links from fallback guesses. Only
+    # Spotify, Apple Music and YouTube are ever filled by a search, so those
+    # stay unverified until Songlink returns them again (a refresh or a share).
+    10: """
+    ALTER TABLE song_platform_ids ADD COLUMN source TEXT NOT NULL DEFAULT 'songlink'
+        CHECK (source IN ('songlink', 'fallback', 'unverified'));
+    UPDATE song_platform_ids SET source = 'unverified'
+    WHERE platform IN ('spotify', 'appleMusic', 'youtube');
+    """,
+    # Search results used to be keyed by the loose title, so a live take's
+    # link may sit under the studio title. It's only a cache: start over.
+    11: """
+    DELETE FROM search_cache;
+    """,
+}
+
+
+async def _backfill_platform_ids(conn: aiosqlite.Connection) -> None:
+    async with conn.execute("SELECT id, platform_links FROM songs") as cur:
+        rows = await cur.fetchall()
+    await conn.executemany(
+        "INSERT OR IGNORE INTO song_platform_ids (platform, native_id, song_id) VALUES (?, ?, ?)",
+        [
+            (platform, native_id, int(row[0]))
+            for row in rows
+            for platform, native_id in platform_ids(json.loads(row[1]))
+        ],
+    )
+
+
+async def _backfill_song_keys(conn: aiosqlite.Connection) -> None:
+    async with conn.execute("SELECT id, title, artist FROM songs") as cur:
+        rows = await cur.fetchall()
+    await conn.executemany(
+        "UPDATE songs SET title_key = ?, artist_key = ? WHERE id = ?",
+        [(normalize_title(row[1]), normalize_artist(row[2]), int(row[0])) for row in rows],
+    )
+
+
+# Data backfills that SQL alone can't express, run right after the migration
+# script for the same version.
+_BACKFILLS: dict[int, Callable[[aiosqlite.Connection], Awaitable[None]]] = {
+    3: _backfill_platform_ids,
+    7: _backfill_song_keys,
+}
 
 
 def _load_schema() -> str:
@@ -17,16 +171,29 @@ def _load_schema() -> str:
 
 
 class Database:
-    """Thin async wrapper around a single aiosqlite connection.
+    """One SQLite database in WAL mode: a write connection and a read pool.
 
-    The bot is a single-process app, so a single connection with WAL mode is
-    enough — readers don't block the writer and SQLite's own locking covers
-    cross-coroutine writes.
+    Writes all go through `writer`, which owns the write connection and
+    batches concurrent writes into shared commits (see `db/writer.py`).
+    Standalone reads borrow a `query_only` connection from `reader()` and run
+    alongside the writer and each other (see `db/pool.py`).
     """
 
-    def __init__(self, path: Path) -> None:
+    def __init__(
+        self,
+        path: Path,
+        *,
+        write_batch_size: int = 64,
+        write_batch_latency: float = 0.0,
+        read_pool_size: int = 4,
+    ) -> None:
         self._path = path
+        self._read_pool_size = read_pool_size
+        self._write_batch_size = write_batch_size
+        self._write_batch_latency = write_batch_latency
         self._conn: aiosqlite.Connection | None = None
+        self._writer: Writer | None = None
+        self._readers: ReadPool | None = None
 
     @property
     def conn(self) -> aiosqlite.Connection:
@@ -34,6 +201,12 @@ class Database:
             raise RuntimeError("Database is not connected. Call connect() first.")
         return self._conn
 
+    @property
+    def writer(self) -> Writer:
+        if self._writer is None:
+            raise RuntimeError("Database is not connected. Call connect() first.")
+        return self._writer
+
     async def connect(self) -> Self:
         self._path.parent.mkdir(parents=True, exist_ok=True)
         self._conn = await aiosqlite.connect(self._path)
@@ -42,9 +215,36 @@ class Database:
         await self._conn.execute("PRAGMA foreign_keys = ON")
         await self._conn.execute("PRAGMA synchronous = NORMAL")
         await self._apply_schema()
+        self._writer = Writer(
+            self._conn,
+            max_batch=self._write_batch_size,
+            max_latency=self._write_batch_latency,
+        )
+        self._writer.start()
+        # Opened after the schema is in place, so no reader sees an old one.
+        self._readers = ReadPool(self._path, size=self._read_pool_size)
+        await self._readers.open()
         return self
 
+    def reader(self) -> AbstractAsyncContextManager[aiosqlite.Connection]:
+        """Borrow a read-only connection; it sees committed data only."""
+        if self._readers is None:
+            raise RuntimeError("Database is not connected. Call connect() first.")
+        return self._readers.acquire()
+
+    def stats(self) -> dict[str, object]:
+        return {
+            "writer": self._writer.stats() if self._writer is not None else None,
+            "read_pool": self._readers.stats() if self._readers is not None else None,
+        }
+
     async def close(self) -> None:
+        if self._readers is not None:
+            await self._readers.close()
+            self._readers = None
+        if self._writer is not None:
+            await self._writer.close()
+            self._writer = None
         if self._conn is not None:
             await self._conn.close()
             self._conn = None
@@ -57,9 +257,35 @@ class Database:
         if current >= SCHEMA_VERSION:
             return
         logger.info("Applying schema (current=%d, target=%d)", current, SCHEMA_VERSION)
-        await self._conn.executescript(_load_schema())
-        await self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
-        await self._conn.commit()
+        if current == 0:
+            await self._migrate(SCHEMA_VERSION, _load_schema())
+            return
+        for version in range(current + 1, SCHEMA_VERSION + 1):
+            await self._migrate(version, _MIGRATIONS[version], _BACKFILLS.get(version))
+
+    async def _migrate(
+        self,
+        version: int,
+        script: str,
+        backfill: Callable[[aiosqlite.Connection], Awaitable[None]] | None = None,
+    ) -> None:
+        """Run one step and record it in `user_version`, all in one transaction.
+
+        `executescript` commits as it goes unless a transaction is already
+        open, so the script starts with its own BEGIN. A step that fails leaves
+        nothing behind, and the next start retries it from scratch instead of
+        tripping over a half-applied ALTER TABLE.
+        """
+        assert self._conn is not None
+        try:
+            await self._conn.executescript(f"BEGIN;\n{script}")
+            if backfill is not None:
+                await backfill(self._conn)
+            await self._conn.execute(f"PRAGMA user_version = {version}")
+            await self._conn.commit()
+        except BaseException:
+            await self._conn.rollback()
+            raise
 
     async def healthcheck(self) -> bool:
         if self._conn is None:
@@ -0,0 +1,82 @@
+"""Read-only connections for queries that shouldn't wait on the writer.
+
+aiosqlite runs each connection on its own thread, and one connection runs
+one statement at a time. While reads shared the write connection, a `/top`
+on a big chat queued behind every write and every other read. A `ReadPool`
+holds `size` extra connections to the same WAL database. WAL lets them read
+the last committed state while the writer keeps writing. Each one is opened
+with `query_only`, so a read path that tries to write fails loudly instead
+of bypassing the writer.
+
+Reads on the pool only see committed data. Inside a write transaction, read
+through that transaction's connection instead.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import aiosqlite
+
+
+class ReadPool:
+    def __init__(self, path: Path, *, size: int = 4) -> None:
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self._path = path
+        self._size = size
+        self._idle: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+        self._conns: list[aiosqlite.Connection] = []
+        self.acquired = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    async def open(self) -> None:
+        for _ in range(self._size):
+            conn = await aiosqlite.connect(self._path)
+            conn.row_factory = aiosqlite.Row
+            await conn.execute("PRAGMA query_only = ON")
+            self._conns.append(conn)
+            self._idle.put_nowait(conn)
+
+    async def close(self) -> None:
+        for conn in self._conns:
+            await conn.close()
+        self._conns.clear()
+        self._idle = asyncio.Queue()
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[aiosqlite.Connection]:
+        if not self._conns:
+            raise RuntimeError("Read pool is not open.")
+        started = time.perf_counter()
+        try:
+            conn = self._idle.get_nowait()
+        except asyncio.QueueEmpty:
+            self.waited += 1
+            conn = await self._idle.get()
+        waited = time.perf_counter() - started
+        self.acquired += 1
+        self.wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        try:
+            yield conn
+        finally:
+            self._idle.put_nowait(conn)
+
+    def stats(self) -> dict[str, object]:
+        return {
+            "size": self._size,
+            "in_use": len(self._conns) - self._idle.qsize(),
+            "acquired": self.acquired,
+            "waited": self.waited,
+            "avg_wait_ms": (
+                round(self.wait_seconds / self.acquired * 1000, 3) if self.acquired else 0.0
+            ),
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 3),
+        }
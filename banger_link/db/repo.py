@@ -1,11 +1,17 @@
 from __future__ import annotations
 
 import json
-from dataclasses import dataclass
+from collections.abc import AsyncIterator, Collection, Sequence
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, replace
 from datetime import UTC, datetime, timedelta
 from typing import Any, Literal
 
+from banger_link.canonical import extract_platform_id
 from banger_link.db.connection import Database
+from banger_link.normalize import normalize_artist, normalize_title
+from banger_link.services.deadline import Deadline
+from banger_link.services.songlink import PLATFORM_DISPLAY_ORDER, ResolvedSong
 
 ReactionKind = Literal["like", "dislike"]
 
@@ -45,6 +51,93 @@ class ReactionState:
     user_reaction: ReactionKind | None
 
 
+class UnitOfWork:
+    """An open `Repo.unit_of_work()` transaction.
+
+    Pass it as `uow=` to Repo write methods to have them join the
+    transaction instead of committing on their own. It's only valid inside
+    its `async with` block.
+    """
+
+    __slots__ = ("_active", "_repo")
+
+    def __init__(self, repo: Repo) -> None:
+        self._repo = repo
+        self._active = True
+
+    def _join(self, repo: Repo) -> None:
+        if repo is not self._repo:
+            raise ValueError("unit of work belongs to a different Repo")
+        if not self._active:
+            raise RuntimeError("unit of work is already closed")
+
+
+@dataclass(frozen=True, slots=True)
+class StoredSong:
+    id: int
+    entity_id: str
+    title: str
+    artist: str
+    thumbnail_url: str | None
+    platform_links: dict[str, str]
+    # Platform IDs indexed for this song that no fallback search produced.
+    # Only loaded where a caller needs them (`songs_needing_refresh`).
+    known_ids: frozenset[tuple[str, str]] = frozenset()
+
+    def refresh_url(self) -> str | None:
+        """A link to re-resolve the song by, or None: the first (in display
+        order) that wasn't found by a fallback search, which might have
+        picked the wrong recording."""
+        order = {platform: i for i, platform in enumerate(PLATFORM_DISPLAY_ORDER)}
+        for platform in sorted(self.platform_links, key=lambda p: order.get(p, len(order))):
+            url = self.platform_links[platform]
+            key = extract_platform_id(url)
+            # Search results are always track links with an ID, so a link
+            # without one came from Songlink.
+            if key is None or key in self.known_ids:
+                return url
+        return None
+
+    def to_resolved(self) -> ResolvedSong:
+        # The song.link page URL isn't stored; every caller has platform links.
+        return ResolvedSong(
+            entity_id=self.entity_id,
+            title=self.title,
+            artist=self.artist,
+            thumbnail_url=self.thumbnail_url,
+            page_url="",
+            platform_links=self.platform_links,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class SongIdentity:
+    """What the dedupe job needs to tell whether two songs are the same track."""
+
+    id: int
+    title_key: str | None
+    artist_key: str | None
+    platform_links: dict[str, str]
+    # Platform IDs indexed for this song from Songlink's own answers.
+    songlink_ids: frozenset[tuple[str, str]]
+
+
+@dataclass(frozen=True, slots=True)
+class CachedResolution:
+    """A `resolution_cache` row. `payload` is None for negative entries."""
+
+    payload: dict[str, Any] | None
+    expires_at: float
+
+
+@dataclass(frozen=True, slots=True)
+class CachedSearch:
+    """A `search_cache` row. `url` is None for negative entries."""
+
+    url: str | None
+    expires_at: float
+
+
 _VIEW_SELECT = """
 SELECT
     cs.id              AS chat_song_id,
@@ -57,18 +150,66 @@ SELECT
     cs.first_user_name AS first_user_name,
     cs.first_seen_at   AS first_seen_at,
     cs.last_seen_at    AS last_seen_at,
-    COALESCE(SUM(CASE WHEN r.kind = 'like'    THEN 1 ELSE 0 END), 0) AS likes,
-    COALESCE(SUM(CASE WHEN r.kind = 'dislike' THEN 1 ELSE 0 END), 0) AS dislikes
+    cs.likes           AS likes,
+    cs.dislikes        AS dislikes
 FROM chat_songs cs
 JOIN songs s ON s.id = cs.song_id
-LEFT JOIN reactions r ON r.chat_song_id = cs.id
 """
 
 
+# A chat_song ID as callers pass it, resolved through `chat_song_aliases`:
+# reply keyboards posted before a merge still carry the old row's ID. Binds the
+# ID twice.
+_CHAT_SONG_ID = "COALESCE((SELECT target_id FROM chat_song_aliases WHERE chat_song_id = ?), ?)"
+
+# Index one platform track ID of a song. Only IDs Songlink itself returned
+# ('songlink') identify a song; IDs found by a fallback search ('fallback') or
+# indexed before sources were recorded ('unverified') are kept, but never
+# matched on. Songlink's word takes an ID over from a fallback guess and
+# confirms an unverified row of the same song; otherwise the first song to
+# claim an ID keeps it, so re-shares stay pinned to the row they were first
+# recorded under.
+_INDEX_PLATFORM_ID = """
+INSERT INTO song_platform_ids (platform, native_id, song_id, source) VALUES (?, ?, ?, ?)
+ON CONFLICT(platform, native_id) DO UPDATE SET
+    song_id = excluded.song_id,
+    source  = excluded.source
+WHERE excluded.source = 'songlink'
+  AND (song_platform_ids.source = 'fallback' OR song_platform_ids.song_id = excluded.song_id)
+"""
+
+
+def _platform_id_rows(
+    song_id: int, platform_links: dict[str, str], fallback_platforms: Collection[str]
+) -> list[tuple[str, str, int, str]]:
+    rows = []
+    for platform, url in platform_links.items():
+        if (key := extract_platform_id(url)) is not None:
+            source = "fallback" if platform in fallback_platforms else "songlink"
+            rows.append((*key, song_id, source))
+    return rows
+
+
 def _as_int(value: Any) -> int:
     return int(value)
 
 
+def _row_to_stored(row: Any) -> StoredSong:
+    return StoredSong(
+        id=int(row["id"]),
+        entity_id=str(row["entity_id"]),
+        title=str(row["title"]),
+        artist=str(row["artist"]),
+        thumbnail_url=None if row["thumbnail_url"] is None else str(row["thumbnail_url"]),
+        platform_links=json.loads(row["platform_links"]),
+    )
+
+
+def _sql_time(when: datetime) -> str:
+    """Format like SQLite's `datetime('now')` so text comparisons line up."""
+    return when.astimezone(UTC).strftime("%Y-%m-%d %H:%M:%S")
+
+
 def _row_to_view(row: dict[str, Any]) -> ChatSongView:
     raw_links = row["platform_links"]
     assert isinstance(raw_links, str)
@@ -89,6 +230,13 @@ def _row_to_view(row: dict[str, Any]) -> ChatSongView:
     )
 
 
+def _check(deadline: Deadline | None, stage: str) -> None:
+    # Statements are short and a write is never abandoned halfway: the
+    # deadline only decides whether one starts at all.
+    if deadline is not None:
+        deadline.check(stage)
+
+
 class Repo:
     def __init__(self, db: Database) -> None:
         self._db = db
@@ -97,6 +245,34 @@ class Repo:
     def _conn(self):  # type: ignore[no-untyped-def]
         return self._db.conn
 
+    @asynccontextmanager
+    async def unit_of_work(self) -> AsyncIterator[UnitOfWork]:
+        """Group several writes into one transaction, and one commit.
+
+        Write methods called with `uow=` inside the block run in it; it
+        commits when the block exits and rolls back everything on error. The
+        block holds the database writer, so keep network calls out of it.
+        """
+        async with self._transaction():
+            uow = UnitOfWork(self)
+            try:
+                yield uow
+            finally:
+                uow._active = False
+
+    @asynccontextmanager
+    async def _transaction(self, uow: UnitOfWork | None = None) -> AsyncIterator[None]:
+        """Run the block as one write on the database's writer: committed (in
+        the writer's next batch) on success, rolled back on any error,
+        cancellation included. Inside `uow`, the block just joins that
+        transaction."""
+        if uow is not None:
+            uow._join(self)
+            yield
+            return
+        async with self._db.writer.transaction():
+            yield
+
     # ---- writes ---------------------------------------------------------
 
     async def upsert_song(
@@ -107,26 +283,266 @@ class Repo:
         artist: str,
         thumbnail_url: str | None,
         platform_links: dict[str, str],
+        fallback_platforms: Collection[str] = (),
+        deadline: Deadline | None = None,
+        uow: UnitOfWork | None = None,
     ) -> int:
+        """Insert or update a song and index its platform track IDs.
+
+        `fallback_platforms` names the keys of `platform_links` that a
+        fallback search found rather than Songlink; their IDs are indexed
+        but never used to recognise the song.
+        """
+        _check(deadline, "song upsert")
+        async with self._transaction(uow):
+            canonical_id = await self._canonical_song_id(
+                entity_id, platform_links, fallback_platforms
+            )
+            if canonical_id is not None:
+                return await self._fold_into(
+                    canonical_id,
+                    entity_id=entity_id,
+                    thumbnail_url=thumbnail_url,
+                    platform_links=platform_links,
+                    fallback_platforms=fallback_platforms,
+                )
+            async with self._conn.execute(
+                """
+                INSERT INTO songs (
+                    entity_id, title, artist, thumbnail_url, platform_links, title_key, artist_key
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(entity_id) DO UPDATE SET
+                    title          = excluded.title,
+                    artist         = excluded.artist,
+                    title_key      = excluded.title_key,
+                    artist_key     = excluded.artist_key,
+                    thumbnail_url  = excluded.thumbnail_url,
+                    -- Merge rather than replace, so a re-share that Songlink answers
+                    -- with fewer platforms doesn't drop links filled in earlier.
+                    platform_links = json_patch(songs.platform_links, excluded.platform_links),
+                    refreshed_at   = datetime('now')
+                RETURNING id
+                """,
+                (
+                    entity_id,
+                    title,
+                    artist,
+                    thumbnail_url,
+                    json.dumps(platform_links),
+                    normalize_title(title),
+                    normalize_artist(artist),
+                ),
+            ) as cur:
+                row = await cur.fetchone()
+            assert row is not None
+            song_id = int(row["id"])
+            await self._conn.executemany(
+                _INDEX_PLATFORM_ID, _platform_id_rows(song_id, platform_links, fallback_platforms)
+            )
+        return song_id
+
+    async def _canonical_song_id(
+        self, entity_id: str, platform_links: dict[str, str], fallback_platforms: Collection[str]
+    ) -> int | None:
+        """The song an upsert for a not-yet-stored `entity_id` belongs to, if any:
+        an alias left by a merge, or the oldest song Songlink already returned
+        one of its platform IDs for. Links found by a fallback search never
+        count. One query, whichever applies."""
+        ids = sorted(
+            {
+                key
+                for platform, url in platform_links.items()
+                if platform not in fallback_platforms
+                and (key := extract_platform_id(url)) is not None
+            }
+        )
+        by_platform_id = "NULL"
+        if ids:
+            pairs = ", ".join(["(?, ?)"] * len(ids))
+            by_platform_id = f"""(
+                SELECT MIN(p.song_id) FROM (VALUES {pairs}) AS v
+                JOIN song_platform_ids p ON p.platform = v.column1 AND p.native_id = v.column2
+                WHERE p.source = 'songlink'
+            )"""
+        async with self._conn.execute(
+            f"""
+            SELECT COALESCE(
+                (SELECT song_id FROM song_aliases WHERE entity_id = ?),
+                CASE WHEN NOT EXISTS (SELECT 1 FROM songs WHERE entity_id = ?)
+                     THEN {by_platform_id} END
+            ) AS song_id
+            """,
+            (entity_id, entity_id, *(part for pair in ids for part in pair)),
+        ) as cur:
+            row = await cur.fetchone()
+        return None if row is None or row["song_id"] is None else int(row["song_id"])
+
+    async def _fold_into(
+        self,
+        song_id: int,
+        *,
+        entity_id: str,
+        thumbnail_url: str | None,
+        platform_links: dict[str, str],
+        fallback_platforms: Collection[str],
+    ) -> int:
+        # The canonical row keeps its own title, artist and links; the alias
+        # only contributes platforms it doesn't have yet.
         await self._conn.execute(
             """
-            INSERT INTO songs (entity_id, title, artist, thumbnail_url, platform_links)
-            VALUES (?, ?, ?, ?, ?)
-            ON CONFLICT(entity_id) DO UPDATE SET
-                title          = excluded.title,
-                artist         = excluded.artist,
-                thumbnail_url  = excluded.thumbnail_url,
-                platform_links = excluded.platform_links
+            UPDATE songs SET
+                platform_links = json_patch(?, platform_links),
+                thumbnail_url  = COALESCE(thumbnail_url, ?)
+            WHERE id = ?
             """,
-            (entity_id, title, artist, thumbnail_url, json.dumps(platform_links)),
+            (json.dumps(platform_links), thumbnail_url, song_id),
         )
-        async with self._conn.execute(
-            "SELECT id FROM songs WHERE entity_id = ?", (entity_id,)
+        await self._conn.execute(
+            "INSERT OR IGNORE INTO song_aliases (entity_id, song_id) VALUES (?, ?)",
+            (entity_id, song_id),
+        )
+        await self._conn.executemany(
+            _INDEX_PLATFORM_ID, _platform_id_rows(song_id, platform_links, fallback_platforms)
+        )
+        return song_id
+
+    async def merge_songs(self, *, canonical_id: int, duplicate_ids: Sequence[int]) -> None:
+        """Fold `duplicate_ids` into `canonical_id`, in one transaction.
+
+        Links are pooled (the canonical row wins where they disagree). Each
+        duplicate's chat_songs move over: where the chat already has the
+        canonical song, mentions are summed, the earliest sharer is kept and
+        reactions are merged (a user's latest reaction wins), and the old row
+        is left behind as a `chat_song_aliases` redirect. Duplicate entity
+        IDs become `song_aliases`, and the duplicate rows are deleted.
+        """
+        conn = self._conn
+        ids = [canonical_id, *duplicate_ids]
+        marks = ", ".join("?" * len(ids))
+        async with self._transaction():
+            async with conn.execute(
+                f"SELECT id, entity_id, platform_links FROM songs WHERE id IN ({marks})", ids
+            ) as cur:
+                rows = {int(r["id"]): r for r in await cur.fetchall()}
+            if canonical_id not in rows:
+                raise ValueError(f"song {canonical_id} does not exist")
+            links: dict[str, str] = {}
+            for song_id in duplicate_ids:
+                if song_id in rows:
+                    links.update(json.loads(rows[song_id]["platform_links"]))
+            links.update(json.loads(rows[canonical_id]["platform_links"]))
+            await conn.execute(
+                "UPDATE songs SET platform_links = ? WHERE id = ?",
+                (json.dumps(links), canonical_id),
+            )
+
+            for song_id in duplicate_ids:
+                if song_id not in rows:
+                    continue
+                await self._merge_chat_songs(canonical_id, song_id)
+                await conn.execute(
+                    "UPDATE song_platform_ids SET song_id = ? WHERE song_id = ?",
+                    (canonical_id, song_id),
+                )
+                await conn.execute(
+                    "UPDATE song_aliases SET song_id = ? WHERE song_id = ?",
+                    (canonical_id, song_id),
+                )
+                await conn.execute(
+                    "INSERT OR REPLACE INTO song_aliases (entity_id, song_id) VALUES (?, ?)",
+                    (rows[song_id]["entity_id"], canonical_id),
+                )
+                await conn.execute("DELETE FROM songs WHERE id = ?", (song_id,))
+
+            # The duplicates' index rows moved over with their sources above;
+            # pooled links that weren't indexed yet carry no Songlink word.
+            await conn.executemany(
+                _INDEX_PLATFORM_ID, _platform_id_rows(canonical_id, links, links.keys())
+            )
+
+    async def _merge_chat_songs(self, canonical_id: int, duplicate_id: int) -> None:
+        conn = self._conn
+        async with conn.execute(
+            """
+            SELECT d.id AS from_id, c.id AS into_id
+            FROM chat_songs d
+            JOIN chat_songs c ON c.chat_id = d.chat_id AND c.song_id = ?
+            WHERE d.song_id = ?
+            """,
+            (canonical_id, duplicate_id),
         ) as cur:
-            row = await cur.fetchone()
-        await self._conn.commit()
-        assert row is not None
-        return int(row["id"])
+            collisions = [(int(r["from_id"]), int(r["into_id"])) for r in await cur.fetchall()]
+        for from_id, into_id in collisions:
+            await conn.execute(
+                """
+                UPDATE chat_songs AS c SET
+                    mentions        = c.mentions + d.mentions,
+                    first_user_id   = CASE WHEN d.first_seen_at < c.first_seen_at
+                                           THEN d.first_user_id ELSE c.first_user_id END,
+                    first_user_name = CASE WHEN d.first_seen_at < c.first_seen_at
+                                           THEN d.first_user_name ELSE c.first_user_name END,
+                    first_seen_at   = MIN(c.first_seen_at, d.first_seen_at),
+                    last_seen_at    = MAX(c.last_seen_at, d.last_seen_at)
+                FROM chat_songs AS d
+                WHERE c.id = ? AND d.id = ?
+                """,
+                (into_id, from_id),
+            )
+            await conn.execute(
+                """
+                INSERT INTO reactions (chat_song_id, user_id, kind, reacted_at)
+                SELECT ?, user_id, kind, reacted_at FROM reactions WHERE chat_song_id = ?
+                ON CONFLICT(chat_song_id, user_id) DO UPDATE SET
+                    kind       = excluded.kind,
+                    reacted_at = excluded.reacted_at
+                WHERE excluded.reacted_at > reactions.reacted_at
+                """,
+                (into_id, from_id),
+            )
+            await conn.execute(
+                "UPDATE chat_song_aliases SET target_id = ? WHERE target_id = ?",
+                (into_id, from_id),
+            )
+            await conn.execute(
+                "INSERT OR REPLACE INTO chat_song_aliases (chat_song_id, target_id) VALUES (?, ?)",
+                (from_id, into_id),
+            )
+            await conn.execute("DELETE FROM chat_songs WHERE id = ?", (from_id,))
+        await conn.execute(
+            "UPDATE chat_songs SET song_id = ? WHERE song_id = ?", (canonical_id, duplicate_id)
+        )
+
+    async def record_song_refresh(
+        self,
+        *,
+        song_id: int,
+        thumbnail_url: str | None,
+        platform_links: dict[str, str],
+        fallback_platforms: Collection[str] = (),
+        uow: UnitOfWork | None = None,
+    ) -> None:
+        """Merge re-resolved links into a stored song and stamp `refreshed_at`.
+
+        Keyed by row id rather than entity_id: a re-resolve can come back
+        under a different Songlink entity for the same track. Called even
+        when nothing new was found, so the song goes to the back of the queue.
+        `fallback_platforms` is as for `upsert_song`.
+        """
+        async with self._transaction(uow):
+            await self._conn.execute(
+                """
+                UPDATE songs SET
+                    platform_links = json_patch(platform_links, ?),
+                    thumbnail_url  = COALESCE(?, thumbnail_url),
+                    refreshed_at   = datetime('now')
+                WHERE id = ?
+                """,
+                (json.dumps(platform_links), thumbnail_url, song_id),
+            )
+            await self._conn.executemany(
+                _INDEX_PLATFORM_ID, _platform_id_rows(song_id, platform_links, fallback_platforms)
+            )
 
     async def record_mention(
         self,
@@ -135,20 +551,25 @@ class Repo:
         song_id: int,
         user_id: int,
         user_name: str,
+        deadline: Deadline | None = None,
+        uow: UnitOfWork | None = None,
     ) -> MentionResult:
-        async with self._conn.execute(
-            """
-            INSERT INTO chat_songs (chat_id, song_id, first_user_id, first_user_name)
-            VALUES (?, ?, ?, ?)
-            ON CONFLICT(chat_id, song_id) DO UPDATE SET
-                mentions     = chat_songs.mentions + 1,
-                last_seen_at = datetime('now')
-            RETURNING id, mentions, first_user_name, first_seen_at
-            """,
-            (chat_id, song_id, user_id, user_name),
-        ) as cur:
+        _check(deadline, "mention record")
+        async with (
+            self._transaction(uow),
+            self._conn.execute(
+                """
+                INSERT INTO chat_songs (chat_id, song_id, first_user_id, first_user_name)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(chat_id, song_id) DO UPDATE SET
+                    mentions     = chat_songs.mentions + 1,
+                    last_seen_at = datetime('now')
+                RETURNING id, mentions, first_user_name, first_seen_at
+                """,
+                (chat_id, song_id, user_id, user_name),
+            ) as cur,
+        ):
             row = await cur.fetchone()
-        await self._conn.commit()
         assert row is not None
         return MentionResult(
             chat_song_id=int(row["id"]),
@@ -159,18 +580,26 @@ class Repo:
             is_first_time=int(row["mentions"]) == 1,
         )
 
-    async def touch_chat(self, *, chat_id: int, title: str | None) -> None:
-        await self._conn.execute(
-            """
-            INSERT INTO chats (chat_id, title)
-            VALUES (?, ?)
-            ON CONFLICT(chat_id) DO UPDATE SET
-                title          = COALESCE(excluded.title, chats.title),
-                last_active_at = datetime('now')
-            """,
-            (chat_id, title),
-        )
-        await self._conn.commit()
+    async def touch_chat(
+        self,
+        *,
+        chat_id: int,
+        title: str | None,
+        deadline: Deadline | None = None,
+        uow: UnitOfWork | None = None,
+    ) -> None:
+        _check(deadline, "chat touch")
+        async with self._transaction(uow):
+            await self._conn.execute(
+                """
+                INSERT INTO chats (chat_id, title)
+                VALUES (?, ?)
+                ON CONFLICT(chat_id) DO UPDATE SET
+                    title          = COALESCE(excluded.title, chats.title),
+                    last_active_at = datetime('now')
+                """,
+                (chat_id, title),
+            )
 
     async def toggle_reaction(
         self,
@@ -178,67 +607,348 @@ class Repo:
         chat_song_id: int,
         user_id: int,
         kind: ReactionKind,
+        uow: UnitOfWork | None = None,
     ) -> ReactionState:
-        async with self._conn.execute(
-            "SELECT kind FROM reactions WHERE chat_song_id = ? AND user_id = ?",
-            (chat_song_id, user_id),
-        ) as cur:
-            existing_row = await cur.fetchone()
-        existing: ReactionKind | None = existing_row["kind"] if existing_row is not None else None
+        """Flip a user's reaction: tapping the same kind again clears it, the
+        other kind replaces it. Runs as one transaction, so concurrent taps
+        are applied one after another and the counts returned include exactly
+        the taps before this one."""
+        async with self._transaction(uow):
+            chat_song_id = await self._resolve_chat_song_id(chat_song_id)
+            # A new reaction or a switch writes the row. Tapping the current
+            # kind again matches no row here, and the reaction is removed.
+            async with self._conn.execute(
+                """
+                INSERT INTO reactions (chat_song_id, user_id, kind) VALUES (?, ?, ?)
+                ON CONFLICT(chat_song_id, user_id) DO UPDATE SET
+                    kind       = excluded.kind,
+                    reacted_at = datetime('now')
+                WHERE reactions.kind <> excluded.kind
+                RETURNING kind
+                """,
+                (chat_song_id, user_id, kind),
+            ) as cur:
+                written = await cur.fetchone()
+            if written is None:
+                await self._conn.execute(
+                    "DELETE FROM reactions WHERE chat_song_id = ? AND user_id = ?",
+                    (chat_song_id, user_id),
+                )
+            async with self._conn.execute(
+                "SELECT likes, dislikes FROM chat_songs WHERE id = ?", (chat_song_id,)
+            ) as cur:
+                counts = await cur.fetchone()
+        assert counts is not None
+        return ReactionState(
+            likes=int(counts["likes"]),
+            dislikes=int(counts["dislikes"]),
+            user_reaction=None if written is None else kind,
+        )
 
-        if existing == kind:
-            await self._conn.execute(
-                "DELETE FROM reactions WHERE chat_song_id = ? AND user_id = ?",
-                (chat_song_id, user_id),
-            )
-            new_user_reaction: ReactionKind | None = None
-        elif existing is not None:
+    async def put_cached_resolution(
+        self,
+        *,
+        url: str,
+        payload: dict[str, Any] | None,
+        expires_at: float,
+    ) -> None:
+        async with self._transaction():
             await self._conn.execute(
-                "UPDATE reactions SET kind = ?, reacted_at = datetime('now') "
-                "WHERE chat_song_id = ? AND user_id = ?",
-                (kind, chat_song_id, user_id),
+                """
+                INSERT INTO resolution_cache (url, payload, expires_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    payload    = excluded.payload,
+                    expires_at = excluded.expires_at,
+                    created_at = datetime('now')
+                """,
+                (url, None if payload is None else json.dumps(payload), expires_at),
             )
-            new_user_reaction = kind
-        else:
+
+    async def prune_resolution_cache(self, *, now: float) -> int:
+        async with (
+            self._transaction(),
+            self._conn.execute("DELETE FROM resolution_cache WHERE expires_at <= ?", (now,)) as cur,
+        ):
+            deleted = cur.rowcount
+        return int(deleted)
+
+    async def put_cached_search(
+        self,
+        *,
+        platform: str,
+        title_key: str,
+        artist_key: str,
+        url: str | None,
+        expires_at: float,
+    ) -> None:
+        async with self._transaction():
             await self._conn.execute(
-                "INSERT INTO reactions (chat_song_id, user_id, kind) VALUES (?, ?, ?)",
-                (chat_song_id, user_id, kind),
+                """
+                INSERT INTO search_cache (platform, title_key, artist_key, url, expires_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(platform, title_key, artist_key) DO UPDATE SET
+                    url        = excluded.url,
+                    expires_at = excluded.expires_at,
+                    created_at = datetime('now')
+                """,
+                (platform, title_key, artist_key, url, expires_at),
             )
-            new_user_reaction = kind
 
+    async def prune_search_cache(self, *, now: float) -> int:
+        async with (
+            self._transaction(),
+            self._conn.execute("DELETE FROM search_cache WHERE expires_at <= ?", (now,)) as cur,
+        ):
+            deleted = cur.rowcount
+        return int(deleted)
+
+    async def spend_quota(self, *, provider: str, day: str, units: int, limit: int) -> int | None:
+        """Add `units` to the day's spend unless that would exceed `limit`.
+
+        Returns the new total, or None (and spends nothing) if it won't fit.
+        """
+        async with (
+            self._transaction(),
+            self._conn.execute(
+                """
+                INSERT INTO api_quota (provider, day, used)
+                SELECT ?, ?, ? WHERE ? <= ?
+                ON CONFLICT(provider, day) DO UPDATE SET
+                    used = api_quota.used + excluded.used
+                WHERE api_quota.used + excluded.used <= ?
+                RETURNING used
+                """,
+                (provider, day, units, units, limit, limit),
+            ) as cur,
+        ):
+            row = await cur.fetchone()
+        return None if row is None else int(row["used"])
+
+    async def fill_quota(self, *, provider: str, day: str, units: int) -> int:
+        """Raise the day's spend to at least `units`. Returns the new total."""
+        async with (
+            self._transaction(),
+            self._conn.execute(
+                """
+                INSERT INTO api_quota (provider, day, used) VALUES (?, ?, ?)
+                ON CONFLICT(provider, day) DO UPDATE SET
+                    used = MAX(api_quota.used, excluded.used)
+                RETURNING used
+                """,
+                (provider, day, units),
+            ) as cur,
+        ):
+            row = await cur.fetchone()
+        assert row is not None
+        return int(row["used"])
+
+    async def _resolve_chat_song_id(self, chat_song_id: int) -> int:
+        # Reply keyboards posted before a merge still carry the old row's ID.
         async with self._conn.execute(
-            """
-            SELECT
-                COALESCE(SUM(CASE WHEN kind = 'like'    THEN 1 ELSE 0 END), 0) AS likes,
-                COALESCE(SUM(CASE WHEN kind = 'dislike' THEN 1 ELSE 0 END), 0) AS dislikes
-            FROM reactions WHERE chat_song_id = ?
-            """,
-            (chat_song_id,),
+            "SELECT target_id FROM chat_song_aliases WHERE chat_song_id = ?", (chat_song_id,)
         ) as cur:
-            counts = await cur.fetchone()
-        await self._conn.commit()
-        assert counts is not None
-        return ReactionState(
-            likes=int(counts["likes"]),
-            dislikes=int(counts["dislikes"]),
-            user_reaction=new_user_reaction,
-        )
+            row = await cur.fetchone()
+        return int(row["target_id"]) if row is not None else chat_song_id
 
     # ---- reads ----------------------------------------------------------
 
+    async def get_cached_resolution(self, url: str) -> CachedResolution | None:
+        async with (
+            self._db.reader() as conn,
+            conn.execute(
+                "SELECT payload, expires_at FROM resolution_cache WHERE url = ?", (url,)
+            ) as cur,
+        ):
+            row = await cur.fetchone()
+        if row is None:
+            return None
+        raw = row["payload"]
+        return CachedResolution(
+            payload=None if raw is None else json.loads(raw),
+            expires_at=float(row["expires_at"]),
+        )
+
+    async def get_cached_search(
+        self, *, platform: str, title_key: str, artist_key: str
+    ) -> CachedSearch | None:
+        async with (
+            self._db.reader() as conn,
+            conn.execute(
+                """
+            SELECT url, expires_at FROM search_cache
+            WHERE platform = ? AND title_key = ? AND artist_key = ?
+            """,
+                (platform, title_key, artist_key),
+            ) as cur,
+        ):
+            row = await cur.fetchone()
+        if row is None:
+            return None
+        return CachedSearch(url=row["url"], expires_at=float(row["expires_at"]))
+
+    async def get_quota_used(self, *, provider: str, day: str) -> int:
+        async with (
+            self._db.reader() as conn,
+            conn.execute(
+                "SELECT used FROM api_quota WHERE provider = ? AND day = ?", (provider, day)
+            ) as cur,
+        ):
+            row = await cur.fetchone()
+        return 0 if row is None else int(row["used"])
+
+    async def song_identities(self) -> list[SongIdentity]:
+        async with (
+            self._db.reader() as conn,
+            conn.execute(
+                """
+            SELECT id, title_key, artist_key, platform_links, (
+                SELECT json_group_array(json_array(p.platform, p.native_id))
+                FROM song_platform_ids p
+                WHERE p.song_id = songs.id AND p.source = 'songlink'
+            ) AS songlink_ids
+            FROM songs ORDER BY id
+            """
+            ) as cur,
+        ):
+            rows = await cur.fetchall()
+        return [
+            SongIdentity(
+                id=int(row["id"]),
+                title_key=row["title_key"],
+                artist_key=row["artist_key"],
+                platform_links=json.loads(row["platform_links"]),
+                songlink_ids=frozenset(
+                    (platform, native_id) for platform, native_id in json.loads(row["songlink_ids"])
+                ),
+            )
+            for row in rows
+        ]
+
     async def get_chat_song(self, chat_song_id: int) -> ChatSongView | None:
-        async with self._conn.execute(
-            f"{_VIEW_SELECT} WHERE cs.id = ? GROUP BY cs.id",
-            (chat_song_id,),
-        ) as cur:
+        async with (
+            self._db.reader() as conn,
+            conn.execute(
+                f"{_VIEW_SELECT} WHERE cs.id = {_CHAT_SONG_ID}",
+                (chat_song_id, chat_song_id),
+            ) as cur,
+        ):
             row = await cur.fetchone()
         return _row_to_view(dict(row)) if row else None
 
+    async def find_song_by_platform_id(
+        self, *, platform: str, native_id: str, deadline: Deadline | None = None
+    ) -> StoredSong | None:
+        _check(deadline, "platform ID lookup")
+        async with (
+            self._db.reader() as conn,
+            conn.execute(
+                """
+            SELECT s.id, s.entity_id, s.title, s.artist, s.thumbnail_url, s.platform_links
+            FROM song_platform_ids p
+            JOIN songs s ON s.id = p.song_id
+            WHERE p.platform = ? AND p.native_id = ? AND p.source = 'songlink'
+            """,
+                (platform, native_id),
+            ) as cur,
+        ):
+            row = await cur.fetchone()
+        return None if row is None else _row_to_stored(row)
+
+    async def catalog_links(
+        self, *, title: str, artist: str, deadline: Deadline | None = None
+    ) -> dict[str, str]:
+        """Platform links Songlink returned for songs with this title and artist.
+
+        The same track stored under several entity_ids (first shared from
+        different platforms, or spelled differently) pools its links. Titles
+        must match with edition markers kept, so a "Live at ..." or remix row
+        never lends its links to the studio recording or the other way
+        round. Links a fallback search found are left out: they're guesses.
+        Where songs disagree on a platform, the most recently refreshed one
+        wins.
+        """
+        _check(deadline, "catalog lookup")
+        async with (
+            self._db.reader() as conn,
+            conn.execute(
+                """
+            SELECT title, platform_links, (
+                SELECT json_group_array(json_array(p.platform, p.native_id))
+                FROM song_platform_ids p
+                WHERE p.song_id = songs.id AND p.source = 'songlink'
+            ) AS songlink_ids
+            FROM songs
+            WHERE title_key = ? AND artist_key = ?
+            ORDER BY COALESCE(refreshed_at, created_at) DESC
+            """,
+                (normalize_title(title), normalize_artist(artist)),
+            ) as cur,
+        ):
+            rows = await cur.fetchall()
+        strict = normalize_title(title, strict=True)
+        links: dict[str, str] = {}
+        for row in rows:
+            if normalize_title(row["title"], strict=True) != strict:
+                continue
+            verified = {tuple(pair) for pair in json.loads(row["songlink_ids"])}
+            for platform, url in json.loads(row["platform_links"]).items():
+                if extract_platform_id(url) in verified:
+                    links.setdefault(platform, url)
+        return links
+
+    async def songs_needing_refresh(
+        self,
+        *,
+        stale_before: datetime,
+        incomplete_before: datetime,
+        expected_platforms: Sequence[str],
+        limit: int,
+    ) -> list[StoredSong]:
+        """Songs due for a refresh, least recently refreshed first.
+
+        A song is due when its links are older than `stale_before`, or — on
+        the shorter `incomplete_before` clock — when any of
+        `expected_platforms` is missing from them.
+        """
+        missing = (
+            " OR ".join("json_type(platform_links, ?) IS NULL" for _ in expected_platforms) or "0"
+        )
+        sql = f"""
+            SELECT id, entity_id, title, artist, thumbnail_url, platform_links, (
+                SELECT json_group_array(json_array(p.platform, p.native_id))
+                FROM song_platform_ids p
+                WHERE p.song_id = songs.id AND p.source <> 'fallback'
+            ) AS known_ids
+            FROM songs
+            WHERE COALESCE(refreshed_at, created_at) < ?
+               OR (COALESCE(refreshed_at, created_at) < ? AND ({missing}))
+            ORDER BY COALESCE(refreshed_at, created_at)
+            LIMIT ?
+        """
+        params: list[object] = [_sql_time(stale_before), _sql_time(incomplete_before)]
+        params.extend(f'$."{platform}"' for platform in expected_platforms)
+        params.append(limit)
+        async with self._db.reader() as conn, conn.execute(sql, params) as cur:
+            rows = await cur.fetchall()
+        return [
+            replace(
+                _row_to_stored(row),
+                known_ids=frozenset(
+                    (platform, native_id) for platform, native_id in json.loads(row["known_ids"])
+                ),
+            )
+            for row in rows
+        ]
+
     async def get_user_reaction(self, *, chat_song_id: int, user_id: int) -> ReactionKind | None:
-        async with self._conn.execute(
-            "SELECT kind FROM reactions WHERE chat_song_id = ? AND user_id = ?",
-            (chat_song_id, user_id),
-        ) as cur:
+        async with (
+            self._db.reader() as conn,
+            conn.execute(
+                f"SELECT kind FROM reactions WHERE chat_song_id = {_CHAT_SONG_ID} AND user_id = ?",
+                (chat_song_id, chat_song_id, user_id),
+            ) as cur,
+        ):
             row = await cur.fetchone()
         return row["kind"] if row else None
 
@@ -253,17 +963,16 @@ class Repo:
         clause = ""
         if since is not None:
             clause = "AND cs.last_seen_at >= ?"
-            params.append(since.astimezone(UTC).strftime("%Y-%m-%d %H:%M:%S"))
+            params.append(_sql_time(since))
         params.append(limit)
         sql = f"""
             {_VIEW_SELECT}
             WHERE cs.chat_id = ? {clause}
-            GROUP BY cs.id
-            HAVING (likes + dislikes) > 0
-            ORDER BY (likes - dislikes) DESC, cs.mentions DESC, cs.last_seen_at DESC
+              AND cs.likes + cs.dislikes > 0
+            ORDER BY cs.likes - cs.dislikes DESC, cs.mentions DESC, cs.last_seen_at DESC
             LIMIT ?
         """
-        async with self._conn.execute(sql, params) as cur:
+        async with self._db.reader() as conn, conn.execute(sql, params) as cur:
             rows = await cur.fetchall()
         return [_row_to_view(dict(r)) for r in rows]
 
@@ -273,11 +982,13 @@ class Repo:
             {_VIEW_SELECT}
             WHERE cs.chat_id = ?
               AND (s.title LIKE ? OR s.artist LIKE ?)
-            GROUP BY cs.id
             ORDER BY cs.last_seen_at DESC
             LIMIT ?
         """
-        async with self._conn.execute(sql, (chat_id, like, like, limit)) as cur:
+        async with (
+            self._db.reader() as conn,
+            conn.execute(sql, (chat_id, like, like, limit)) as cur,
+        ):
             rows = await cur.fetchall()
         return [_row_to_view(dict(r)) for r in rows]
 
@@ -288,11 +999,10 @@ class Repo:
         sql = f"""
             {_VIEW_SELECT}
             WHERE (s.title LIKE ? OR s.artist LIKE ?)
-            GROUP BY cs.id
             ORDER BY cs.last_seen_at DESC
             LIMIT ?
         """
-        async with self._conn.execute(sql, (like, like, limit)) as cur:
+        async with self._db.reader() as conn, conn.execute(sql, (like, like, limit)) as cur:
             rows = await cur.fetchall()
         return [_row_to_view(dict(r)) for r in rows]
 
@@ -302,9 +1012,12 @@ class Repo:
         col = f"digest_{kind}"
         # Only chats that have had activity recently — avoids posting to dead chats.
         cutoff = datetime.now(tz=UTC) - timedelta(days=60)
-        async with self._conn.execute(
-            f"SELECT chat_id FROM chats WHERE {col} = 1 AND last_active_at >= ?",
-            (cutoff.strftime("%Y-%m-%d %H:%M:%S"),),
-        ) as cur:
+        async with (
+            self._db.reader() as conn,
+            conn.execute(
+                f"SELECT chat_id FROM chats WHERE {col} = 1 AND last_active_at >= ?",
+                (_sql_time(cutoff),),
+            ) as cur,
+        ):
             rows = await cur.fetchall()
         return [int(r["chat_id"]) for r in rows]
@@ -7,9 +7,32 @@ CREATE TABLE IF NOT EXISTS songs (
     artist          TEXT NOT NULL,
     thumbnail_url   TEXT,
     platform_links  TEXT NOT NULL,
-    created_at      TEXT NOT NULL DEFAULT (datetime('now'))
+    created_at      TEXT NOT NULL DEFAULT (datetime('now')),
+    -- Last time the links were re-resolved; NULL until the first refresh.
+    refreshed_at    TEXT,
+    -- normalize_title(title) / normalize_artist(artist), for catalog lookups
+    -- that should match across platforms' spellings.
+    title_key       TEXT,
+    artist_key      TEXT
 );
 CREATE UNIQUE INDEX IF NOT EXISTS songs_entity_id ON songs(entity_id);
+CREATE INDEX IF NOT EXISTS songs_by_key ON songs(title_key, artist_key);
+CREATE INDEX IF NOT EXISTS songs_by_freshness ON songs(COALESCE(refreshed_at, created_at));
+
+-- Every platform's own track ID for a song, extracted from platform_links, so a
+-- re-share from any platform finds the stored song without asking Songlink.
+-- `source` is where the link came from: only 'songlink' rows identify a song.
+-- 'fallback' rows were found by a title/artist search and may be wrong;
+-- 'unverified' rows were indexed before sources were recorded.
+CREATE TABLE IF NOT EXISTS song_platform_ids (
+    platform        TEXT NOT NULL,
+    native_id       TEXT NOT NULL,
+    song_id         INTEGER NOT NULL REFERENCES songs(id) ON DELETE CASCADE,
+    source          TEXT NOT NULL DEFAULT 'songlink'
+                    CHECK (source IN ('songlink', 'fallback', 'unverified')),
+    PRIMARY KEY (platform, native_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS song_platform_ids_by_song ON song_platform_ids(song_id);
 
 CREATE TABLE IF NOT EXISTS chat_songs (
     id              INTEGER PRIMARY KEY,
@@ -20,9 +43,15 @@ CREATE TABLE IF NOT EXISTS chat_songs (
     mentions        INTEGER NOT NULL DEFAULT 1,
     first_seen_at   TEXT NOT NULL DEFAULT (datetime('now')),
     last_seen_at    TEXT NOT NULL DEFAULT (datetime('now')),
+    -- Reaction counts, kept in step with `reactions` by the triggers below.
+    likes           INTEGER NOT NULL DEFAULT 0,
+    dislikes        INTEGER NOT NULL DEFAULT 0,
     UNIQUE(chat_id, song_id)
 );
 CREATE INDEX IF NOT EXISTS chat_songs_by_chat ON chat_songs(chat_id, last_seen_at DESC);
+-- Leaderboard order, so top_for_chat reads the first rows instead of sorting.
+CREATE INDEX IF NOT EXISTS chat_songs_by_score
+    ON chat_songs(chat_id, likes - dislikes DESC, mentions DESC, last_seen_at DESC);
 
 CREATE TABLE IF NOT EXISTS reactions (
     chat_song_id    INTEGER NOT NULL REFERENCES chat_songs(id) ON DELETE CASCADE,
@@ -32,6 +61,32 @@ CREATE TABLE IF NOT EXISTS reactions (
     PRIMARY KEY (chat_song_id, user_id)
 );
 
+CREATE TRIGGER IF NOT EXISTS reactions_count_insert AFTER INSERT ON reactions
+BEGIN
+    UPDATE chat_songs SET
+        likes    = likes    + (NEW.kind = 'like'),
+        dislikes = dislikes + (NEW.kind = 'dislike')
+    WHERE id = NEW.chat_song_id;
+END;
+CREATE TRIGGER IF NOT EXISTS reactions_count_delete AFTER DELETE ON reactions
+BEGIN
+    UPDATE chat_songs SET
+        likes    = likes    - (OLD.kind = 'like'),
+        dislikes = dislikes - (OLD.kind = 'dislike')
+    WHERE id = OLD.chat_song_id;
+END;
+CREATE TRIGGER IF NOT EXISTS reactions_count_update AFTER UPDATE OF kind, chat_song_id ON reactions
+BEGIN
+    UPDATE chat_songs SET
+        likes    = likes    - (OLD.kind = 'like'),
+        dislikes = dislikes - (OLD.kind = 'dislike')
+    WHERE id = OLD.chat_song_id;
+    UPDATE chat_songs SET
+        likes    = likes    + (NEW.kind = 'like'),
+        dislikes = dislikes + (NEW.kind = 'dislike')
+    WHERE id = NEW.chat_song_id;
+END;
+
 CREATE TABLE IF NOT EXISTS chats (
     chat_id         INTEGER PRIMARY KEY,
     title           TEXT,
@@ -39,3 +94,51 @@ CREATE TABLE IF NOT EXISTS chats (
     digest_monthly  INTEGER NOT NULL DEFAULT 1,
     last_active_at  TEXT NOT NULL DEFAULT (datetime('now'))
 );
+
+-- URL → Songlink resolution cache. `payload` is the JSON-encoded ResolvedSong;
+-- NULL marks a negative entry (404 / podcast / non-song payload).
+CREATE TABLE IF NOT EXISTS resolution_cache (
+    url             TEXT PRIMARY KEY,
+    payload         TEXT,
+    expires_at      REAL NOT NULL,
+    created_at      TEXT NOT NULL DEFAULT (datetime('now'))
+);
+
+-- Fallback search results, keyed by platform and normalized title/artist
+-- (see banger_link/normalize.py). `url` is NULL for a negative entry: the
+-- platform's search came back empty.
+CREATE TABLE IF NOT EXISTS search_cache (
+    platform        TEXT NOT NULL,
+    title_key       TEXT NOT NULL,
+    artist_key      TEXT NOT NULL,
+    url             TEXT,
+    expires_at      REAL NOT NULL,
+    created_at      TEXT NOT NULL DEFAULT (datetime('now')),
+    PRIMARY KEY (platform, title_key, artist_key)
+) WITHOUT ROWID;
+
+-- Units spent against metered upstream APIs (YouTube Data API), per quota day
+-- as the provider counts it (Pacific date for Google).
+CREATE TABLE IF NOT EXISTS api_quota (
+    provider        TEXT NOT NULL,
+    day             TEXT NOT NULL,
+    used            INTEGER NOT NULL,
+    PRIMARY KEY (provider, day)
+) WITHOUT ROWID;
+
+-- Songs merged into another row by the dedupe job (or recognised as the same
+-- track at upsert time): Songlink entity → the canonical song. upsert_song
+-- follows these, so a merged entity never comes back as its own row.
+CREATE TABLE IF NOT EXISTS song_aliases (
+    entity_id       TEXT PRIMARY KEY,
+    song_id         INTEGER NOT NULL REFERENCES songs(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS song_aliases_by_song ON song_aliases(song_id);
+
+-- chat_songs rows folded into another row for the same chat by a merge, so
+-- reaction buttons on old messages keep working.
+CREATE TABLE IF NOT EXISTS chat_song_aliases (
+    chat_song_id    INTEGER PRIMARY KEY,
+    target_id       INTEGER NOT NULL REFERENCES chat_songs(id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS chat_song_aliases_by_target ON chat_song_aliases(target_id);
@@ -0,0 +1,222 @@
+"""Single writer for the SQLite connection, with group commit.
+
+Every write in the bot goes through one `Writer`: a task that owns the write
+side of the connection and works through a queue of write operations. It
+runs whatever is queued, up to `max_batch` operations, inside one
+transaction, each under its own SAVEPOINT. An operation that fails is rolled
+back to its savepoint and fails alone; the rest of the batch still commits.
+Each caller is resumed once the COMMIT covering its operation has
+returned, so "written" always means committed.
+
+Under a burst (a popular post, everyone tapping like) the operations queued
+while the previous batch was committing all share the next COMMIT, instead
+of each paying for its own. `max_latency` makes the writer hold a batch open
+a little longer for stragglers. It's 0 by default, which commits as soon as
+the queue is drained.
+
+Operations must only touch the database. Whatever an operation awaits, the
+writer (and so every other write) waits for too.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any
+
+import aiosqlite
+
+logger = logging.getLogger(__name__)
+
+type WriteOp[T] = Callable[[aiosqlite.Connection], Awaitable[T]]
+
+
+class WriterClosed(RuntimeError):
+    """The writer was closed before this operation could run."""
+
+
+class _Abandoned(Exception):
+    """The caller holding a `transaction()` block left it with an error."""
+
+
+@dataclass(slots=True)
+class _Pending:
+    op: WriteOp[Any]
+    future: asyncio.Future[Any]
+    result: Any = None
+    error: BaseException | None = None
+
+
+class Writer:
+    def __init__(
+        self,
+        conn: aiosqlite.Connection,
+        *,
+        max_batch: int = 64,
+        max_latency: float = 0.0,
+    ) -> None:
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+        self._conn = conn
+        self._max_batch = max_batch
+        self._max_latency = max_latency
+        self._queue: asyncio.Queue[_Pending | None] = asyncio.Queue()
+        self._task: asyncio.Task[None] | None = None
+        self._closed = False
+        self.ops = 0
+        self.failed_ops = 0
+        self.batches = 0
+        self.largest_batch = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="sqlite-writer")
+
+    async def close(self) -> None:
+        """Run everything already queued, then stop."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def submit[T](self, op: WriteOp[T]) -> T:
+        """Run `op` in the next batch and return its result once committed."""
+        if self._closed:
+            raise WriterClosed("writer is closed")
+        self.start()
+        future: asyncio.Future[T] = asyncio.get_running_loop().create_future()
+        await self._queue.put(_Pending(op, future))
+        return await future
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        """Hold the writer for the duration of the block.
+
+        The block's statements run on the connection inside their own
+        savepoint of the current batch. Leaving it normally waits for that
+        batch to commit; leaving it with an error rolls the block back.
+        """
+        loop = asyncio.get_running_loop()
+        granted: asyncio.Future[None] = loop.create_future()
+        finished: asyncio.Future[bool] = loop.create_future()
+
+        async def hold(conn: aiosqlite.Connection) -> None:
+            if finished.done() and not finished.result():
+                raise _Abandoned
+            granted.set_result(None)
+            if not await finished:
+                raise _Abandoned
+
+        committed = asyncio.ensure_future(self.submit(hold))
+        try:
+            await asyncio.wait({granted, committed}, return_when=asyncio.FIRST_COMPLETED)
+            if not granted.done():
+                await committed  # raises: the writer failed before the grant
+            yield
+        except BaseException:
+            if not finished.done():
+                finished.set_result(False)
+            if granted.done():
+                # The block ran; its savepoint must be rolled back before the
+                # caller sees the error.
+                await asyncio.gather(committed, return_exceptions=True)
+            else:
+                committed.cancel()
+            raise
+        finished.set_result(True)
+        await committed
+
+    def stats(self) -> dict[str, object]:
+        return {
+            "queued": self._queue.qsize(),
+            "ops": self.ops,
+            "failed_ops": self.failed_ops,
+            "batches": self.batches,
+            "largest_batch": self.largest_batch,
+            "ops_per_batch": round(self.ops / self.batches, 2) if self.batches else 0.0,
+        }
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            try:
+                await self._conn.execute("BEGIN IMMEDIATE")
+                await self._apply(first)
+                stopping = await self._fill(batch)
+                await self._conn.commit()
+            except Exception as exc:
+                logger.exception("Write batch of %d operation(s) failed", len(batch))
+                await self._rollback()
+                for pending in batch:
+                    pending.error = exc
+            self._settle(batch)
+        # Anything queued behind the stop marker never ran.
+        while not self._queue.empty():
+            leftover = self._queue.get_nowait()
+            if leftover is not None and not leftover.future.done():
+                leftover.future.set_exception(WriterClosed("writer is closed"))
+
+    async def _fill(self, batch: list[_Pending]) -> bool:
+        """Add queued operations to `batch` until it's full, the queue stays
+        empty for `max_latency`, or the stop marker comes up (returns True)."""
+        loop = asyncio.get_running_loop()
+        until = loop.time() + self._max_latency
+        while len(batch) < self._max_batch:
+            pending: _Pending | None
+            try:
+                pending = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                wait = until - loop.time()
+                if wait <= 0:
+                    return False
+                try:
+                    pending = await asyncio.wait_for(self._queue.get(), wait)
+                except TimeoutError:
+                    return False
+            if pending is None:
+                return True
+            batch.append(pending)
+            await self._apply(pending)
+        return False
+
+    async def _apply(self, pending: _Pending) -> None:
+        if pending.future.done():
+            # The caller gave up while queued; nothing to run.
+            return
+        await self._conn.execute("SAVEPOINT write_op")
+        try:
+            pending.result = await pending.op(self._conn)
+        except Exception as exc:
+            pending.error = exc
+            await self._conn.execute("ROLLBACK TO write_op")
+        await self._conn.execute("RELEASE write_op")
+
+    async def _rollback(self) -> None:
+        try:
+            await self._conn.rollback()
+        except Exception:
+            logger.exception("Rollback after a failed write batch failed too")
+
+    def _settle(self, batch: list[_Pending]) -> None:
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(batch))
+        for pending in batch:
+            self.ops += 1
+            if pending.future.done():
+                continue
+            if pending.error is not None:
+                self.failed_ops += 1
+                pending.future.set_exception(pending.error)
+            else:
+                pending.future.set_result(pending.result)
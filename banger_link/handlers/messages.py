@@ -2,41 +2,26 @@ from __future__ import annotations
 
 import logging
 import re
-from urllib.parse import urlparse
 
-from telegram import Update
+from telegram import Message, Update
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes, MessageHandler, filters
 
+from banger_link.canonical import canonicalize, extract_platform_id, is_music_url
 from banger_link.config import settings
+from banger_link.db.repo import MentionResult, Repo
 from banger_link.handlers._state import get_fallback, get_repo, get_songlink
+from banger_link.services.deadline import Deadline, DeadlineExceeded
+from banger_link.services.fallback_resolver import FallbackResolver
 from banger_link.services.formatter import reaction_keyboard, share_message
+from banger_link.services.songlink import ResolvedSong
 
 logger = logging.getLogger(__name__)
 
-URL_RE = re.compile(r"https?://\S+", re.IGNORECASE)
-
-# Domains we'll send to Songlink. We keep this list narrow so we don't waste
-# requests (and risk rate-limiting) on unrelated links.
-MUSIC_DOMAIN_SUFFIXES: tuple[str, ...] = (
-    "spotify.com",
-    "music.apple.com",
-    "youtube.com",
-    "youtu.be",
-    "music.youtube.com",
-    "tidal.com",
-    "deezer.com",
-    "soundcloud.com",
-    "music.amazon.com",
-    "music.amazon.co.uk",
-    "music.amazon.de",
-    "pandora.com",
-    "anghami.com",
-    "audiomack.com",
-    "boomplay.com",
-    "music.yandex.com",
-    "music.yandex.ru",
-    "napster.com",
-    "song.link",
+# Web links, plus the `spotify:track:…` URIs the desktop client copies.
+URL_RE = re.compile(
+    r"https?://\S+|spotify:(?:track|album|artist|playlist|episode|show):[A-Za-z0-9]+",
+    re.IGNORECASE,
 )
 
 
@@ -45,16 +30,6 @@ def _extract_url(text: str) -> str | None:
     return match.group(0).rstrip(").,;:!?]\"'") if match else None
 
 
-def _is_music_url(url: str) -> bool:
-    try:
-        host = (urlparse(url).hostname or "").lower()
-    except ValueError:
-        return False
-    if not host:
-        return False
-    return any(host == d or host.endswith("." + d) for d in MUSIC_DOMAIN_SUFFIXES)
-
-
 def _is_ignored(url: str) -> bool:
     return any(d in url for d in settings.ignored_domains)
 
@@ -64,6 +39,79 @@ def _user_display_name(user_first: str | None, user_last: str | None) -> str:
     return " ".join(parts) or "Anonymous"
 
 
+async def _find_known_song(
+    repo: Repo, url: str, *, deadline: Deadline | None = None
+) -> tuple[ResolvedSong, int] | None:
+    """Look the link's platform track ID up in the local index.
+
+    A hit means this exact track was stored before (possibly shared from a
+    different platform), so its links can be served without Songlink.
+    """
+    key = extract_platform_id(url)
+    if key is None:
+        return None
+    platform, native_id = key
+    stored = await repo.find_song_by_platform_id(
+        platform=platform, native_id=native_id, deadline=deadline
+    )
+    if stored is None:
+        return None
+    return stored.to_resolved(), stored.id
+
+
+async def _fill_and_edit(
+    *,
+    fallback: FallbackResolver,
+    repo: Repo,
+    reply: Message,
+    resolved: ResolvedSong,
+    mention: MentionResult,
+) -> None:
+    """Second phase of a share: run the fallback searches, store whatever they
+    found and edit the already-sent reply to include it.
+
+    Bounded by `fallback_fill_timeout_seconds`: searches still running then
+    are dropped and whatever finished is kept. Nothing is written or edited
+    when the searches come back empty.
+    """
+    try:
+        filled = await fallback.fill(
+            resolved, fair_key=reply.chat_id, budget=settings.fallback_fill_timeout_seconds
+        )
+    except Exception:
+        logger.exception("fallback resolver raised; keeping Songlink result as-is")
+        return
+    if filled.platform_links == resolved.platform_links:
+        return
+
+    await repo.upsert_song(
+        entity_id=filled.entity_id,
+        title=filled.title,
+        artist=filled.artist,
+        thumbnail_url=filled.thumbnail_url,
+        platform_links=filled.platform_links,
+        fallback_platforms=filled.platform_links.keys() - resolved.platform_links.keys(),
+    )
+    # Editing the text drops the keyboard unless it's sent again, and people
+    # may have reacted since the first phase — re-read the counts.
+    view = await repo.get_chat_song(mention.chat_song_id)
+    keyboard = reaction_keyboard(
+        chat_song_id=mention.chat_song_id,
+        likes=view.likes if view else 0,
+        dislikes=view.dislikes if view else 0,
+    )
+    try:
+        await reply.edit_text(
+            share_message(song=filled, mention=mention),
+            parse_mode="HTML",
+            reply_markup=keyboard,
+            disable_web_page_preview=True,
+        )
+    except BadRequest as exc:
+        if "not modified" not in str(exc).lower():
+            logger.warning("Could not edit share message: %s", exc)
+
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     message = update.effective_message
     if message is None or not message.text:
@@ -87,45 +135,79 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     if _is_ignored(url):
         logger.info("Dropping URL on ignored-domain list: %s", url)
         return
-    if not _is_music_url(url):
+    url = canonicalize(url)
+    if not is_music_url(url):
         return
 
     songlink = get_songlink(context.bot_data)
     repo = get_repo(context.bot_data)
     fallback = get_fallback(context.bot_data)
 
-    resolved = await songlink.resolve(url)
-    if resolved is None:
-        logger.info("Could not resolve %s — staying silent", url)
+    # The reply goes out within `reply_deadline_seconds` or not at all. The
+    # lookups and writes run against a tighter copy, so sending the reply
+    # always has `reply_reserve_seconds` left.
+    deadline = Deadline.after(settings.reply_deadline_seconds)
+    lookup = deadline.reserve(settings.reply_reserve_seconds)
+    try:
+        known = await _find_known_song(repo, url, deadline=lookup)
+        if known is not None:
+            # Stored songs already went through the fallback fill when first seen.
+            resolved, song_id = known
+        else:
+            maybe_resolved = await songlink.resolve(url, fair_key=chat.id, deadline=lookup)
+            if maybe_resolved is None:
+                logger.info("Could not resolve %s — staying silent", url)
+                return
+            resolved = maybe_resolved
+        # One transaction, one commit, for everything a share writes.
+        async with repo.unit_of_work() as uow:
+            if known is None:
+                song_id = await repo.upsert_song(
+                    entity_id=resolved.entity_id,
+                    title=resolved.title,
+                    artist=resolved.artist,
+                    thumbnail_url=resolved.thumbnail_url,
+                    platform_links=resolved.platform_links,
+                    deadline=lookup,
+                    uow=uow,
+                )
+            mention = await repo.record_mention(
+                chat_id=chat.id,
+                song_id=song_id,
+                user_id=user.id,
+                user_name=_user_display_name(user.first_name, user.last_name),
+                deadline=lookup,
+                uow=uow,
+            )
+            await repo.touch_chat(chat_id=chat.id, title=chat.title, deadline=lookup, uow=uow)
+
+        text = share_message(song=resolved, mention=mention)
+        keyboard = reaction_keyboard(chat_song_id=mention.chat_song_id, likes=0, dislikes=0)
+        # The mention is committed now, so the reply goes out even if the
+        # writes ran late: dropping it would leave a counted share nobody
+        # sees. It gets at least the reserve to do so.
+        remaining = max(deadline.remaining(), settings.reply_reserve_seconds)
+        reply = await message.reply_html(
+            text,
+            reply_markup=keyboard,
+            disable_web_page_preview=True,
+            connect_timeout=remaining,
+            write_timeout=remaining,
+            read_timeout=remaining,
+        )
+    except DeadlineExceeded as exc:
+        logger.warning("Dropping share of %s: %s", url, exc)
         return
 
-    try:
-        resolved = await fallback.fill(resolved)
-    except Exception:
-        logger.exception("fallback resolver raised; using Songlink result as-is")
-
-    song_id = await repo.upsert_song(
-        entity_id=resolved.entity_id,
-        title=resolved.title,
-        artist=resolved.artist,
-        thumbnail_url=resolved.thumbnail_url,
-        platform_links=resolved.platform_links,
-    )
-    mention = await repo.record_mention(
-        chat_id=chat.id,
-        song_id=song_id,
-        user_id=user.id,
-        user_name=_user_display_name(user.first_name, user.last_name),
-    )
-    await repo.touch_chat(chat_id=chat.id, title=chat.title)
-
-    text = share_message(song=resolved, mention=mention)
-    keyboard = reaction_keyboard(chat_song_id=mention.chat_song_id, likes=0, dislikes=0)
-    await message.reply_html(
-        text,
-        reply_markup=keyboard,
-        disable_web_page_preview=True,
-    )
+    if known is None:
+        # Reply first, fill in the platforms Songlink missed afterwards.
+        context.application.create_task(
+            _fill_and_edit(
+                fallback=fallback, repo=repo, reply=reply, resolved=resolved, mention=mention
+            ),
+            update=update,
+            name=f"fallback-fill:{mention.chat_song_id}",
+        )
 
 
 message_handler = MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message)
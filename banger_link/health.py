@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import logging
+from collections.abc import Callable, Mapping
+from typing import Any
 
 from aiohttp import web
 
@@ -10,11 +12,23 @@ logger = logging.getLogger(__name__)
 
 
 class HealthServer:
-    """Tiny aiohttp /health endpoint used by Docker's healthcheck."""
-
-    def __init__(self, db: Database, port: int) -> None:
+    """Tiny aiohttp /health endpoint used by Docker's healthcheck.
+
+    `reporters` add named sections to the JSON body (upstream circuit state,
+    cache hit rates...). A reporter whose section says a circuit is open
+    turns the status into "degraded": the bot still answers, so the endpoint
+    stays 200 and Docker doesn't restart it for an upstream outage.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        port: int,
+        reporters: Mapping[str, Callable[[], Mapping[str, Any]]] | None = None,
+    ) -> None:
         self._db = db
         self._port = port
+        self._reporters = dict(reporters or {})
         self._runner: web.AppRunner | None = None
 
     async def start(self) -> None:
@@ -35,5 +49,15 @@ class HealthServer:
 
     async def _handler(self, request: web.Request) -> web.Response:
         ok = await self._db.healthcheck()
-        status = 200 if ok else 503
-        return web.json_response({"status": "ok" if ok else "fail"}, status=status)
+        body: dict[str, Any] = {"status": "ok" if ok else "fail"}
+        for name, reporter in self._reporters.items():
+            try:
+                section = reporter()
+            except Exception:
+                logger.exception("Health reporter %s raised", name)
+                continue
+            body[name] = section
+            circuit = section.get("circuit")
+            if ok and isinstance(circuit, Mapping) and circuit.get("state") != "closed":
+                body["status"] = "degraded"
+        return web.json_response(body, status=200 if ok else 503)
@@ -0,0 +1,52 @@
+"""Merge duplicate songs into one canonical row.
+
+New shares are already folded into an existing song when Songlink returns
+one of its platform IDs (see `Repo.upsert_song`), but rows stored before that
+stay split: the same track then shows up twice on a leaderboard with its
+votes divided. This job clusters the catalog on shared platform IDs
+(`services.identity.cluster_songs`) and merges each group into its oldest
+row, moving mentions and reactions along with it. A merge can't be undone,
+so songs that only match on title and artist are logged, not merged.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+
+from telegram.ext import Application, ContextTypes
+
+from banger_link.config import settings
+from banger_link.handlers._state import get_repo
+from banger_link.services.identity import cluster_songs, title_matches
+
+logger = logging.getLogger(__name__)
+
+
+async def merge_duplicate_songs(context: ContextTypes.DEFAULT_TYPE) -> None:
+    repo = get_repo(context.bot_data)
+    songs = await repo.song_identities()
+    for ids in title_matches(songs):
+        logger.info("Songs %s share a title and artist; not merging them.", ids)
+    clusters = cluster_songs(songs)
+    for canonical_id, *duplicate_ids in clusters:
+        await repo.merge_songs(canonical_id=canonical_id, duplicate_ids=duplicate_ids)
+    if clusters:
+        merged = sum(len(ids) - 1 for ids in clusters)
+        logger.info("Merged %d duplicate song(s) into %d.", merged, len(clusters))
+
+
+def schedule_dedupe(application: Application) -> None:
+    job_queue = application.job_queue
+    if job_queue is None:
+        logger.warning(
+            "JobQueue is not available — install the [job-queue] extra to enable song dedupe."
+        )
+        return
+    job_queue.run_repeating(
+        merge_duplicate_songs,
+        interval=timedelta(hours=settings.dedupe_interval_hours),
+        first=timedelta(minutes=5),
+        name="song-dedupe",
+    )
+    logger.info("Song dedupe scheduled every %s hour(s).", settings.dedupe_interval_hours)
@@ -0,0 +1,114 @@
+"""Stale-while-revalidate for the song catalog.
+
+The live path always answers from what's stored; this job keeps what's stored
+current in the background. Each run picks a small batch of songs whose links
+are old, or that are still missing one of `EXPECTED_PLATFORMS` (Songlink gaps
+the fallback search couldn't fill at share time), re-resolves them one at a
+time through the shared Songlink client and fallback resolver, and merges any
+new links into the row. Songlink is asked directly, past the resolution
+cache, with a link a fallback search didn't produce. Songs that come back
+unchanged are still stamped, so a song nobody can complete is retried on the
+slower clock, not every run.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import replace
+from datetime import UTC, datetime, timedelta
+
+from telegram.ext import Application, ContextTypes
+
+from banger_link.config import settings
+from banger_link.db.repo import StoredSong
+from banger_link.handlers._state import get_fallback, get_repo, get_songlink
+from banger_link.services.formatter import EXPECTED_PLATFORMS
+from banger_link.services.scheduler import Priority
+from banger_link.services.songlink import ResolvedSong
+
+logger = logging.getLogger(__name__)
+
+# One lookup at a time, queued behind live shares for the same budgets.
+REFRESH_CONCURRENCY = 1
+
+
+async def refresh_stale_songs(context: ContextTypes.DEFAULT_TYPE) -> None:
+    repo = get_repo(context.bot_data)
+    songlink = get_songlink(context.bot_data)
+    fallback = get_fallback(context.bot_data)
+
+    if not songlink.available:
+        logger.info("Songlink circuit is open; skipping song refresh.")
+        return
+
+    now = datetime.now(tz=UTC)
+    songs = await repo.songs_needing_refresh(
+        stale_before=now - timedelta(days=settings.refresh_stale_days),
+        incomplete_before=now - timedelta(hours=settings.refresh_incomplete_hours),
+        expected_platforms=EXPECTED_PLATFORMS,
+        limit=settings.refresh_batch_size,
+    )
+    if not songs:
+        return
+
+    # Songs sharing a link are asked about once. A song without a link to
+    # trust skips Songlink and only gets the fallback fill.
+    by_url: dict[str, list[StoredSong]] = {}
+    for stored in songs:
+        if (url := stored.refresh_url()) is not None:
+            by_url.setdefault(url, []).append(stored)
+    answers: dict[int, ResolvedSong] = {}
+    async for url, resolved in songlink.resolve_many(
+        by_url, concurrency=REFRESH_CONCURRENCY, priority=Priority.REFRESH, use_cache=False
+    ):
+        if resolved is not None:
+            for stored in by_url[url]:
+                answers[stored.id] = resolved
+
+    # Per song: the stored row, its links merged with Songlink's answer, and
+    # the platforms Songlink itself returned.
+    merged: dict[str, tuple[StoredSong, ResolvedSong, set[str]]] = {}
+    for stored in songs:
+        current = stored.to_resolved()
+        from_songlink: set[str] = set()
+        if (resolved := answers.get(stored.id)) is not None:
+            from_songlink = set(resolved.platform_links)
+            current = replace(
+                current,
+                thumbnail_url=resolved.thumbnail_url or current.thumbnail_url,
+                platform_links={**current.platform_links, **resolved.platform_links},
+            )
+        merged[current.entity_id] = (stored, current, from_songlink)
+
+    updated = 0
+    async for song, filled in fallback.fill_many(
+        (current for _, current, _ in merged.values()),
+        concurrency=REFRESH_CONCURRENCY,
+        priority=Priority.REFRESH,
+    ):
+        stored, _, from_songlink = merged[song.entity_id]
+        if filled.platform_links != stored.platform_links:
+            updated += 1
+        await repo.record_song_refresh(
+            song_id=stored.id,
+            thumbnail_url=filled.thumbnail_url,
+            platform_links=filled.platform_links,
+            fallback_platforms=filled.platform_links.keys() - from_songlink,
+        )
+    logger.info("Refreshed %d song(s), %d with new links.", len(merged), updated)
+
+
+def schedule_refresh(application: Application) -> None:
+    job_queue = application.job_queue
+    if job_queue is None:
+        logger.warning(
+            "JobQueue is not available — install the [job-queue] extra to enable song refresh."
+        )
+        return
+    job_queue.run_repeating(
+        refresh_stale_songs,
+        interval=timedelta(minutes=settings.refresh_interval_minutes),
+        first=timedelta(minutes=1),
+        name="song-refresh",
+    )
+    logger.info("Song refresh scheduled every %s minute(s).", settings.refresh_interval_minutes)
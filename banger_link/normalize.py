@@ -0,0 +1,65 @@
+"""Loose matching keys for song titles and artist names.
+
+Different platforms spell the same track differently: "Lust For Life",
+"Lust for Life - Remastered 2020", "lust for life (feat. Someone)",
+"Beyoncé" vs "Beyonce". These helpers reduce a title or artist to a key that
+stays the same across those variants, so lookups keyed by title and artist
+(the local catalog) hit regardless of who spelled it.
+
+The loose title key also drops edition markers ("Live at ...", "Radio Edit",
+"Remastered"), which makes it a lookup key, not an identity: a live take
+and the studio recording share it. `strict=True` keeps them, for when only
+the same recording will do (the fallback search cache and its in-flight
+searches).
+
+Keys are for comparison only. They're never shown to anyone, and a query
+sent upstream always uses the original spelling.
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+
+# "(feat. X)", "[ft. X]", "(with X)" and the like in titles.
+_FEATURING_GROUP = re.compile(r"[(\[]\s*(?:feat\.?|ft\.?|featuring|with)\s[^)\]]*[)\]]")
+# Trailing " - Remastered 2011", " - Radio Edit", " - Live at ..." in titles.
+_EDITION_SUFFIX = re.compile(
+    r"\s[-–—]\s.*\b(?:remaster(?:ed)?|version|edit|mix|live|mono|stereo|demo)\b.*$"
+)
+# Bracketed edition notes: "(Remastered 2011)", "[Radio Edit]".
+_EDITION_GROUP = re.compile(
+    r"[(\[][^)\]]*\b(?:remaster(?:ed)?|version|edit|mono|stereo|deluxe)\b[^)\]]*[)\]]"
+)
+# Featured artists tacked onto the artist field.
+_FEATURING_TAIL = re.compile(r"\s(?:feat\.?|ft\.?|featuring)\s.*$")
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def _fold(text: str) -> str:
+    """Casefold and strip diacritics ("Beyoncé" → "beyonce")."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def _squash(text: str) -> str:
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+def _fallback(folded: str) -> str:
+    # Never reduce a name to nothing: "(Untitled)" and "!!!" still need keys.
+    return _squash(folded) or " ".join(folded.split())
+
+
+def normalize_title(title: str, *, strict: bool = False) -> str:
+    folded = _fold(title)
+    if strict:
+        return _squash(_FEATURING_GROUP.sub("", folded)) or _fallback(folded)
+    stripped = _EDITION_SUFFIX.sub("", _EDITION_GROUP.sub("", _FEATURING_GROUP.sub("", folded)))
+    return _squash(stripped) or _fallback(folded)
+
+
+def normalize_artist(artist: str) -> str:
+    folded = _fold(artist)
+    stripped = _FEATURING_TAIL.sub("", folded).replace("&", " and ")
+    return _squash(stripped) or _fallback(folded)
@@ -0,0 +1,49 @@
+"""Run one coroutine per item with a concurrency cap, yielding in completion order.
+
+The building block behind `SonglinkClient.resolve_many` and
+`FallbackResolver.fill_many`. Items are pulled from the iterable lazily, so a
+long input (a whole chat export) never has more than `concurrency` tasks alive
+at once, and results stream out as soon as they're ready instead of after the
+slowest one. Pacing against upstream limits is not handled here — the clients
+already share a `RateLimiter`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+
+
+async def bounded_map[T, R](
+    items: Iterable[T],
+    fn: Callable[[T], Awaitable[R]],
+    *,
+    concurrency: int,
+) -> AsyncIterator[tuple[T, R]]:
+    """Yield `(item, await fn(item))` pairs as each call completes.
+
+    An exception from `fn` propagates out of the iterator; callers that want
+    per-item failure handling should catch inside `fn`. Closing the iterator
+    early cancels whatever is still running.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+
+    async def tagged(item: T) -> tuple[T, R]:
+        return item, await fn(item)
+
+    pending: set[asyncio.Task[tuple[T, R]]] = set()
+    try:
+        for item in items:
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+            pending.add(asyncio.ensure_future(tagged(item)))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
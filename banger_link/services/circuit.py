@@ -0,0 +1,137 @@
+"""Circuit breaker for an upstream that may be slow or down.
+
+While api.song.link is unhealthy every message would otherwise sit through
+the full timeout × retries before giving up, piling up handler coroutines.
+The breaker tracks consecutive failures and, past a threshold, *opens*:
+callers are turned away immediately for `reset_timeout` seconds. After that
+it goes *half-open* and lets a limited number of probe requests through —
+a successful probe closes the circuit again, a failed one re-opens it.
+
+A probe that never reports back (its caller was cancelled, or ran out of
+time before sending) must hand its slot back with `release_probe`. Slots
+still held after `probe_timeout` are freed anyway, so one lost probe can't
+keep the circuit half-open for good.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections.abc import Callable
+from enum import StrEnum
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(StrEnum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        *,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        half_open_probes: int = 1,
+        probe_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._name = name
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._half_open_probes = half_open_probes
+        self._probe_timeout = probe_timeout
+        self._clock = clock
+        self._state = CircuitState.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probes: list[float] = []  # start time of each probe in flight
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> CircuitState:
+        if (
+            self._state is CircuitState.OPEN
+            and self._clock() - self._opened_at >= self._reset_timeout
+        ):
+            self._state = CircuitState.HALF_OPEN
+            self._probes.clear()
+            logger.info("%s circuit half-open; probing", self._name)
+        return self._state
+
+    def ready(self) -> bool:
+        """Whether `allow` would let a request through now, without taking a
+        probe slot. For callers that have more waiting to do before sending."""
+        state = self.state
+        if state is CircuitState.CLOSED or (
+            state is CircuitState.HALF_OPEN and self._free_probe_slots() > 0
+        ):
+            return True
+        self.rejected += 1
+        return False
+
+    def allow(self) -> bool:
+        """Whether a request may go out now. Every True must be followed by
+        `record_success`, `record_failure` or `release_probe`, so half-open
+        probe slots get handed back."""
+        state = self.state
+        if state is CircuitState.CLOSED:
+            return True
+        if state is CircuitState.HALF_OPEN and self._free_probe_slots() > 0:
+            self._probes.append(self._clock())
+            return True
+        self.rejected += 1
+        return False
+
+    def release_probe(self) -> None:
+        """Hand back a slot from `allow` without a verdict on the upstream."""
+        if self._state is CircuitState.HALF_OPEN and self._probes:
+            self._probes.pop(0)
+
+    def _free_probe_slots(self) -> int:
+        cutoff = self._clock() - self._probe_timeout
+        stale = sum(1 for started in self._probes if started <= cutoff)
+        if stale:
+            logger.warning("%s circuit dropping %d probe(s) that never reported", self._name, stale)
+            del self._probes[:stale]
+        return self._half_open_probes - len(self._probes)
+
+    def record_success(self) -> None:
+        if self._state is not CircuitState.CLOSED:
+            logger.info("%s circuit closed", self._name)
+        self._state = CircuitState.CLOSED
+        self._consecutive_failures = 0
+        self._probes.clear()
+
+    def record_failure(self) -> None:
+        self._consecutive_failures += 1
+        if self._state is CircuitState.HALF_OPEN or (
+            self._state is CircuitState.CLOSED
+            and self._consecutive_failures >= self._failure_threshold
+        ):
+            self._trip()
+
+    def _trip(self) -> None:
+        self._state = CircuitState.OPEN
+        self._opened_at = self._clock()
+        self._probes.clear()
+        self.times_opened += 1
+        logger.warning(
+            "%s circuit open after %d consecutive failures; shedding load for %.0fs",
+            self._name,
+            self._consecutive_failures,
+            self._reset_timeout,
+        )
+
+    def snapshot(self) -> dict[str, object]:
+        return {
+            "state": str(self.state),
+            "consecutive_failures": self._consecutive_failures,
+            "rejected": self.rejected,
+            "times_opened": self.times_opened,
+        }
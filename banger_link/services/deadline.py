@@ -0,0 +1,71 @@
+"""Per-update time budget, passed down the message pipeline.
+
+`handle_message` starts a `Deadline` when an update arrives and hands it (or a
+tighter `reserve`d copy) to every stage. Each stage then sizes its own work
+to what's left instead of to its private timeout: Songlink attempts get
+`timeout(8.0)` rather than a flat 8s and skip retries that can't finish,
+fallback searches still running at the deadline are cancelled, and the
+Telegram reply is sent with whatever remains. When the budget is gone, stages
+raise `DeadlineExceeded` instead of starting work nobody will wait for.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+
+class DeadlineExceeded(TimeoutError):
+    """The update's time budget ran out before this stage could finish."""
+
+
+@dataclass(frozen=True, slots=True)
+class Deadline:
+    expires_at: float
+    clock: Callable[[], float] = field(default=time.monotonic, repr=False, compare=False)
+
+    @classmethod
+    def after(cls, seconds: float, *, clock: Callable[[], float] = time.monotonic) -> Deadline:
+        return cls(expires_at=clock() + seconds, clock=clock)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - self.clock())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, default: float) -> float:
+        """`default`, shrunk to fit what's left of the budget."""
+        return min(default, self.remaining())
+
+    def reserve(self, seconds: float) -> Deadline:
+        """A deadline `seconds` earlier, keeping that much back for later stages."""
+        return Deadline(expires_at=self.expires_at - seconds, clock=self.clock)
+
+    def check(self, stage: str) -> None:
+        if self.expired:
+            raise DeadlineExceeded(f"no time left for {stage}")
+
+    @asynccontextmanager
+    async def scope(self, stage: str) -> AsyncIterator[None]:
+        """Cancel the block when the deadline passes, as DeadlineExceeded."""
+        self.check(stage)
+        try:
+            async with asyncio.timeout(self.remaining()):
+                yield
+        except TimeoutError as exc:
+            if not self.expired or isinstance(exc, DeadlineExceeded):
+                raise
+            raise DeadlineExceeded(f"ran out of time in {stage}") from exc
+
+    async def run[T](self, aw: Awaitable[T], stage: str) -> T:
+        """Await `aw` within the deadline (see `scope`)."""
+        if self.expired and inspect.iscoroutine(aw):
+            aw.close()  # never started; don't leave it un-awaited
+        async with self.scope(stage):
+            return await aw
@@ -15,18 +15,35 @@ footer covers the user-facing UX.
 from __future__ import annotations
 
 import asyncio
+import functools
 import hmac
+import json
 import logging
+import os
 import struct
 import time
+from collections.abc import AsyncIterator, Awaitable, Hashable, Iterable, Mapping
+from contextlib import suppress
 from dataclasses import replace
-from typing import Any
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, ClassVar
 from urllib.parse import quote_plus
 
 import httpx
 
+from banger_link.normalize import normalize_artist, normalize_title
+from banger_link.services.batch import bounded_map
+from banger_link.services.deadline import Deadline, DeadlineExceeded
+from banger_link.services.latency import LatencyTracker
+from banger_link.services.scheduler import Priority, WorkScheduler
+from banger_link.services.singleflight import SingleFlight
 from banger_link.services.songlink import ResolvedSong
 
+if TYPE_CHECKING:
+    from banger_link.db.repo import Repo
+    from banger_link.services.quota import QuotaLedger
+    from banger_link.services.search_cache import SearchCache
+
 logger = logging.getLogger(__name__)
 
 # Platforms the resolver knows how to fill. The bot's `EXPECTED_PLATFORMS`
@@ -93,6 +110,7 @@ _SPOTIFY_TOTP_CIPHER: tuple[int, ...] = (
 _SPOTIFY_TOTP_WIRE_VERSION: int = 5
 
 
+@functools.cache
 def _spotify_totp_secret() -> bytes:
     """Deobfuscate the cipher into the HMAC secret used by Spotify's web player."""
     transformed = [byte ^ ((i % 33) + 9) for i, byte in enumerate(_SPOTIFY_TOTP_CIPHER)]
@@ -114,13 +132,79 @@ def _spotify_totp(now: float) -> str:
 
 
 class _SubClient:
-    """Common shape for fallback sub-clients: own `httpx.AsyncClient`, search."""
+    """Common shape for fallback sub-clients: own `httpx.AsyncClient`, search.
+
+    `search` answers from the `SearchCache` when it can and only calls
+    `_lookup` (the HTTP part) on a miss. `_lookup` reports whether its answer
+    is definitive — a result or a clean "no results" — so transient failures
+    are never cached as misses.
+
+    Search requests go through `_get`, which times them. Once enough samples
+    are in, each request's timeout is a multiple of the provider's recent
+    p99 (clamped to [MIN_TIMEOUT, DEFAULT_TIMEOUT]) instead of a flat 8s, so
+    a provider that normally answers in 300ms gives up on a stuck request
+    after a second or two. Timed-out requests count at their full duration,
+    so a provider that is slow across the board pushes its own timeout back
+    up rather than timing out forever.
+    """
+
+    platform: ClassVar[str]
+    DEFAULT_TIMEOUT: ClassVar[float] = 8.0
+    MIN_TIMEOUT: ClassVar[float] = 1.0
+    TIMEOUT_PERCENTILE: ClassVar[float] = 0.99
+    TIMEOUT_MULTIPLIER: ClassVar[float] = 2.0
 
     enabled: bool
+    latency: LatencyTracker
+    _client: httpx.AsyncClient
+    _cache: SearchCache | None = None
+
+    def request_timeout(self) -> float:
+        estimate = self.latency.percentile(self.TIMEOUT_PERCENTILE)
+        if estimate is None:
+            return self.DEFAULT_TIMEOUT
+        return min(self.DEFAULT_TIMEOUT, max(self.MIN_TIMEOUT, estimate * self.TIMEOUT_MULTIPLIER))
+
+    async def _get(self, url: str, **kwargs: Any) -> httpx.Response:
+        started = time.monotonic()
+        try:
+            response = await self._client.get(url, timeout=self.request_timeout(), **kwargs)
+        except asyncio.CancelledError:
+            raise  # a cut-off straggler says nothing about the provider
+        except Exception:
+            self.latency.record(time.monotonic() - started)
+            raise
+        self.latency.record(time.monotonic() - started)
+        return response
+
+    async def search(
+        self, *, title: str, artist: str, priority: Priority = Priority.LIVE
+    ) -> str | None:
+        if self._cache is not None:
+            hit = await self._cache.get(self.platform, title=title, artist=artist)
+            if hit is not None:
+                return hit.url
+        if not await self._admit(priority):
+            return None
+        url, definitive = await self._lookup(title=title, artist=artist)
+        if definitive and self._cache is not None:
+            await self._cache.put(self.platform, title=title, artist=artist, url=url)
+        return url
 
-    async def search(self, *, title: str, artist: str) -> str | None:
+    async def _lookup(self, *, title: str, artist: str) -> tuple[str | None, bool]:
         raise NotImplementedError
 
+    async def _admit(self, priority: Priority) -> bool:
+        """Whether a `priority` search may go upstream now (metered providers say no
+        once their budget is spent)."""
+        return True
+
+    def stats(self) -> dict[str, object]:
+        return {
+            "timeout_s": round(self.request_timeout(), 2),
+            "latency": self.latency.stats(),
+        }
+
     async def aclose(self) -> None:
         raise NotImplementedError
 
@@ -141,13 +225,32 @@ class SpotifyAnonymousClient(_SubClient):
     Spotify retired the older `/get_access_token` endpoint (Varnish 403 URL
     Blocked) in favor of `/api/token` with a TOTP query parameter. See the
     `_spotify_totp` helper in this module for the secret-rotation pointer.
+
+    With `token_path` the token survives restarts, and after `start()` a
+    background task renews it `REFRESH_AHEAD` seconds before it expires, so
+    searches never wait on the token endpoint: without a usable token they
+    just come back empty-handed. Without a running refresher (tests, the
+    importer) the token is fetched lazily on the first search that needs it.
     """
 
+    platform = "spotify"
     TOKEN_URL = "https://open.spotify.com/api/token"
     SEARCH_URL = "https://api.spotify.com/v1/search"
+    # Renew this long before the stated expiry (tokens last about an hour).
+    REFRESH_AHEAD = 300.0
+    # Back-off between failed background refreshes.
+    RETRY_MIN = 5.0
+    RETRY_MAX = 300.0
 
-    def __init__(self, *, client: httpx.AsyncClient | None = None) -> None:
+    def __init__(
+        self,
+        *,
+        client: httpx.AsyncClient | None = None,
+        cache: SearchCache | None = None,
+        token_path: Path | None = None,
+    ) -> None:
         self.enabled = True
+        self._cache = cache
         self._client = client or httpx.AsyncClient(
             timeout=httpx.Timeout(8.0),
             headers={
@@ -160,19 +263,70 @@ class SpotifyAnonymousClient(_SubClient):
             },
         )
         self._owns_client = client is None
+        self.latency = LatencyTracker()
         self._token: str | None = None
         self._expires_at: float = 0.0
         self._lock = asyncio.Lock()
+        self._token_path = token_path
+        self._refresher: asyncio.Task[None] | None = None
+        self._wake = asyncio.Event()
+        self.refreshes = 0
+        self.refresh_failures = 0
+        if token_path is not None:
+            self._load_token(token_path)
+
+    def start(self) -> None:
+        """Start renewing the token in the background. Idempotent."""
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.create_task(
+                self._refresh_loop(), name="spotify-token-refresh"
+            )
 
     async def aclose(self) -> None:
+        if self._refresher is not None:
+            self._refresher.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._refresher
         if self._owns_client:
             await self._client.aclose()
 
+    def _usable(self, margin: float) -> bool:
+        return self._token is not None and time.time() < self._expires_at - margin
+
     async def _bearer(self) -> str | None:
+        # Refresh ~30s before stated expiry so a request never lands on a
+        # just-expired token.
+        if self._usable(30):
+            return self._token
+        if self._refresher is not None and not self._refresher.done():
+            return None  # the refresher is on it; don't hold the search up
+        return await self._fetch_token(margin=30)
+
+    async def _refresh_loop(self) -> None:
+        failures = 0
+        while True:
+            if not self._usable(self.REFRESH_AHEAD):
+                if await self._fetch_token(margin=self.REFRESH_AHEAD) is not None:
+                    failures = 0
+                    self.refreshes += 1
+                else:
+                    failures += 1
+                    self.refresh_failures += 1
+            if failures:
+                delay = min(self.RETRY_MAX, self.RETRY_MIN * 2 ** (failures - 1))
+            else:
+                # Short-lived tokens would otherwise have us spinning.
+                delay = max(self.RETRY_MIN, self._expires_at - self.REFRESH_AHEAD - time.time())
+            self._wake.clear()
+            # A 401 on search wakes us early to replace the revoked token.
+            with suppress(TimeoutError):
+                async with asyncio.timeout(delay):
+                    await self._wake.wait()
+
+    async def _fetch_token(self, *, margin: float) -> str | None:
         async with self._lock:
-            # Refresh ~30s before stated expiry so a request never lands on a
-            # just-expired token.
-            if self._token is not None and time.time() < self._expires_at - 30:
+            # Someone else may have refreshed while we waited for the lock.
+            if self._usable(margin):
                 return self._token
             now = time.time()
             params = {
@@ -206,41 +360,79 @@ class SpotifyAnonymousClient(_SubClient):
                 return None
             self._token = access_token
             self._expires_at = expires_ms / 1000.0
-            return self._token
+        if self._token_path is not None:
+            await asyncio.to_thread(
+                self._save_token, self._token_path, access_token, self._expires_at
+            )
+        return access_token
 
-    async def search(self, *, title: str, artist: str) -> str | None:
+    def _load_token(self, path: Path) -> None:
+        try:
+            stored = json.loads(path.read_text(encoding="utf-8"))
+            token, expires_at = stored["access_token"], float(stored["expires_at"])
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            logger.warning("ignoring unreadable spotify token file %s: %s", path, exc)
+            return
+        if isinstance(token, str) and token:
+            self._token = token
+            self._expires_at = expires_at
+
+    @staticmethod
+    def _save_token(path: Path, token: str, expires_at: float) -> None:
+        # Write-then-rename so a crash mid-write never leaves half a token.
+        tmp = path.with_name(path.name + ".tmp")
+        try:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump({"access_token": token, "expires_at": expires_at}, fh)
+            os.replace(tmp, path)
+        except OSError as exc:
+            logger.warning("could not persist spotify token to %s: %s", path, exc)
+
+    def stats(self) -> dict[str, object]:
+        return {
+            **super().stats(),
+            "token_ttl_s": max(0, round(self._expires_at - time.time())) if self._token else 0,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+        }
+
+    async def _lookup(self, *, title: str, artist: str) -> tuple[str | None, bool]:
         token = await self._bearer()
         if token is None:
-            return None
+            return None, False
         query = f'track:"{title}" artist:"{artist}"'
         try:
-            response = await self._client.get(
+            response = await self._get(
                 self.SEARCH_URL,
                 params={"q": query, "type": "track", "limit": "1"},
                 headers={"Authorization": f"Bearer {token}"},
             )
         except httpx.HTTPError as exc:
             logger.warning("spotify search transport error for %r: %s", query, exc)
-            return None
+            return None, False
         if response.status_code == 401:
             # Token went bad early — invalidate and let the next call refresh.
             self._token = None
             self._expires_at = 0.0
+            self._wake.set()
             logger.info("spotify search 401, token invalidated")
-            return None
+            return None, False
         if not response.is_success:
             logger.warning("spotify search HTTP %d for %r", response.status_code, query)
-            return None
+            return None, False
         try:
             payload = response.json()
         except ValueError:
-            return None
+            return None, False
         items: list[dict[str, Any]] = payload.get("tracks", {}).get("items") or []
         if not items:
-            return None
+            return None, True
         external = items[0].get("external_urls", {}) or {}
         url = external.get("spotify")
-        return url if isinstance(url, str) and url else None
+        return (url if isinstance(url, str) and url else None), True
 
 
 # ---------------------------------------------------------------------------
@@ -251,25 +443,34 @@ class SpotifyAnonymousClient(_SubClient):
 class ITunesSearchClient(_SubClient):
     """No-auth iTunes search; `trackViewUrl` is already a music.apple.com URL."""
 
+    platform = "appleMusic"
     SEARCH_URL = "https://itunes.apple.com/search"
 
-    def __init__(self, *, country: str = "US", client: httpx.AsyncClient | None = None) -> None:
+    def __init__(
+        self,
+        *,
+        country: str = "US",
+        client: httpx.AsyncClient | None = None,
+        cache: SearchCache | None = None,
+    ) -> None:
         self.enabled = True
+        self._cache = cache
         self._country = country
         self._client = client or httpx.AsyncClient(
             timeout=httpx.Timeout(8.0),
             headers={"User-Agent": DEFAULT_UA, "Accept": "application/json"},
         )
         self._owns_client = client is None
+        self.latency = LatencyTracker()
 
     async def aclose(self) -> None:
         if self._owns_client:
             await self._client.aclose()
 
-    async def search(self, *, title: str, artist: str) -> str | None:
+    async def _lookup(self, *, title: str, artist: str) -> tuple[str | None, bool]:
         term = f"{title} {artist}".strip()
         try:
-            response = await self._client.get(
+            response = await self._get(
                 self.SEARCH_URL,
                 params={
                     "term": term,
@@ -280,19 +481,19 @@ class ITunesSearchClient(_SubClient):
             )
         except httpx.HTTPError as exc:
             logger.warning("itunes search transport error for %r: %s", term, exc)
-            return None
+            return None, False
         if not response.is_success:
             logger.warning("itunes search HTTP %d for %r", response.status_code, term)
-            return None
+            return None, False
         try:
             payload = response.json()
         except ValueError:
-            return None
+            return None, False
         results: list[dict[str, Any]] = payload.get("results") or []
         if not results:
-            return None
+            return None, True
         url = results[0].get("trackViewUrl")
-        return url if isinstance(url, str) and url else None
+        return (url if isinstance(url, str) and url else None), True
 
 
 # ---------------------------------------------------------------------------
@@ -301,32 +502,54 @@ class ITunesSearchClient(_SubClient):
 
 
 class YouTubeSearchClient(_SubClient):
+    platform = "youtube"
     SEARCH_URL = "https://www.googleapis.com/youtube/v3/search"
+    # Data API units charged per search.list call, hit or miss.
+    SEARCH_COST = 100
 
     def __init__(
         self,
         *,
         api_key: str | None,
         client: httpx.AsyncClient | None = None,
+        cache: SearchCache | None = None,
+        quota: QuotaLedger | None = None,
     ) -> None:
         self.enabled = bool(api_key)
+        self._cache = cache
+        self._quota = quota
         self._api_key = api_key
         self._client = client or httpx.AsyncClient(
             timeout=httpx.Timeout(8.0),
             headers={"User-Agent": DEFAULT_UA, "Accept": "application/json"},
         )
         self._owns_client = client is None
+        self.latency = LatencyTracker()
 
     async def aclose(self) -> None:
         if self._owns_client:
             await self._client.aclose()
 
-    async def search(self, *, title: str, artist: str) -> str | None:
+    async def _admit(self, priority: Priority) -> bool:
+        if self._quota is None:
+            return True
+        if await self._quota.try_spend(self.SEARCH_COST, priority=priority):
+            return True
+        logger.info("youtube quota left for %s work is spent; skipping search", priority.name)
+        return False
+
+    def stats(self) -> dict[str, object]:
+        stats = super().stats()
+        if self._quota is not None:
+            stats["quota"] = self._quota.stats()
+        return stats
+
+    async def _lookup(self, *, title: str, artist: str) -> tuple[str | None, bool]:
         if not self.enabled or self._api_key is None:
-            return None
+            return None, False
         query = f"{title} {artist}".strip()
         try:
-            response = await self._client.get(
+            response = await self._get(
                 self.SEARCH_URL,
                 params={
                     "part": "snippet",
@@ -338,21 +561,35 @@ class YouTubeSearchClient(_SubClient):
             )
         except httpx.HTTPError as exc:
             logger.warning("youtube search transport error for %r: %s", query, exc)
-            return None
+            return None, False
         if not response.is_success:
+            # Includes 403 quotaExceeded: not an answer about this track.
             logger.warning("youtube search HTTP %d for %r", response.status_code, query)
-            return None
+            if self._quota is not None and _youtube_quota_exceeded(response):
+                await self._quota.exhaust()
+            return None, False
         try:
             payload = response.json()
         except ValueError:
-            return None
+            return None, False
         items: list[dict[str, Any]] = payload.get("items") or []
         if not items:
-            return None
+            return None, True
         video_id = (items[0].get("id") or {}).get("videoId")
         if not isinstance(video_id, str) or not video_id:
-            return None
-        return f"https://www.youtube.com/watch?v={quote_plus(video_id)}"
+            return None, True
+        return f"https://www.youtube.com/watch?v={quote_plus(video_id)}", True
+
+
+def _youtube_quota_exceeded(response: httpx.Response) -> bool:
+    if response.status_code != 403:
+        return False
+    try:
+        errors = response.json()["error"]["errors"]
+    except (ValueError, KeyError, TypeError):
+        return False
+    reasons = {e.get("reason") for e in errors if isinstance(e, dict)}
+    return bool(reasons & {"quotaExceeded", "dailyLimitExceeded"})
 
 
 # ---------------------------------------------------------------------------
@@ -362,7 +599,13 @@ class YouTubeSearchClient(_SubClient):
 
 class FallbackResolver:
     """Augment a `ResolvedSong` with whichever of spotify/appleMusic/youtube
-    Songlink didn't return."""
+    Songlink didn't return.
+
+    With a `catalog`, the links Songlink returned for songs already stored
+    under the same title and artist (same edition, too) are checked first,
+    and fill what they can with no network at all. Only the platforms still
+    missing after that are searched.
+    """
 
     def __init__(
         self,
@@ -370,52 +613,87 @@ class FallbackResolver:
         spotify: SpotifyAnonymousClient | None = None,
         itunes: ITunesSearchClient | None = None,
         youtube: YouTubeSearchClient | None = None,
+        schedulers: Mapping[str, WorkScheduler] | None = None,
+        catalog: Repo | None = None,
     ) -> None:
         self._spotify = spotify
         self._itunes = itunes
         self._youtube = youtube
+        # Per-platform admission (keyed like FALLBACK_PLATFORMS); platforms
+        # without one search unthrottled.
+        self._schedulers = dict(schedulers or {})
+        # Keyed like the search cache, so simultaneous fills for the same song
+        # (however each platform spelled it) share one search per provider.
+        # Live and background searches don't share: a quota ledger may refuse
+        # a background search that a live share is still entitled to.
+        self._flights: SingleFlight[tuple[str, str, str, bool], str | None] = SingleFlight()
+        self._catalog = catalog
+        self.catalog_hits = 0
+
+    def _clients(self) -> list[tuple[str, _SubClient]]:
+        pairs = (
+            ("spotify", self._spotify),
+            ("appleMusic", self._itunes),
+            ("youtube", self._youtube),
+        )
+        return [(platform, client) for platform, client in pairs if client is not None]
 
     async def aclose(self) -> None:
-        for sub in (self._spotify, self._itunes, self._youtube):
-            if sub is not None:
-                await sub.aclose()
+        for _, sub in self._clients():
+            await sub.aclose()
 
-    async def fill(self, resolved: ResolvedSong) -> ResolvedSong:
+    async def fill(
+        self,
+        resolved: ResolvedSong,
+        *,
+        priority: Priority = Priority.LIVE,
+        fair_key: Hashable = None,
+        deadline: Deadline | None = None,
+        budget: float | None = None,
+    ) -> ResolvedSong:
+        """Search for the platforms missing from `resolved` and merge in what's found.
+
+        With a `deadline` (or a `budget` in seconds from now; the earlier of
+        the two wins), searches still running when it passes are cancelled
+        and the song comes back with whatever finished in time. Platforms
+        left missing are picked up again by the background song refresh.
+        """
         title = resolved.title
         artist = resolved.artist
         if not title or not artist:
             return resolved
+        if budget is not None:
+            capped = Deadline.after(budget)
+            if deadline is None or capped.expires_at < deadline.expires_at:
+                deadline = capped
 
-        # Run only the missing-platform searches, in parallel.
-        wants: list[tuple[str, _SubClient]] = []
-        if (
-            "spotify" not in resolved.platform_links
-            and self._spotify is not None
-            and self._spotify.enabled
-        ):
-            wants.append(("spotify", self._spotify))
-        if (
-            "appleMusic" not in resolved.platform_links
-            and self._itunes is not None
-            and self._itunes.enabled
-        ):
-            wants.append(("appleMusic", self._itunes))
-        if (
-            "youtube" not in resolved.platform_links
-            and self._youtube is not None
-            and self._youtube.enabled
-        ):
-            wants.append(("youtube", self._youtube))
-        if not wants:
+        missing = [p for p in FALLBACK_PLATFORMS if p not in resolved.platform_links]
+        if not missing:
             return resolved
+        new_links = dict(resolved.platform_links)
+        if self._catalog is not None:
+            new_links.update(await self._from_catalog(title, artist, missing, deadline))
+
+        # Search only for what's still missing, in parallel.
+        wants = [
+            (platform, client)
+            for platform, client in self._clients()
+            if platform not in new_links and client.enabled
+        ]
+
+        def search(platform: str, client: _SubClient) -> Awaitable[str | None]:
+            aw = self._search(platform, client, title, artist, priority, fair_key)
+            return aw if deadline is None else deadline.run(aw, f"{platform} search")
 
         results = await asyncio.gather(
-            *(client.search(title=title, artist=artist) for _, client in wants),
+            *(search(platform, client) for platform, client in wants),
             return_exceptions=True,
         )
 
-        new_links = dict(resolved.platform_links)
         for (platform, _), result in zip(wants, results, strict=True):
+            if isinstance(result, DeadlineExceeded):
+                logger.info("fallback %s cut off by the deadline: %s", platform, result)
+                continue
             if isinstance(result, BaseException):
                 logger.warning("fallback %s raised: %s", platform, result)
                 continue
@@ -426,3 +704,79 @@ class FallbackResolver:
         if new_links == resolved.platform_links:
             return resolved
         return replace(resolved, platform_links=new_links)
+
+    async def _from_catalog(
+        self, title: str, artist: str, missing: list[str], deadline: Deadline | None
+    ) -> dict[str, str]:
+        assert self._catalog is not None
+        try:
+            known = await self._catalog.catalog_links(title=title, artist=artist, deadline=deadline)
+        except Exception:
+            logger.exception("catalog lookup failed for %s — %s", title, artist)
+            return {}
+        found = {platform: known[platform] for platform in missing if platform in known}
+        if found:
+            self.catalog_hits += len(found)
+            logger.info("filled %s from the catalog for %s — %s", ", ".join(found), title, artist)
+        return found
+
+    async def fill_many(
+        self,
+        songs: Iterable[ResolvedSong],
+        *,
+        concurrency: int = 4,
+        priority: Priority = Priority.LIVE,
+        fair_key: Hashable = None,
+        deadline: Deadline | None = None,
+    ) -> AsyncIterator[tuple[ResolvedSong, ResolvedSong]]:
+        """`fill` a batch of songs, yielding `(original, filled)` in completion order.
+
+        At most `concurrency` songs are searched at once (each may run up to
+        three provider searches). A fill that raises yields the song unchanged.
+        """
+
+        async def fill_one(song: ResolvedSong) -> ResolvedSong:
+            try:
+                return await self.fill(
+                    song, priority=priority, fair_key=fair_key, deadline=deadline
+                )
+            except Exception:
+                logger.exception("fallback fill failed for %s — %s", song.title, song.artist)
+                return song
+
+        async for song, filled in bounded_map(songs, fill_one, concurrency=concurrency):
+            yield song, filled
+
+    async def _search(
+        self,
+        platform: str,
+        client: _SubClient,
+        title: str,
+        artist: str,
+        priority: Priority,
+        fair_key: Hashable,
+    ) -> str | None:
+        async def run() -> str | None:
+            scheduler = self._schedulers.get(platform)
+            if scheduler is None:
+                return await client.search(title=title, artist=artist, priority=priority)
+            async with scheduler.slot(priority, key=fair_key):
+                return await client.search(title=title, artist=artist, priority=priority)
+
+        key = (
+            platform,
+            normalize_title(title, strict=True),
+            normalize_artist(artist),
+            priority is Priority.LIVE,
+        )
+        return await self._flights.do(key, run)
+
+    def stats(self) -> dict[str, object]:
+        stats: dict[str, object] = {
+            "catalog_hits": self.catalog_hits,
+            "single_flight": self._flights.stats(),
+            **{f"scheduler_{p}": s.stats() for p, s in self._schedulers.items()},
+        }
+        for platform, client in self._clients():
+            stats[platform] = client.stats()
+        return stats
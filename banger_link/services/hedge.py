@@ -0,0 +1,125 @@
+"""Hedged requests: race a second copy of a slow request against the first.
+
+Most Songlink answers come back in a few hundred milliseconds, but now and
+then one stalls until the client timeout. Rather than wait that out, the
+`Hedger` sends a backup request once the first has been outstanding longer
+than a high percentile of recent latencies, takes whichever response lands
+first and cancels the other.
+
+Hedges are paid for out of a budget: every primary request banks
+`budget_fraction` of a hedge (up to `max_banked`), and firing one spends a
+whole one. Over any stretch of traffic hedges therefore add at most that
+fraction of extra requests, even when the upstream is uniformly slow and
+every request would qualify.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+
+from banger_link.services.latency import LatencyTracker
+
+
+class Hedger:
+    def __init__(
+        self,
+        *,
+        latency: LatencyTracker | None = None,
+        percentile: float = 0.95,
+        budget_fraction: float = 0.05,
+        min_delay: float = 0.05,
+        max_banked: float = 10.0,
+    ) -> None:
+        self.latency = latency or LatencyTracker()
+        self._percentile = percentile
+        self._budget_fraction = budget_fraction
+        self._min_delay = min_delay
+        self._max_banked = max_banked
+        self._banked = 0.0
+        self.requests = 0
+        self.fired = 0
+        self.won = 0
+        self.skipped = 0
+
+    def delay(self) -> float | None:
+        """How long to wait on the primary before hedging; None while we have
+        too few samples to know what "slow" is."""
+        estimate = self.latency.percentile(self._percentile)
+        return None if estimate is None else max(self._min_delay, estimate)
+
+    async def run[T](
+        self,
+        fn: Callable[[], Awaitable[T]],
+        *,
+        may_hedge: Callable[[], bool] = lambda: True,
+    ) -> T:
+        """Await `fn()`, racing a second call if the first is slow.
+
+        `may_hedge` is asked right before the backup goes out — e.g. to take a
+        rate-limiter token without waiting. If either call raises, the other
+        one's result is used; only if both fail does the error propagate.
+        """
+        self.requests += 1
+        self._banked = min(self._max_banked, self._banked + self._budget_fraction)
+
+        primary = asyncio.ensure_future(self._timed(fn))
+        delay = self.delay()
+        if delay is None:
+            return await primary
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                return primary.result()
+            if self._banked < 1 or not may_hedge():
+                self.skipped += 1
+                return await primary
+            self._banked -= 1
+            self.fired += 1
+            backup = asyncio.ensure_future(self._timed(fn))
+            return await self._first_success(primary, backup)
+        except BaseException:
+            primary.cancel()
+            raise
+
+    async def _first_success[T](self, primary: asyncio.Future[T], backup: asyncio.Future[T]) -> T:
+        pending = {primary, backup}
+        error: BaseException | None = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if (error := task.exception()) is None:
+                        if task is backup:
+                            self.won += 1
+                        return task.result()
+            assert error is not None
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _timed[T](self, fn: Callable[[], Awaitable[T]]) -> T:
+        started = time.monotonic()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            raise  # a cancelled loser says nothing about upstream latency
+        except Exception:
+            # Failures count too: a timeout is the slowest sample there is.
+            self.latency.record(time.monotonic() - started)
+            raise
+        self.latency.record(time.monotonic() - started)
+        return result
+
+    def stats(self) -> dict[str, object]:
+        return {
+            "requests": self.requests,
+            "fired": self.fired,
+            "won": self.won,
+            "skipped": self.skipped,
+            "budget": round(self._banked, 2),
+            "delay_ms": None if (d := self.delay()) is None else round(d * 1000, 1),
+            "latency": self.latency.stats(),
+        }
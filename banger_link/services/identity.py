@@ -0,0 +1,90 @@
+"""Which stored songs are really the same track.
+
+Songlink's `entityUniqueId` is per platform entity, so one recording can end
+up as several `songs` rows: shared once from Spotify, once from a YouTube
+upload Songlink maps to a different entity. `cluster_songs` groups rows that
+share a platform track ID, transitively: if A shares a Spotify ID with B and
+B a Deezer ID with C, all three are one track.
+
+Only IDs Songlink vouched for count. A link that a fallback search may have
+found (see `FALLBACK_PLATFORMS`) is a title/artist guess and can point at
+another recording, so it only joins songs once Songlink returned it for that
+song itself. Title and artist alone never merge anything: the normalized keys
+drop "Live", "Remix" and edition markers, so they'd fold a live recording
+and its votes into the studio one. `title_matches` only reports those.
+
+The lowest ID in each group is the canonical row — it's the oldest, so it's
+the one most reply keyboards and leaderboards already point at.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+
+from banger_link.canonical import extract_platform_id
+from banger_link.db.repo import SongIdentity
+from banger_link.services.fallback_resolver import FALLBACK_PLATFORMS
+
+
+class _DisjointSet:
+    def __init__(self) -> None:
+        self._parent: dict[int, int] = {}
+
+    def find(self, item: int) -> int:
+        parent = self._parent.setdefault(item, item)
+        if parent != item:
+            parent = self._parent[item] = self.find(parent)
+        return parent
+
+    def members(self) -> list[int]:
+        return list(self._parent)
+
+    def union(self, a: int, b: int) -> None:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            # Keep the lower ID as the root so it ends up canonical.
+            self._parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+def _trusted_ids(song: SongIdentity) -> set[tuple[str, str]]:
+    ids = set()
+    for platform, url in song.platform_links.items():
+        key = extract_platform_id(url)
+        if key is not None and (platform not in FALLBACK_PLATFORMS or key in song.songlink_ids):
+            ids.add(key)
+    return ids
+
+
+def _group_by_ids(songs: Iterable[SongIdentity]) -> _DisjointSet:
+    groups = _DisjointSet()
+    owner: dict[tuple[str, str], int] = {}
+    for song in songs:
+        groups.find(song.id)
+        for key in _trusted_ids(song):
+            if key in owner:
+                groups.union(owner[key], song.id)
+            else:
+                owner[key] = song.id
+    return groups
+
+
+def cluster_songs(songs: Iterable[SongIdentity]) -> list[list[int]]:
+    """Group duplicate songs. Each group is sorted, canonical ID first; songs
+    with no duplicates are left out."""
+    groups = _group_by_ids(songs)
+    clusters: dict[int, list[int]] = {}
+    for song_id in groups.members():
+        clusters.setdefault(groups.find(song_id), []).append(song_id)
+    return sorted(sorted(ids) for ids in clusters.values() if len(ids) > 1)
+
+
+def title_matches(songs: Iterable[SongIdentity]) -> list[list[int]]:
+    """Songs with the same normalized title and artist that `cluster_songs`
+    keeps apart, by canonical ID. For a human to look at, never merged."""
+    songs = list(songs)
+    groups = _group_by_ids(songs)
+    by_title: dict[tuple[str, str], set[int]] = {}
+    for song in songs:
+        if song.title_key and song.artist_key:
+            by_title.setdefault((song.title_key, song.artist_key), set()).add(groups.find(song.id))
+    return sorted(sorted(ids) for ids in by_title.values() if len(ids) > 1)
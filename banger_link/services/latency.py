@@ -0,0 +1,60 @@
+"""Rolling latency estimates for an upstream.
+
+Keeps the last `window` samples for percentiles and an exponentially weighted
+moving average for a smoother "typical" figure. Both return None until
+`min_samples` have been recorded, so callers can tell "no data yet" apart
+from "fast" and fall back to their static defaults.
+"""
+
+from __future__ import annotations
+
+import math
+from collections import deque
+
+
+class LatencyTracker:
+    def __init__(self, *, window: int = 200, alpha: float = 0.2, min_samples: int = 20) -> None:
+        if window < 1 or not 0 < alpha <= 1:
+            raise ValueError("window must be at least 1 and alpha in (0, 1]")
+        self._samples: deque[float] = deque(maxlen=window)
+        self._alpha = alpha
+        self._min_samples = min_samples
+        self._ewma: float | None = None
+        self.count = 0
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self._ewma = (
+            seconds
+            if self._ewma is None
+            else self._alpha * seconds + (1 - self._alpha) * self._ewma
+        )
+        self.count += 1
+
+    @property
+    def ready(self) -> bool:
+        return len(self._samples) >= self._min_samples
+
+    @property
+    def ewma(self) -> float | None:
+        return self._ewma if self.ready else None
+
+    def percentile(self, q: float) -> float | None:
+        """Nearest-rank percentile (`q` in [0, 1]) over the current window."""
+        if not self.ready:
+            return None
+        ordered = sorted(self._samples)
+        rank = max(1, math.ceil(q * len(ordered)))
+        return ordered[rank - 1]
+
+    def stats(self) -> dict[str, float | int | None]:
+        def ms(value: float | None) -> float | None:
+            return None if value is None else round(value * 1000, 1)
+
+        return {
+            "samples": self.count,
+            "ewma_ms": ms(self.ewma),
+            "p50_ms": ms(self.percentile(0.5)),
+            "p95_ms": ms(self.percentile(0.95)),
+            "p99_ms": ms(self.percentile(0.99)),
+        }
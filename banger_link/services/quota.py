@@ -0,0 +1,102 @@
+"""Daily API quota accounting, persisted so restarts don't forget what's spent.
+
+The YouTube Data API grants 10,000 units a day and charges 100 for every
+search, whatever it returns. Google resets the counter at midnight Pacific
+time, so the ledger keys each day's spend by the Pacific date. The
+reset happens on its own when that date changes.
+
+The daily budget is split in two. Background work (the song refresh,
+imports) may only spend down to `live_reserve`; the reserve itself is kept
+for live shares. Once a priority's share is gone, `try_spend` refuses
+without touching the database, and the caller skips the request entirely.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections.abc import Callable
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from banger_link.db.repo import Repo
+from banger_link.services.scheduler import Priority
+
+logger = logging.getLogger(__name__)
+
+# Google's quota day.
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+
+
+class QuotaLedger:
+    def __init__(
+        self,
+        repo: Repo,
+        *,
+        provider: str,
+        daily_budget: int,
+        live_reserve: int = 0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        if not 0 <= live_reserve <= daily_budget:
+            raise ValueError("live_reserve must be between 0 and daily_budget")
+        self._repo = repo
+        self._provider = provider
+        self._budget = daily_budget
+        self._reserve = live_reserve
+        self._clock = clock
+        self._day = ""
+        self._used = 0
+        self.refused = 0
+
+    def _today(self) -> str:
+        return datetime.fromtimestamp(self._clock(), tz=QUOTA_TIMEZONE).date().isoformat()
+
+    def _limit(self, priority: Priority) -> int:
+        return self._budget if priority is Priority.LIVE else self._budget - self._reserve
+
+    async def load(self) -> None:
+        """Pick up today's spend from the database (call once at startup)."""
+        self._day = self._today()
+        self._used = await self._repo.get_quota_used(provider=self._provider, day=self._day)
+
+    async def try_spend(self, units: int, *, priority: Priority = Priority.LIVE) -> bool:
+        """Record `units` against today's budget, or return False if `priority`'s
+        share can't cover them."""
+        today = self._today()
+        if today != self._day:
+            await self.load()
+        limit = self._limit(priority)
+        if self._used + units > limit:
+            self.refused += 1
+            return False
+        used = await self._repo.spend_quota(
+            provider=self._provider, day=today, units=units, limit=limit
+        )
+        if used is None:
+            # Another writer got there first; resync and refuse.
+            self._used = await self._repo.get_quota_used(provider=self._provider, day=today)
+            self.refused += 1
+            return False
+        self._used = used
+        return True
+
+    async def exhaust(self) -> None:
+        """Mark today's quota as used up — the upstream said so, whatever we counted."""
+        self._day = self._today()
+        self._used = await self._repo.fill_quota(
+            provider=self._provider, day=self._day, units=self._budget
+        )
+        logger.warning("%s quota exhausted for %s", self._provider, self._day)
+
+    def stats(self) -> dict[str, object]:
+        used = self._used if self._day == self._today() else 0
+        return {
+            "day": self._today(),
+            "budget": self._budget,
+            "used": used,
+            "remaining": max(0, self._budget - used),
+            "live_reserve": self._reserve,
+            "background_remaining": max(0, self._limit(Priority.REFRESH) - used),
+            "refused": self.refused,
+        }
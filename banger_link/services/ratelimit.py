@@ -0,0 +1,131 @@
+"""Async token-bucket rate limiter shared by everything that calls Songlink.
+
+Songlink's free tier allows on the order of ten requests a minute per IP.
+Rather than discovering that limit through 429s and sleeping blindly, every
+caller takes a token from one bucket before each request. The bucket:
+
+* refills at `rate` tokens per second up to `burst`, so short bursts go out
+  immediately and sustained load settles at the configured rate;
+* honors `Retry-After` — a 429 blocks every caller until the server says
+  it's fine to try again;
+* adapts: each 429 halves the refill rate (down to `min_rate`), and a run of
+  successes nudges it back up towards the configured ceiling (AIMD).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        *,
+        rate: float,
+        burst: int,
+        min_rate: float | None = None,
+        recovery_step: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self._max_rate = rate
+        self._rate = rate
+        self._min_rate = min_rate if min_rate is not None else rate / 8
+        # Additive increase: recover a tenth of the ceiling per success by default.
+        self._recovery_step = recovery_step if recovery_step is not None else rate / 10
+        self._burst = burst
+        self._tokens = float(burst)
+        self._clock = clock
+        self._updated_at = clock()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+        self.acquired = 0
+        self.throttled = 0
+        self.rate_limited = 0
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self._updated_at)
+        self._tokens = min(float(self._burst), self._tokens + elapsed * self._rate)
+        self._updated_at = now
+
+    def _wait_time(self, now: float) -> float:
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self._rate
+
+    async def acquire(self) -> None:
+        """Wait until a request may be sent, then consume a token."""
+        # The lock makes waiters queue up in FIFO order instead of all waking
+        # up on the same refill and stampeding.
+        async with self._lock:
+            waited = False
+            while True:
+                now = self._clock()
+                self._refill(now)
+                wait = self._wait_time(now)
+                if wait <= 0:
+                    self._tokens -= 1
+                    self.acquired += 1
+                    self.throttled += waited
+                    return
+                waited = True
+                await asyncio.sleep(wait)
+
+    def try_acquire(self) -> bool:
+        """Consume a token only if one is available right now."""
+        if self._lock.locked():
+            return False  # someone is already queued; don't jump the line
+        now = self._clock()
+        self._refill(now)
+        if self._wait_time(now) > 0:
+            return False
+        self._tokens -= 1
+        self.acquired += 1
+        return True
+
+    def on_success(self) -> None:
+        if self._rate < self._max_rate:
+            self._rate = min(self._max_rate, self._rate + self._recovery_step)
+
+    def on_rate_limited(self, retry_after: float | None = None) -> None:
+        """Record a 429: back off multiplicatively and pause for `retry_after`."""
+        now = self._clock()
+        self._refill(now)
+        self.rate_limited += 1
+        self._rate = max(self._min_rate, self._rate / 2)
+        self._tokens = min(self._tokens, 0.0)
+        pause = retry_after if retry_after is not None else 1 / self._rate
+        self._blocked_until = max(self._blocked_until, now + pause)
+        logger.info("Rate limited; pausing %.1fs, refill rate now %.3f/s", pause, self._rate)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "rate_per_second": round(self._rate, 4),
+            "tokens": round(self._tokens, 2),
+            "acquired": self.acquired,
+            "throttled": self.throttled,
+            "rate_limited": self.rate_limited,
+        }
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Seconds from a `Retry-After` header. Only the delta-seconds form is used."""
+    if value is None:
+        return None
+    try:
+        seconds = float(value.strip())
+    except ValueError:
+        return None
+    return seconds if seconds >= 0 else None
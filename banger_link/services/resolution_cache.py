@@ -0,0 +1,227 @@
+"""Durable URL → `ResolvedSong` cache in front of Songlink.
+
+Most shares in a busy chat are reposts of a few hundred hot tracks, so the
+same URL gets resolved over and over. Caching the parsed result in SQLite
+removes those round-trips (and most of the 429s they'd cause) and survives
+restarts. Definitive misses — 404s, podcast episodes, non-song payloads — are
+cached as negative entries with a shorter TTL so a catalog addition on
+Songlink's side eventually gets picked up.
+
+A bounded in-process LRU (`MemoryResolutionCache`) can sit in front of the
+SQLite tier so repeat shares in busy chats are answered without a round-trip
+through aiosqlite's worker thread.
+"""
+
+from __future__ import annotations
+
+import logging
+import sys
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from banger_link.db.repo import Repo
+from banger_link.services.songlink import ResolvedSong
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class CacheEntry:
+    """A cache hit. `song` is None for negative entries ("not a song")."""
+
+    song: ResolvedSong | None
+    expires_at: float
+
+
+def _estimate_size(url: str, song: ResolvedSong | None) -> int:
+    """Rough resident size of one cache entry, in bytes.
+
+    Platform keys are interned (see `songlink._parse`) and shared by every
+    entry, so they aren't charged; the link URLs and the dict itself are.
+    """
+    size = sys.getsizeof(url) + 64  # key + _MemoryEntry with slots
+    if song is None:
+        return size
+    size += sys.getsizeof(song) + sys.getsizeof(song.platform_links)
+    for value in (song.entity_id, song.title, song.artist, song.thumbnail_url, song.page_url):
+        if value is not None:
+            size += sys.getsizeof(value)
+    for url_value in song.platform_links.values():
+        size += sys.getsizeof(url_value)
+    return size
+
+
+@dataclass(slots=True)
+class _MemoryEntry:
+    song: ResolvedSong | None
+    expires_at: float
+    size: int
+
+
+class MemoryResolutionCache:
+    """Size-bounded LRU of resolutions, capped by entry count and estimated bytes.
+
+    Entries never outlive the TTL for their kind (positive vs. negative), nor
+    the expiry of the SQLite row they were promoted from.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int,
+        max_bytes: int,
+        ttl_seconds: float,
+        negative_ttl_seconds: float,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._entries: OrderedDict[str, _MemoryEntry] = OrderedDict()
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._ttl = ttl_seconds
+        self._negative_ttl = negative_ttl_seconds
+        self._clock = clock
+        self._bytes = 0
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, url: str) -> CacheEntry | None:
+        entry = self._entries.get(url)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= self._clock():
+            self._drop(url)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(url)
+        if entry.song is None:
+            self.negative_hits += 1
+        else:
+            self.hits += 1
+        return CacheEntry(song=entry.song, expires_at=entry.expires_at)
+
+    def put(self, url: str, song: ResolvedSong | None, *, expires_at: float | None = None) -> None:
+        ttl = self._ttl if song is not None else self._negative_ttl
+        deadline = self._clock() + ttl
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+        size = _estimate_size(url, song)
+        if size > self._max_bytes:
+            return
+        if url in self._entries:
+            self._drop(url)
+        self._entries[url] = _MemoryEntry(song=song, expires_at=deadline, size=size)
+        self._bytes += size
+        while len(self._entries) > self._max_entries or self._bytes > self._max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _drop(self, url: str) -> None:
+        entry = self._entries.pop(url)
+        self._bytes -= entry.size
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class ResolutionCache:
+    """SQLite-backed resolution cache with separate positive/negative TTLs.
+
+    When a `MemoryResolutionCache` is supplied it is consulted first, written
+    through on every `put`, and back-filled from SQLite hits.
+    """
+
+    def __init__(
+        self,
+        repo: Repo,
+        *,
+        ttl_seconds: float,
+        negative_ttl_seconds: float,
+        memory: MemoryResolutionCache | None = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._repo = repo
+        self._ttl = ttl_seconds
+        self._negative_ttl = negative_ttl_seconds
+        self._memory = memory
+        self._clock = clock
+        self.hits = 0
+        self.negative_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    async def get(self, url: str, *, allow_stale: bool = False) -> CacheEntry | None:
+        """Return the cached entry for `url`, or None on a miss or expired entry.
+
+        `allow_stale` also returns expired SQLite rows — for when the
+        alternative is no answer at all (Songlink's circuit is open).
+        """
+        if self._memory is not None and (entry := self._memory.get(url)) is not None:
+            return entry
+        row = await self._repo.get_cached_resolution(url)
+        if row is None:
+            self.misses += 1
+            return None
+        if row.expires_at <= self._clock():
+            if not allow_stale:
+                self.misses += 1
+                return None
+            self.stale_hits += 1
+            song = None if row.payload is None else ResolvedSong.from_dict(row.payload)
+            return CacheEntry(song=song, expires_at=row.expires_at)
+        if row.payload is None:
+            self.negative_hits += 1
+            entry = CacheEntry(song=None, expires_at=row.expires_at)
+        else:
+            self.hits += 1
+            entry = CacheEntry(song=ResolvedSong.from_dict(row.payload), expires_at=row.expires_at)
+        if self._memory is not None:
+            self._memory.put(url, entry.song, expires_at=entry.expires_at)
+        return entry
+
+    async def put(self, url: str, song: ResolvedSong | None) -> None:
+        ttl = self._ttl if song is not None else self._negative_ttl
+        expires_at = self._clock() + ttl
+        if self._memory is not None:
+            self._memory.put(url, song, expires_at=expires_at)
+        await self._repo.put_cached_resolution(
+            url=url,
+            payload=None if song is None else song.to_dict(),
+            expires_at=expires_at,
+        )
+
+    async def prune(self) -> int:
+        """Drop expired rows. Returns the number of rows removed."""
+        deleted = await self._repo.prune_resolution_cache(now=self._clock())
+        if deleted:
+            logger.info("Pruned %d expired resolution cache entries", deleted)
+        return deleted
+
+    def stats(self) -> dict[str, int]:
+        stats = {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+        }
+        if self._memory is not None:
+            stats.update({f"memory_{k}": v for k, v in self._memory.stats().items()})
+        return stats
@@ -0,0 +1,124 @@
+"""Priority admission for outbound lookups: live shares first, batch work after.
+
+Live messages, the background refresh and bulk imports all draw on the same
+Songlink / Spotify / iTunes / YouTube budgets. A `WorkScheduler` sits in
+front of one such upstream and hands out a fixed number of concurrent slots:
+
+* waiting work is served strictly by `Priority` — a queued LIVE lookup always
+  gets the next free slot before any REFRESH or IMPORT lookup;
+* each class can be capped below the total (`limits`), so batch work can
+  never occupy every slot and a live share always finds one free soon;
+* within a class, waiters are grouped by a fairness key (a chat, a job) and
+  the groups are served round-robin, so one busy chat or one large batch
+  can't starve the rest of its class.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterator, Hashable, Mapping
+from contextlib import asynccontextmanager, suppress
+from enum import IntEnum
+
+
+class Priority(IntEnum):
+    LIVE = 0
+    REFRESH = 1
+    IMPORT = 2
+
+
+class WorkScheduler:
+    def __init__(
+        self,
+        *,
+        capacity: int,
+        limits: Mapping[Priority, int] | None = None,
+    ) -> None:
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self._capacity = capacity
+        self._limits = {p: min(capacity, (limits or {}).get(p, capacity)) for p in Priority}
+        self._running = dict.fromkeys(Priority, 0)
+        self._queues: dict[Priority, OrderedDict[Hashable, deque[asyncio.Future[None]]]] = {
+            p: OrderedDict() for p in Priority
+        }
+        self._admitted = dict.fromkeys(Priority, 0)
+
+    @asynccontextmanager
+    async def slot(
+        self, priority: Priority = Priority.LIVE, *, key: Hashable = None
+    ) -> AsyncIterator[None]:
+        """Hold one of the upstream's slots for the duration of the block."""
+        await self._acquire(priority, key)
+        try:
+            yield
+        finally:
+            self._release(priority)
+
+    async def _acquire(self, priority: Priority, key: Hashable) -> None:
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._queues[priority].setdefault(key, deque()).append(waiter)
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted in the same tick we were cancelled: hand it back.
+                self._release(priority)
+            else:
+                self._discard(priority, key, waiter)
+            raise
+
+    def _release(self, priority: Priority) -> None:
+        self._running[priority] -= 1
+        self._dispatch()
+
+    def _discard(self, priority: Priority, key: Hashable, waiter: asyncio.Future[None]) -> None:
+        queue = self._queues[priority].get(key)
+        if queue is None:
+            return
+        with suppress(ValueError):
+            queue.remove(waiter)
+        if not queue:
+            del self._queues[priority][key]
+
+    def _dispatch(self) -> None:
+        while sum(self._running.values()) < self._capacity:
+            if not self._grant_next():
+                return
+
+    def _grant_next(self) -> bool:
+        for priority in Priority:
+            groups = self._queues[priority]
+            if not groups or self._running[priority] >= self._limits[priority]:
+                continue
+            # Round-robin across fairness keys: serve the oldest group's
+            # head, then send that group to the back of the line.
+            key, queue = next(iter(groups.items()))
+            waiter = queue.popleft()
+            if queue:
+                groups.move_to_end(key)
+            else:
+                del groups[key]
+            if waiter.done():  # cancelled while queued
+                return True
+            self._running[priority] += 1
+            self._admitted[priority] += 1
+            waiter.set_result(None)
+            return True
+        return False
+
+    def stats(self) -> dict[str, object]:
+        return {
+            "capacity": self._capacity,
+            **{
+                priority.name.lower(): {
+                    "running": self._running[priority],
+                    "queued": sum(len(q) for q in self._queues[priority].values()),
+                    "admitted": self._admitted[priority],
+                    "limit": self._limits[priority],
+                }
+                for priority in Priority
+            },
+        }
@@ -0,0 +1,102 @@
+"""Durable cache of fallback search results, in front of the search APIs.
+
+`FallbackResolver.fill` runs whenever a song comes back from Songlink without
+Spotify / Apple Music / YouTube, and the same hot tracks come back that way
+again and again. Every fallback sub-client checks this cache before making any
+HTTP request. Entries are keyed by `(platform, strict title key, artist key)`
+and store either the URL found or a negative entry ("searched, got
+nothing"). TTLs are per platform: a YouTube search costs 100 units of a 10,000
+unit daily quota, so its answers are worth keeping much longer than a free
+iTunes lookup. The title key keeps edition markers: a search for "Song - Live
+at Wembley" finds the live recording, so its answer must never be served for
+the studio "Song", or the other way round.
+
+Only definitive answers are stored. Transport errors, 5xx and quota refusals
+leave no entry, so the next share searches again.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+
+from banger_link.db.repo import Repo
+from banger_link.normalize import normalize_artist, normalize_title
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class SearchTTL:
+    """How long, in seconds, a platform's hits and misses are kept."""
+
+    positive: float
+    negative: float
+
+
+@dataclass(frozen=True, slots=True)
+class SearchHit:
+    """A cache hit. `url` is None for negative entries ("no such track there")."""
+
+    url: str | None
+    expires_at: float
+
+
+class SearchCache:
+    def __init__(
+        self,
+        repo: Repo,
+        *,
+        default_ttl: SearchTTL,
+        platform_ttls: Mapping[str, SearchTTL] | None = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._repo = repo
+        self._default_ttl = default_ttl
+        self._platform_ttls = dict(platform_ttls or {})
+        self._clock = clock
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    async def get(self, platform: str, *, title: str, artist: str) -> SearchHit | None:
+        """Return the cached answer for this search, or None on a miss or expired entry."""
+        row = await self._repo.get_cached_search(
+            platform=platform,
+            title_key=normalize_title(title, strict=True),
+            artist_key=normalize_artist(artist),
+        )
+        if row is None or row.expires_at <= self._clock():
+            self.misses += 1
+            return None
+        if row.url is None:
+            self.negative_hits += 1
+        else:
+            self.hits += 1
+        return SearchHit(url=row.url, expires_at=row.expires_at)
+
+    async def put(self, platform: str, *, title: str, artist: str, url: str | None) -> None:
+        ttl = self._platform_ttls.get(platform, self._default_ttl)
+        await self._repo.put_cached_search(
+            platform=platform,
+            title_key=normalize_title(title, strict=True),
+            artist_key=normalize_artist(artist),
+            url=url,
+            expires_at=self._clock() + (ttl.positive if url is not None else ttl.negative),
+        )
+
+    async def prune(self) -> int:
+        """Drop expired rows. Returns the number of rows removed."""
+        deleted = await self._repo.prune_search_cache(now=self._clock())
+        if deleted:
+            logger.info("Pruned %d expired search cache entries", deleted)
+        return deleted
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,68 @@
+"""Coalesce concurrent calls for the same key into a single in-flight task.
+
+When a track goes viral the same link lands in several chats within the same
+second. Without coalescing each message would fire its own Songlink lookup and
+fallback searches; with it, the first caller starts the work and everyone else
+who asks for the same key while it's running awaits that same task.
+
+Only in-flight work is shared. Once the task finishes its key is forgotten, so
+results (and especially errors) are never cached here — that's the job of the
+resolution cache.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class _Flight[V]:
+    task: asyncio.Future[V]
+    waiters: int = 0
+
+
+class SingleFlight[K: Hashable, V]:
+    def __init__(self) -> None:
+        self._flights: dict[K, _Flight[V]] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: K, fn: Callable[[], Awaitable[V]]) -> V:
+        """Run `fn()` for `key`, or join the call already in flight for it.
+
+        Every caller gets the same result or the same exception. A caller that
+        is cancelled stops waiting without disturbing the others; the shared
+        task itself is only cancelled once nobody is waiting on it anymore.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(task=asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.started += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    def _forget(self, key: K, flight: _Flight[V]) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "in_flight": len(self._flights),
+            "started": self.started,
+            "coalesced": self.coalesced,
+        }
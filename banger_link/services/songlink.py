@@ -1,12 +1,29 @@
 from __future__ import annotations
 
 import asyncio
+import json
 import logging
+import sys
+from collections.abc import AsyncIterator, Hashable, Iterable
+from contextlib import AbstractAsyncContextManager, nullcontext
 from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, NotRequired, Self, TypedDict
 
 import httpx
+from pydantic import TypeAdapter, ValidationError
 
+from banger_link.canonical import canonicalize
 from banger_link.config import settings
+from banger_link.services.batch import bounded_map
+from banger_link.services.circuit import CircuitBreaker, CircuitState
+from banger_link.services.deadline import Deadline
+from banger_link.services.hedge import Hedger
+from banger_link.services.ratelimit import RateLimiter, parse_retry_after
+from banger_link.services.scheduler import Priority, WorkScheduler
+from banger_link.services.singleflight import SingleFlight
+
+if TYPE_CHECKING:
+    from banger_link.services.resolution_cache import ResolutionCache
 
 logger = logging.getLogger(__name__)
 
@@ -47,6 +64,30 @@ class ResolvedSong:
                 return url
         return self.page_url
 
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "entity_id": self.entity_id,
+            "title": self.title,
+            "artist": self.artist,
+            "thumbnail_url": self.thumbnail_url,
+            "page_url": self.page_url,
+            "platform_links": self.platform_links,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> Self:
+        return cls(
+            entity_id=data["entity_id"],
+            title=data["title"],
+            artist=data["artist"],
+            thumbnail_url=data.get("thumbnail_url"),
+            page_url=data.get("page_url", ""),
+            platform_links={
+                sys.intern(platform): url
+                for platform, url in data.get("platform_links", {}).items()
+            },
+        )
+
 
 class SonglinkError(Exception):
     """Raised on unrecoverable Songlink errors (after retries)."""
@@ -61,6 +102,11 @@ class SonglinkClient:
         user_country: str = "US",
         timeout_seconds: float = 8.0,
         max_retries: int = 2,
+        cache: ResolutionCache | None = None,
+        limiter: RateLimiter | None = None,
+        breaker: CircuitBreaker | None = None,
+        hedger: Hedger | None = None,
+        scheduler: WorkScheduler | None = None,
     ) -> None:
         self._base_url = base_url or str(settings.songlink_api_url)
         self._user_country = user_country
@@ -71,55 +117,354 @@ class SonglinkClient:
             headers={"User-Agent": "banger-link/2.0 (+https://github.com/luisg0nc/banger-link)"},
         )
         self._owns_client = client is None
+        self._cache = cache
+        self._limiter = limiter
+        self._breaker = breaker
+        self._hedger = hedger
+        self._scheduler = scheduler
+        self.short_circuited = 0
+        self._flights: SingleFlight[str, ResolvedSong | None] = SingleFlight()
 
     async def aclose(self) -> None:
         if self._owns_client:
             await self._client.aclose()
 
-    async def resolve(self, url: str) -> ResolvedSong | None:
-        """Resolve a single share URL into a ResolvedSong, or None if not a known song."""
+    @property
+    def available(self) -> bool:
+        """False while the circuit breaker is shedding load; background work
+        should wait rather than queue up behind it."""
+        return self._breaker is None or self._breaker.state is CircuitState.CLOSED
+
+    async def resolve(
+        self,
+        url: str,
+        *,
+        priority: Priority = Priority.LIVE,
+        fair_key: Hashable = None,
+        deadline: Deadline | None = None,
+    ) -> ResolvedSong | None:
+        """Resolve a single share URL into a ResolvedSong, or None if not a known song.
+
+        The URL is canonicalized first, so cache entries and in-flight requests
+        are shared across every spelling of the same link. `priority` and
+        `fair_key` place the request in the scheduler's queue, if there is one.
+        With a `deadline`, attempts and retries are sized to fit it and the
+        lookup raises DeadlineExceeded once it passes.
+        """
+        url = canonicalize(url)
+        if self._cache is not None:
+            entry = await self._cache.get(url)
+            if entry is not None:
+                return entry.song
+        # Concurrent shares of the same link wait on one request. The flight
+        # paces its attempts by the first caller's deadline; everyone else
+        # stops waiting at their own.
+        flight = self._flights.do(
+            url,
+            lambda: self._resolve_remote(
+                url, priority=priority, fair_key=fair_key, deadline=deadline
+            ),
+        )
+        if deadline is None:
+            return await flight
+        return await deadline.run(flight, "Songlink lookup")
+
+    async def resolve_many(
+        self,
+        urls: Iterable[str],
+        *,
+        concurrency: int = 4,
+        priority: Priority = Priority.LIVE,
+        fair_key: Hashable = None,
+        use_cache: bool = True,
+    ) -> AsyncIterator[tuple[str, ResolvedSong | None]]:
+        """Resolve a batch of URLs, yielding `(url, result)` in completion order.
+
+        Cache hits are answered first, without a task or a request. The rest
+        go out at most `concurrency` at a time, still paced by the shared
+        rate limiter. `url` is the caller's URL as given, not its canonical
+        form. A lookup that raises yields None rather than ending the batch.
+        With `use_cache=False` every URL goes to Songlink; the answers are
+        still cached.
+        """
+        misses: list[tuple[str, str]] = []
+        for url in urls:
+            canonical = canonicalize(url)
+            if self._cache is not None and use_cache:
+                entry = await self._cache.get(canonical)
+                if entry is not None:
+                    yield url, entry.song
+                    continue
+            misses.append((url, canonical))
+
+        async def lookup(pair: tuple[str, str]) -> ResolvedSong | None:
+            _, canonical = pair
+            try:
+                return await self._flights.do(
+                    canonical,
+                    lambda: self._resolve_remote(
+                        canonical, priority=priority, fair_key=fair_key, deadline=None
+                    ),
+                )
+            except Exception:
+                logger.exception("Songlink lookup failed for %s", canonical)
+                return None
+
+        async for (url, _), resolved in bounded_map(misses, lookup, concurrency=concurrency):
+            yield url, resolved
+
+    async def _resolve_remote(
+        self, url: str, *, priority: Priority, fair_key: Hashable, deadline: Deadline | None
+    ) -> ResolvedSong | None:
+        # Whoever starts a flight sets its priority; a live share that joins a
+        # batch lookup already in flight waits at the batch's place in line.
+        # Only a peek: the probe slot (if half-open) is taken right before the
+        # request goes out, not while this waits for a slot and a token.
+        if self._breaker is not None and not self._breaker.ready():
+            return await self._resolve_degraded(url)
+        async with self._slot(priority, fair_key):
+            resolved, definitive = await self._fetch(url, deadline)
+        if definitive and self._cache is not None:
+            try:
+                await self._cache.put(url, resolved)
+            except Exception:
+                logger.exception("Could not write resolution cache entry for %s", url)
+        return resolved
+
+    async def _resolve_degraded(self, url: str) -> ResolvedSong | None:
+        """Answer without Songlink while the circuit is open: serve an expired
+        cache entry if there is one, otherwise give up straight away."""
+        self.short_circuited += 1
+        if self._cache is not None:
+            entry = await self._cache.get(url, allow_stale=True)
+            if entry is not None:
+                logger.info("Songlink circuit open; serving cached result for %s", url)
+                return entry.song
+        logger.info("Songlink circuit open; skipping %s", url)
+        return None
+
+    async def _fetch(
+        self, url: str, deadline: Deadline | None = None
+    ) -> tuple[ResolvedSong | None, bool]:
+        """Hit the Songlink API. Returns `(result, definitive)`.
+
+        `definitive` is False for transient failures (timeouts, 429s, 5xx,
+        transport errors) so callers know not to cache the None.
+        """
         params = {"url": url, "userCountry": self._user_country}
 
         for attempt in range(self._max_retries + 1):
+            if self._limiter is not None:
+                await self._limiter.acquire()
+            timeout = self._timeout if deadline is None else deadline.timeout(self._timeout)
+            if timeout <= 0:
+                logger.info("No time left to ask Songlink about %s", url)
+                return None, False
             try:
-                response = await self._client.get(self._base_url, params=params)
+                response = await self._send_checked(params, timeout)
             except httpx.TimeoutException:
-                if attempt == self._max_retries:
+                if not self._can_retry(attempt, deadline):
                     logger.warning("Songlink timeout after %d attempts: %s", attempt + 1, url)
-                    return None
-                await asyncio.sleep(0.5 * (2**attempt))
+                    return None, False
+                await asyncio.sleep(_backoff(attempt))
                 continue
             except httpx.HTTPError as exc:
                 logger.warning("Songlink transport error for %s: %s", url, exc)
-                return None
-
+                return None, False
+            if response is None:
+                logger.info("Songlink circuit no longer accepting; skipping %s", url)
+                return None, False
             if response.status_code == 404:
+                self._on_success()
                 logger.info("Songlink does not recognise URL: %s", url)
-                return None
+                return None, True
             if response.status_code == 429:
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if self._limiter is not None:
+                    # The limiter pauses every caller (including our own retry
+                    # below) until Retry-After, and slows its refill rate.
+                    self._limiter.on_rate_limited(retry_after)
                 if attempt == self._max_retries:
                     logger.warning("Songlink rate-limited for %s, giving up", url)
-                    return None
-                await asyncio.sleep(1.5 * (2**attempt))
+                    return None, False
+                if self._limiter is None:
+                    await asyncio.sleep(retry_after or 1.5 * (2**attempt))
                 continue
             if 500 <= response.status_code < 600:
-                if attempt == self._max_retries:
+                if not self._can_retry(attempt, deadline):
                     logger.warning("Songlink %s for %s, giving up", response.status_code, url)
-                    return None
-                await asyncio.sleep(0.5 * (2**attempt))
+                    return None, False
+                await asyncio.sleep(_backoff(attempt))
                 continue
             if not response.is_success:
                 logger.warning("Songlink %s for %s", response.status_code, url)
-                return None
+                return None, False
 
+            self._on_success()
             try:
-                payload = response.json()
+                resolved = _decode(response.content)
             except ValueError:
                 logger.warning("Songlink returned non-JSON for %s", url)
-                return None
-            return _parse(payload)
+                return None, False
+            # A well-formed 200 that doesn't parse into a song (podcast episode,
+            # missing fields) is as definitive as a 404.
+            return resolved, True
+        return None, False
+
+    def _slot(self, priority: Priority, fair_key: Hashable) -> AbstractAsyncContextManager[None]:
+        if self._scheduler is None:
+            return nullcontext()
+        return self._scheduler.slot(priority, key=fair_key)
+
+    async def _send(self, params: dict[str, str], timeout: float) -> httpx.Response:
+        if self._hedger is None:
+            return await self._client.get(self._base_url, params=params, timeout=timeout)
+        return await self._hedger.run(
+            lambda: self._client.get(self._base_url, params=params, timeout=timeout),
+            may_hedge=self._may_hedge,
+        )
+
+    async def _send_checked(self, params: dict[str, str], timeout: float) -> httpx.Response | None:
+        """`_send`, accounted to the circuit breaker. Returns None if the
+        breaker turns the request away (another caller took the probe)."""
+        breaker = self._breaker
+        if breaker is None:
+            return await self._send(params, timeout)
+        if not breaker.allow():
+            return None
+        try:
+            response = await self._send(params, timeout)
+        except httpx.HTTPError:
+            breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelled (deadline, last waiter gone) or a bug on our side:
+            # that says nothing about Songlink, so just give the slot back.
+            breaker.release_probe()
+            raise
+        # Any answer that isn't a 5xx means Songlink itself is up.
+        if response.status_code < 500:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+        return response
+
+    def _may_hedge(self) -> bool:
+        # A hedge is a real request: it needs a token, but never waits for one.
+        return self._limiter is None or self._limiter.try_acquire()
+
+    def _on_success(self) -> None:
+        if self._limiter is not None:
+            self._limiter.on_success()
+
+    def _can_retry(self, attempt: int, deadline: Deadline | None = None) -> bool:
+        if attempt >= self._max_retries:
+            return False
+        # Not worth a retry that would only get to back off and start.
+        if deadline is not None and deadline.remaining() <= _backoff(attempt):
+            return False
+        # Don't keep hammering an upstream the breaker has just given up on.
+        return self._breaker is None or self._breaker.state is CircuitState.CLOSED
+
+    def stats(self) -> dict[str, object]:
+        stats: dict[str, object] = {
+            "short_circuited": self.short_circuited,
+            "single_flight": self._flights.stats(),
+        }
+        if self._breaker is not None:
+            stats["circuit"] = self._breaker.snapshot()
+        if self._limiter is not None:
+            stats["rate_limiter"] = self._limiter.stats()
+        if self._cache is not None:
+            stats["cache"] = self._cache.stats()
+        if self._hedger is not None:
+            stats["hedging"] = self._hedger.stats()
+        if self._scheduler is not None:
+            stats["scheduler"] = self._scheduler.stats()
+        return stats
+
+
+def _backoff(attempt: int) -> float:
+    return 0.5 * 2.0**attempt
+
+
+# The subset of a Songlink response we read. Decoding straight from bytes
+# against this schema skips building Python objects for everything else in
+# the payload (per-entity API provider metadata, thumbnail sizes, platform
+# lists, app URIs...), which is most of it.
+class _Link(TypedDict):
+    url: str
+
+
+class _Entity(TypedDict):
+    type: NotRequired[str]
+    title: NotRequired[str]
+    artistName: NotRequired[str]
+    thumbnailUrl: NotRequired[str | None]
+
+
+class _Payload(TypedDict):
+    entityUniqueId: str
+    entitiesByUniqueId: dict[str, _Entity]
+    pageUrl: NotRequired[str]
+    linksByPlatform: NotRequired[dict[str, _Link]]
+
+
+_PAYLOAD_ADAPTER = TypeAdapter(_Payload)
+
+
+def _decode(content: bytes) -> ResolvedSong | None:
+    """Decode a raw Songlink response body into a ResolvedSong.
+
+    Well-formed payloads are built straight from the validated schema.
+    Anything valid JSON that doesn't match it goes through the lenient
+    `_parse` walk instead, so odd payloads are handled exactly as before.
+    Raises ValueError if the body isn't JSON at all.
+    """
+    try:
+        payload = _PAYLOAD_ADAPTER.validate_json(content)
+    except ValidationError as exc:
+        if any(error["type"] == "json_invalid" for error in exc.errors()):
+            raise ValueError("Songlink response is not JSON") from exc
+        raw = json.loads(content)
+        return _parse(raw) if isinstance(raw, dict) else None
+    return _from_payload(payload)
+
+
+def _from_payload(payload: _Payload) -> ResolvedSong | None:
+    """`_parse` for a payload the schema has already checked the types of."""
+    entity_id = payload["entityUniqueId"]
+    if not entity_id:
+        return None
+    entities = payload["entitiesByUniqueId"]
+    entity = entities.get(entity_id)
+    if entity is None:
+        entity = next(iter(entities.values()), None)
+    if entity is None or entity.get("type") == "podcastEpisode":
+        return None
+    title = entity.get("title")
+    artist = entity.get("artistName")
+    if title is None or artist is None:
+        return None
+
+    page_url = payload.get("pageUrl", "")
+    platform_links = {
+        sys.intern(platform): link["url"]
+        for platform, link in payload.get("linksByPlatform", {}).items()
+        if link["url"]
+    }
+    if not platform_links and not page_url:
         return None
 
+    return ResolvedSong(
+        entity_id=entity_id,
+        title=title.strip(),
+        artist=artist.strip(),
+        thumbnail_url=entity.get("thumbnailUrl"),
+        page_url=page_url,
+        platform_links=platform_links,
+    )
+
 
 def _parse(payload: dict[str, object]) -> ResolvedSong | None:
     entity_id = payload.get("entityUniqueId")
@@ -160,7 +505,8 @@ def _parse(payload: dict[str, object]) -> ResolvedSong | None:
                 continue
             url = link_obj.get("url")
             if isinstance(url, str) and url:
-                platform_links[str(platform)] = url
+                # Interned so every cached song shares one copy of each key.
+                platform_links[sys.intern(str(platform))] = url
 
     if not platform_links and not page_url:
         return None
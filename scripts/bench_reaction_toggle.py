@@ -0,0 +1,130 @@
+"""Contention benchmark: many users tapping reaction buttons at once.
+
+Seeds a throwaway database with one chat and a handful of songs, then fires
+`--taps` concurrent `Repo.toggle_reaction` calls from `--users` users spread
+over those songs (a popular post gets most of them). Reports throughput and
+tap latency percentiles, then checks the invariants the transaction is there
+for: no tap failed, and every counter on `chat_songs` matches the rows in
+`reactions`.
+
+The bot runs WAL with `synchronous = NORMAL`, where a COMMIT doesn't fsync;
+`--synchronous full` makes every commit durable on its own, which is where
+sharing commits across taps (`db/writer.py`) pays off most.
+
+Usage:
+  uv run python scripts/bench_reaction_toggle.py [--taps 5000] [--users 200] [--songs 10]
+      [--synchronous normal|full] [--batch-size 64] [--batch-latency-ms 0]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("TELEGRAM_TOKEN", "stub:token-for-benchmark")
+
+from banger_link.db.connection import Database  # noqa: E402
+from banger_link.db.repo import ReactionKind, Repo  # noqa: E402
+
+
+async def seed(repo: Repo, songs: int) -> list[int]:
+    chat_song_ids = []
+    for i in range(songs):
+        song_id = await repo.upsert_song(
+            entity_id=f"BENCH::{i}",
+            title=f"Song {i}",
+            artist="Bench",
+            thumbnail_url=None,
+            platform_links={"spotify": f"https://open.spotify.com/track/bench{i}"},
+        )
+        mention = await repo.record_mention(chat_id=-1, song_id=song_id, user_id=1, user_name="B")
+        chat_song_ids.append(mention.chat_song_id)
+    return chat_song_ids
+
+
+async def mismatched_counters(repo: Repo) -> int:
+    async with repo._conn.execute(
+        """
+        SELECT COUNT(*) FROM chat_songs cs
+        WHERE cs.likes    <> (SELECT COUNT(*) FROM reactions r
+                              WHERE r.chat_song_id = cs.id AND r.kind = 'like')
+           OR cs.dislikes <> (SELECT COUNT(*) FROM reactions r
+                              WHERE r.chat_song_id = cs.id AND r.kind = 'dislike')
+        """
+    ) as cur:
+        row = await cur.fetchone()
+    assert row is not None
+    return int(row[0])
+
+
+async def run(args: argparse.Namespace) -> None:
+    taps, users, songs = args.taps, args.users, args.songs
+    with tempfile.TemporaryDirectory() as tmp:
+        db = await Database(
+            Path(tmp) / "bench.db",
+            write_batch_size=args.batch_size,
+            write_batch_latency=args.batch_latency_ms / 1000,
+        ).connect()
+        try:
+            await db.conn.execute(f"PRAGMA synchronous = {args.synchronous}")
+            repo = Repo(db)
+            chat_song_ids = await seed(repo, songs)
+            rng = random.Random(0)
+            # Zipf-ish: the first song is by far the most tapped.
+            weights = [1 / (rank + 1) for rank in range(songs)]
+            kinds: tuple[ReactionKind, ...] = ("like", "dislike")
+            latencies: list[float] = []
+            failures = 0
+
+            async def tap() -> None:
+                nonlocal failures
+                chat_song_id = rng.choices(chat_song_ids, weights)[0]
+                started = time.perf_counter()
+                try:
+                    await repo.toggle_reaction(
+                        chat_song_id=chat_song_id,
+                        user_id=rng.randrange(users),
+                        kind=rng.choice(kinds),
+                    )
+                except Exception:
+                    failures += 1
+                latencies.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(tap() for _ in range(taps)))
+            elapsed = time.perf_counter() - started
+
+            cuts = statistics.quantiles(latencies, n=100)
+            print(f"{taps} taps from {users} users over {songs} songs in {elapsed:.2f}s")
+            print(f"  throughput  {taps / elapsed:8.0f} taps/s")
+            print(f"  p50 / p99   {cuts[49] * 1e3:8.1f} / {cuts[98] * 1e3:.1f} ms")
+            print(f"  failures    {failures:8d}")
+            print(f"  bad counts  {await mismatched_counters(repo):8d}")
+            print(f"  writer      {db.writer.stats()}")
+        finally:
+            await db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--taps", type=int, default=5_000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--songs", type=int, default=10)
+    parser.add_argument("--synchronous", choices=("normal", "full"), default="normal")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--batch-latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Micro-benchmark: decoding a Songlink response body into a ResolvedSong.
+
+Compares the schema-driven `_decode` path against the old
+`json.loads` + `_parse` walk, on the recorded fixture from
+tests/test_songlink.py and on a full-size payload built from it (Songlink
+returns one entity per platform — 20+ for a popular track — each with
+provider metadata and app URIs we never read).
+
+Usage:
+  uv run python scripts/bench_songlink_decode.py [--number 20000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("TELEGRAM_TOKEN", "stub:token-for-benchmark")
+
+from banger_link.services.songlink import _decode, _parse  # noqa: E402
+from tests.test_songlink import SAMPLE_PAYLOAD  # noqa: E402
+
+PLATFORMS = (
+    "spotify",
+    "appleMusic",
+    "itunes",
+    "youtube",
+    "youtubeMusic",
+    "google",
+    "googleStore",
+    "pandora",
+    "deezer",
+    "tidal",
+    "amazonStore",
+    "amazonMusic",
+    "soundcloud",
+    "napster",
+    "yandex",
+    "spinrilla",
+    "audius",
+    "anghami",
+    "boomplay",
+    "audiomack",
+)
+
+
+def full_size_payload() -> dict[str, object]:
+    """The recorded fixture, padded out to what Songlink returns for a hit."""
+    payload = json.loads(json.dumps(SAMPLE_PAYLOAD))
+    entities = payload["entitiesByUniqueId"]
+    links = payload["linksByPlatform"]
+    for i, platform in enumerate(PLATFORMS):
+        key = f"{platform.upper()}_SONG::{i:012d}"
+        entities[key] = {
+            "id": f"{i:012d}",
+            "type": "song",
+            "title": "Lust for Life",
+            "artistName": "Iggy Pop",
+            "thumbnailUrl": f"https://thumbs.example/{platform}/{i}/600x600bb.jpg",
+            "thumbnailWidth": 600,
+            "thumbnailHeight": 600,
+            "apiProvider": platform,
+            "platforms": [platform, "appleMusic", "itunes"],
+        }
+        links.setdefault(
+            platform,
+            {
+                "country": "US",
+                "url": f"https://{platform}.example/track/{i}",
+                "nativeAppUriMobile": f"{platform}://track/{i}",
+                "nativeAppUriDesktop": f"{platform}://track/{i}",
+                "entityUniqueId": key,
+            },
+        )
+    return payload
+
+
+def old_path(body: bytes) -> object:
+    return _parse(json.loads(body))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=20_000)
+    args = parser.parse_args()
+
+    cases = {
+        "fixture": json.dumps(SAMPLE_PAYLOAD).encode(),
+        "full-size": json.dumps(full_size_payload()).encode(),
+    }
+    for name, body in cases.items():
+        assert _decode(body) == old_path(body), name
+        print(f"{name} ({len(body)} bytes)")
+        for label, fn in (("json + _parse", old_path), ("_decode", _decode)):
+            best = min(
+                timeit.repeat(lambda fn=fn, body=body: fn(body), number=args.number, repeat=5)
+            )
+            print(f"  {label:<14} {best / args.number * 1e6:8.2f} µs/op")
+
+
+if __name__ == "__main__":
+    main()
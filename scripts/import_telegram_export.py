@@ -35,13 +35,13 @@ import json
 import logging
 import os
 import re
-import sqlite3
 import sys
+from collections.abc import AsyncIterator, Iterable
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from urllib.parse import urlparse
 
+import aiosqlite
 import httpx
 from bs4 import BeautifulSoup, Tag
 
@@ -53,21 +53,27 @@ ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(ROOT))
 os.environ.setdefault("TELEGRAM_TOKEN", "stub:token-for-importer")
 
-from banger_link.handlers.messages import MUSIC_DOMAIN_SUFFIXES  # noqa: E402
+from banger_link.canonical import (  # noqa: E402
+    canonicalize,
+    is_music_url,
+)
+from banger_link.config import settings  # noqa: E402
+from banger_link.db.connection import Database  # noqa: E402
+from banger_link.db.repo import Repo  # noqa: E402
 from banger_link.services.fallback_resolver import (  # noqa: E402
     FallbackResolver,
     ITunesSearchClient,
     SpotifyAnonymousClient,
     YouTubeSearchClient,
 )
-from banger_link.services.songlink import ResolvedSong, _parse  # noqa: E402
+from banger_link.services.quota import QuotaLedger  # noqa: E402
+from banger_link.services.ratelimit import RateLimiter  # noqa: E402
+from banger_link.services.resolution_cache import ResolutionCache  # noqa: E402
+from banger_link.services.scheduler import Priority  # noqa: E402
+from banger_link.services.songlink import ResolvedSong, SonglinkClient  # noqa: E402
 
 logger = logging.getLogger("banger_link.import")
 
-# Same shape Connection.connect() applies on bot startup; importing the schema
-# directly keeps the script free of an aiosqlite dependency for the writes.
-SCHEMA_PATH = ROOT / "banger_link" / "db" / "schema.sql"
-
 DATE_FORMATS = (
     "%d.%m.%Y %H:%M:%S %z",
     "%d.%m.%Y %H:%M:%S",
@@ -99,14 +105,6 @@ def _parse_timestamp(raw: str) -> datetime | None:
     return None
 
 
-def _is_music_url(url: str) -> bool:
-    try:
-        host = (urlparse(url).hostname or "").lower()
-    except ValueError:
-        return False
-    return bool(host) and any(host == d or host.endswith("." + d) for d in MUSIC_DOMAIN_SUFFIXES)
-
-
 def parse_export(paths: list[Path]) -> list[HistoricalShare]:
     shares: list[HistoricalShare] = []
     for path in paths:
@@ -137,10 +135,13 @@ def parse_export(paths: list[Path]) -> list[HistoricalShare]:
                 href = a.get("href")
                 if not isinstance(href, str):
                     continue
-                if not _is_music_url(href):
+                if not is_music_url(href):
                     continue
+                # Canonical so `?si=` variants of one link resolve (and cache) once.
                 shares.append(
-                    HistoricalShare(timestamp=ts, sender_name=sender, url=href, msg_id=msg_id)
+                    HistoricalShare(
+                        timestamp=ts, sender_name=sender, url=canonicalize(href), msg_id=msg_id
+                    )
                 )
     shares.sort(key=lambda s: s.timestamp)
     logger.info("Parsed %d music shares from %d files", len(shares), len(paths))
@@ -152,134 +153,77 @@ def parse_export(paths: list[Path]) -> list[HistoricalShare]:
 # ---------------------------------------------------------------------------
 
 
-SONGLINK_URL = "https://api.song.link/v1-alpha.1/links"
+class _CoolingLimiter(RateLimiter):
+    """The bot's limiter, except that a 429 without Retry-After pauses for
+    `cool_down`, doubling on consecutive 429s up to five minutes, instead of
+    a single refill interval. A backfill can afford to wait Songlink out."""
 
+    def __init__(self, *, rate: float, cool_down: float) -> None:
+        super().__init__(rate=rate, burst=1)
+        self._cool_down = cool_down
+        self._consecutive_429s = 0
+
+    def on_success(self) -> None:
+        self._consecutive_429s = 0
+        super().on_success()
+
+    def on_rate_limited(self, retry_after: float | None = None) -> None:
+        self._consecutive_429s += 1
+        if retry_after is None:
+            retry_after = min(self._cool_down * 2 ** (self._consecutive_429s - 1), 300.0)
+        super().on_rate_limited(retry_after)
 
-class CachedResolver:
-    """Resolves Songlink URLs with a disk cache and a 429-aware backoff.
 
-    Talks to the Songlink API directly (instead of going through SonglinkClient)
-    so the importer can react to status codes — long backoff on 429 (rate
-    limit), no backoff on 404 (real "not on Songlink"), short backoff on other
-    transient errors. Successful resolutions and definitive 404s are cached;
-    transient failures are retried.
+class CachedResolver:
+    """Resolves share URLs through `SonglinkClient.resolve_many`, with a disk
+    cache in front.
+
+    Resolved songs are kept in a JSON file so an interrupted run resumes
+    without asking Songlink again; "404" entries written by older versions of
+    this script are still honoured. Pacing, 429 backoff, retries and caching
+    definitive misses (in the database's resolution cache) are the client's,
+    exactly as they are for the bot.
     """
 
     def __init__(
         self,
         cache_path: Path,
-        client: httpx.AsyncClient,
+        songlink: SonglinkClient,
         *,
-        throttle_seconds: float,
-        rate_limit_cool_down: float,
         cache_only: bool = False,
     ) -> None:
         self._path = cache_path
-        self._client = client
-        self._throttle = throttle_seconds
-        self._rate_limit_cool_down = rate_limit_cool_down
+        self._songlink = songlink
         self._cache_only = cache_only
-        self._last_call_at: float = 0.0
-        self._consecutive_429s: int = 0
         self._cache: dict[str, dict | str] = {}
         if cache_path.exists():
             raw = json.loads(cache_path.read_text())
-            # We allow two cache shapes: dict (resolved song) or "404" sentinel
-            # (definitively not on Songlink — skip on resume).
-            self._cache = {k: v for k, v in raw.items() if v is not None}
+            # Keys are re-canonicalized so caches written before URLs were
+            # canonicalized still hit.
+            self._cache = {canonicalize(k): v for k, v in raw.items() if v is not None}
             logger.info("Loaded %d cached entries from %s", len(self._cache), cache_path)
 
-    async def resolve(self, url: str) -> ResolvedSong | None:
-        if url in self._cache:
-            cached = self._cache[url]
-            if cached == "404":
-                return None
-            assert isinstance(cached, dict)
-            return ResolvedSong(
-                entity_id=cached["entity_id"],
-                title=cached["title"],
-                artist=cached["artist"],
-                thumbnail_url=cached.get("thumbnail_url"),
-                page_url=cached.get("page_url", ""),
-                platform_links=cached.get("platform_links", {}),
-            )
-
-        if self._cache_only:
-            return None
-
-        await self._wait_for_slot()
-
-        try:
-            response = await self._client.get(
-                SONGLINK_URL,
-                params={"url": url, "userCountry": "US"},
-            )
-        except httpx.HTTPError as exc:
-            logger.warning("transport error for %s: %s — pausing %.0fs", url, exc, self._throttle)
-            await asyncio.sleep(self._throttle)
-            return None
-
-        status = response.status_code
-        if status == 200:
-            self._consecutive_429s = 0
-            try:
-                payload = response.json()
-            except ValueError:
-                logger.warning("non-JSON 200 for %s", url)
-                return None
-            resolved = _parse(payload)
-            if resolved is None:
-                logger.info("Songlink returned a non-song payload for %s", url)
-                self._cache[url] = "404"
+    async def resolve_many(
+        self, urls: Iterable[str], *, concurrency: int
+    ) -> AsyncIterator[tuple[str, ResolvedSong | None]]:
+        """Yield `(url, result)` for every URL: disk hits first, then the rest
+        in completion order as Songlink answers them."""
+        misses = []
+        for url in urls:
+            cached = self._cache.get(url)
+            if isinstance(cached, dict):
+                yield url, ResolvedSong.from_dict(cached)
+            elif cached is not None or self._cache_only:
+                yield url, None
+            else:
+                misses.append(url)
+        async for url, resolved in self._songlink.resolve_many(
+            misses, concurrency=concurrency, priority=Priority.IMPORT
+        ):
+            if resolved is not None:
+                self._cache[url] = resolved.to_dict()
                 self._flush()
-                return None
-            self._cache[url] = {
-                "entity_id": resolved.entity_id,
-                "title": resolved.title,
-                "artist": resolved.artist,
-                "thumbnail_url": resolved.thumbnail_url,
-                "page_url": resolved.page_url,
-                "platform_links": resolved.platform_links,
-            }
-            self._flush()
-            return resolved
-
-        if status == 404:
-            # Definitive — Songlink doesn't know this URL. Cache so we don't
-            # keep retrying on resume.
-            self._consecutive_429s = 0
-            logger.info("404 for %s (cached as not-found)", url)
-            self._cache[url] = "404"
-            self._flush()
-            return None
-
-        if status == 429:
-            self._consecutive_429s += 1
-            # Exponential within reason — 60s, 120s, 240s, then capped at 5 min.
-            backoff = min(
-                self._rate_limit_cool_down * (2 ** (self._consecutive_429s - 1)),
-                300.0,
-            )
-            logger.warning(
-                "429 for %s (streak=%d) — sleeping %.0fs",
-                url,
-                self._consecutive_429s,
-                backoff,
-            )
-            await asyncio.sleep(backoff)
-            return None
-
-        # 4xx (other) / 5xx — log and short-pause. Don't cache; retry on resume.
-        logger.warning("HTTP %d for %s — pausing %.0fs", status, url, self._throttle)
-        await asyncio.sleep(self._throttle)
-        return None
-
-    async def _wait_for_slot(self) -> None:
-        loop = asyncio.get_event_loop()
-        wait = self._throttle - (loop.time() - self._last_call_at)
-        if wait > 0:
-            await asyncio.sleep(wait)
-        self._last_call_at = loop.time()
+            yield url, resolved
 
     def _flush(self) -> None:
         self._path.write_text(json.dumps(self._cache, indent=2, sort_keys=True))
@@ -301,49 +245,20 @@ def _fnv1a_64(name: str) -> int:
     return -((h % (2**62)) + 1)
 
 
-def ensure_schema(conn: sqlite3.Connection) -> None:
-    conn.execute("PRAGMA foreign_keys = ON")
-    cur = conn.execute("PRAGMA user_version")
-    if cur.fetchone()[0] >= 1:
-        return
-    conn.executescript(SCHEMA_PATH.read_text())
-    conn.execute("PRAGMA user_version = 1")
-    conn.commit()
+def _sql_time(when: datetime) -> str:
+    return when.strftime("%Y-%m-%d %H:%M:%S")
 
 
-def upsert_song(
-    conn: sqlite3.Connection,
-    *,
-    resolved: ResolvedSong,
-    when: datetime,
-) -> int:
-    iso = when.strftime("%Y-%m-%d %H:%M:%S")
-    conn.execute(
-        """
-        INSERT INTO songs (entity_id, title, artist, thumbnail_url, platform_links, created_at)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ON CONFLICT(entity_id) DO UPDATE SET
-            title          = excluded.title,
-            artist         = excluded.artist,
-            thumbnail_url  = excluded.thumbnail_url,
-            platform_links = excluded.platform_links
-        """,
-        (
-            resolved.entity_id,
-            resolved.title,
-            resolved.artist,
-            resolved.thumbnail_url,
-            json.dumps(resolved.platform_links),
-            iso,
-        ),
+async def backdate_song(conn: aiosqlite.Connection, *, song_id: int, when: datetime) -> None:
+    """Move a song's `created_at` back to its first historical share."""
+    await conn.execute(
+        "UPDATE songs SET created_at = MIN(created_at, ?) WHERE id = ?",
+        (_sql_time(when), song_id),
     )
-    row = conn.execute("SELECT id FROM songs WHERE entity_id = ?", (resolved.entity_id,)).fetchone()
-    assert row is not None
-    return int(row[0])
 
 
-def record_mention(
-    conn: sqlite3.Connection,
+async def record_mention(
+    conn: aiosqlite.Connection,
     *,
     chat_id: int,
     song_id: int,
@@ -351,9 +266,10 @@ def record_mention(
     user_name: str,
     when: datetime,
 ) -> tuple[int, bool]:
-    """Returns (chat_song_id, is_first_time)."""
-    iso = when.strftime("%Y-%m-%d %H:%M:%S")
-    cur = conn.execute(
+    """`Repo.record_mention` with the share's own timestamp instead of now.
+    Returns (chat_song_id, is_first_time)."""
+    iso = _sql_time(when)
+    async with conn.execute(
         """
         INSERT INTO chat_songs (chat_id, song_id, first_user_id, first_user_name, mentions, first_seen_at, last_seen_at)
         VALUES (?, ?, ?, ?, 1, ?, ?)
@@ -366,25 +282,12 @@ def record_mention(
         RETURNING id, mentions
         """,
         (chat_id, song_id, user_id, user_name, iso, iso),
-    )
-    row = cur.fetchone()
+    ) as cur:
+        row = await cur.fetchone()
     assert row is not None
     return int(row[0]), int(row[1]) == 1
 
 
-def touch_chat(conn: sqlite3.Connection, *, chat_id: int, title: str | None) -> None:
-    conn.execute(
-        """
-        INSERT INTO chats (chat_id, title)
-        VALUES (?, ?)
-        ON CONFLICT(chat_id) DO UPDATE SET
-            title          = COALESCE(excluded.title, chats.title),
-            last_active_at = datetime('now')
-        """,
-        (chat_id, title),
-    )
-
-
 # ---------------------------------------------------------------------------
 # Driver
 # ---------------------------------------------------------------------------
@@ -401,6 +304,7 @@ async def run(
     cool_down: float,
     cache_only: bool,
     dry_run: bool,
+    concurrency: int,
 ) -> None:
     shares = parse_export(files)
     if not shares:
@@ -410,93 +314,131 @@ async def run(
     unique_urls = {s.url for s in shares}
     logger.info("Unique URLs: %d (across %d shares)", len(unique_urls), len(shares))
 
+    # YouTube searches spend the same daily Data API quota as the bot, so
+    # they're booked in the bot's ledger (in this database, even on a dry run)
+    # and stop once only the live reserve is left. Definitive Songlink misses
+    # go to its resolution cache there too, so a resumed run skips them.
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    db = await Database(db_path).connect()
+    repo = Repo(db)
+    youtube_quota = QuotaLedger(
+        repo,
+        provider="youtube",
+        daily_budget=settings.youtube_daily_quota,
+        live_reserve=min(settings.youtube_live_reserve, settings.youtube_daily_quota),
+    )
+    await youtube_quota.load()
     client = httpx.AsyncClient(
         timeout=httpx.Timeout(15.0),
         headers={"User-Agent": "banger-link-importer/2.0"},
     )
-    resolver = CachedResolver(
-        cache_path,
-        client,
-        throttle_seconds=throttle,
-        rate_limit_cool_down=cool_down,
-        cache_only=cache_only,
+    songlink = SonglinkClient(
+        client=client,
+        timeout_seconds=15.0,
+        cache=ResolutionCache(
+            repo,
+            ttl_seconds=settings.songlink_cache_ttl_hours * 3600,
+            negative_ttl_seconds=settings.songlink_negative_cache_ttl_hours * 3600,
+        ),
+        limiter=_CoolingLimiter(rate=1 / throttle, cool_down=cool_down),
     )
+    resolver = CachedResolver(cache_path, songlink, cache_only=cache_only)
     # Reuse the bot's gap-filler so the historical backfill carries Spotify /
     # Apple Music / YouTube links Songlink wouldn't return on its own.
     fallback = FallbackResolver(
         spotify=SpotifyAnonymousClient(),
         itunes=ITunesSearchClient(country=os.environ.get("FALLBACK_USER_COUNTRY", "US")),
-        youtube=YouTubeSearchClient(api_key=os.environ.get("YOUTUBE_API_KEY")),
+        youtube=YouTubeSearchClient(api_key=os.environ.get("YOUTUBE_API_KEY"), quota=youtube_quota),
     )
 
     try:
         # Resolve all unique URLs up front so DB writes happen in one fast loop.
+        # Cache hits return immediately; misses overlap their round-trips but
+        # still go out no faster than the limiter allows.
         resolved_by_url: dict[str, ResolvedSong | None] = {}
-        for i, url in enumerate(sorted(unique_urls), start=1):
-            resolved = await resolver.resolve(url)
-            if resolved is not None:
-                try:
-                    resolved = await fallback.fill(resolved)
-                except Exception:
-                    logger.exception("fallback.fill raised; using Songlink result as-is")
-                logger.info("[%d/%d] %s — %s", i, len(unique_urls), resolved.title, resolved.artist)
-            else:
-                logger.warning("[%d/%d] could not resolve %s", i, len(unique_urls), url)
+        async for url, resolved in resolver.resolve_many(
+            sorted(unique_urls), concurrency=concurrency
+        ):
             resolved_by_url[url] = resolved
-    finally:
-        await client.aclose()
-        await fallback.aclose()
-
-    if dry_run:
-        skipped = sum(1 for v in resolved_by_url.values() if v is None)
-        logger.info(
-            "DRY RUN: would replay %d shares (%d unique URLs, %d unresolved). Exiting without writes.",
-            len(shares),
-            len(unique_urls),
-            skipped,
-        )
-        return
-
-    db_path.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(db_path)
-    conn.execute("PRAGMA foreign_keys = ON")
-    ensure_schema(conn)
-
-    inserted_songs: set[int] = set()
-    new_chat_songs = 0
-    repeat_mentions = 0
-    skipped = 0
-
-    try:
-        touch_chat(conn, chat_id=chat_id, title=chat_title)
-        for share in shares:
-            resolved = resolved_by_url.get(share.url)
             if resolved is None:
-                skipped += 1
-                continue
-            song_id = upsert_song(conn, resolved=resolved, when=share.timestamp)
-            inserted_songs.add(song_id)
-            user_id = _fnv1a_64(share.sender_name)
-            _, first_time = record_mention(
-                conn,
-                chat_id=chat_id,
-                song_id=song_id,
-                user_id=user_id,
-                user_name=share.sender_name,
-                when=share.timestamp,
+                logger.warning(
+                    "[%d/%d] could not resolve %s", len(resolved_by_url), len(unique_urls), url
+                )
+
+        # Several URLs often resolve to one song — fill each song once.
+        songs = {r.entity_id: r for r in resolved_by_url.values() if r is not None}
+        filled: dict[str, ResolvedSong] = {}
+        searched: dict[str, set[str]] = {}
+        async for song, result in fallback.fill_many(
+            songs.values(), concurrency=concurrency, priority=Priority.IMPORT
+        ):
+            filled[song.entity_id] = result
+            searched[song.entity_id] = result.platform_links.keys() - song.platform_links.keys()
+            logger.info("[%d/%d] %s — %s", len(filled), len(songs), result.title, result.artist)
+        resolved_by_url = {
+            url: None if r is None else filled[r.entity_id] for url, r in resolved_by_url.items()
+        }
+        logger.info("YouTube quota: %s", youtube_quota.stats())
+
+        if dry_run:
+            skipped = sum(1 for v in resolved_by_url.values() if v is None)
+            logger.info(
+                "DRY RUN: would replay %d shares (%d unique URLs, %d unresolved). "
+                "Exiting without writes.",
+                len(shares),
+                len(unique_urls),
+                skipped,
             )
-            if first_time:
-                new_chat_songs += 1
-            else:
-                repeat_mentions += 1
-        conn.commit()
+            return
+
+        # Songs go through the bot's own upsert, so links stored earlier are
+        # merged rather than replaced, and an entity the dedupe job folded
+        # into another song lands on that song again instead of coming back.
+        song_ids: dict[str, int] = {}
+        new_chat_songs = 0
+        repeat_mentions = 0
+        skipped = 0
+        async with repo.unit_of_work() as uow:
+            await repo.touch_chat(chat_id=chat_id, title=chat_title, uow=uow)
+            for share in shares:
+                resolved = resolved_by_url.get(share.url)
+                if resolved is None:
+                    skipped += 1
+                    continue
+                song_id = song_ids.get(resolved.entity_id)
+                if song_id is None:
+                    song_id = song_ids[resolved.entity_id] = await repo.upsert_song(
+                        entity_id=resolved.entity_id,
+                        title=resolved.title,
+                        artist=resolved.artist,
+                        thumbnail_url=resolved.thumbnail_url,
+                        platform_links=resolved.platform_links,
+                        fallback_platforms=searched[resolved.entity_id],
+                        uow=uow,
+                    )
+                    # Shares are replayed oldest first.
+                    await backdate_song(db.conn, song_id=song_id, when=share.timestamp)
+                _, first_time = await record_mention(
+                    db.conn,
+                    chat_id=chat_id,
+                    song_id=song_id,
+                    user_id=_fnv1a_64(share.sender_name),
+                    user_name=share.sender_name,
+                    when=share.timestamp,
+                )
+                if first_time:
+                    new_chat_songs += 1
+                else:
+                    repeat_mentions += 1
     finally:
-        conn.close()
+        await client.aclose()
+        await fallback.aclose()
+        await db.close()
 
     logger.info(
         "Done. shares=%d  unique_songs=%d  new_chat_songs=%d  repeat_mentions=%d  unresolved=%d",
         len(shares),
-        len(inserted_songs),
+        len(set(song_ids.values())),
         new_chat_songs,
         repeat_mentions,
         skipped,
@@ -518,7 +460,7 @@ def main() -> None:
     parser.add_argument(
         "--dry-run",
         action="store_true",
-        help="Resolve URLs and print stats without writing the DB.",
+        help="Resolve URLs and print stats without writing any shares to the DB.",
     )
     parser.add_argument(
         "--throttle",
@@ -537,6 +479,12 @@ def main() -> None:
         action="store_true",
         help="Only use already-cached resolutions; never call Songlink. Cache misses count as unresolved.",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Max lookups in flight at once (Songlink calls are still paced by --throttle).",
+    )
     parser.add_argument("--log-level", default="INFO")
     args = parser.parse_args()
 
@@ -557,6 +505,7 @@ def main() -> None:
             cool_down=args.cool_down,
             cache_only=args.cache_only,
             dry_run=args.dry_run,
+            concurrency=args.concurrency,
         )
     )
 
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from banger_link.services.batch import bounded_map
+
+
+async def test_yields_in_completion_order_within_the_cap() -> None:
+    running = 0
+    peak = 0
+
+    async def work(delay: float) -> float:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(delay)
+        running -= 1
+        return delay * 2
+
+    results = [pair async for pair in bounded_map([0.1, 0.02, 0.06, 0.0], work, concurrency=2)]
+
+    assert peak == 2
+    assert results == [(0.02, 0.04), (0.06, 0.12), (0.0, 0.0), (0.1, 0.2)]
+
+
+async def test_closing_early_cancels_pending_work() -> None:
+    cancelled = 0
+
+    async def work(delay: float) -> float:
+        nonlocal cancelled
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled += 1
+            raise
+        return delay
+
+    stream = bounded_map([0.0, 10.0, 10.0], work, concurrency=3)
+    assert await anext(stream) == (0.0, 0.0)
+    await stream.aclose()
+    await asyncio.sleep(0)
+    assert cancelled == 2
+
+
+async def test_rejects_zero_concurrency() -> None:
+    async def work(item: int) -> int:
+        return item
+
+    with pytest.raises(ValueError):
+        await anext(bounded_map([1], work, concurrency=0))
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import pytest
+
+from banger_link.canonical import (
+    canonicalize,
+    extract_platform_id,
+    is_music_url,
+    platform_ids,
+)
+
+
+@pytest.mark.parametrize(
+    "url,expected",
+    [
+        # Spotify: locale prefixes, share tracking and URIs all collapse.
+        (
+            "https://open.spotify.com/track/4uLU6hMCjMI75M1A2tKUQC",
+            "https://open.spotify.com/track/4uLU6hMCjMI75M1A2tKUQC",
+        ),
+        (
+            "https://open.spotify.com/intl-de/track/4uLU6hMCjMI75M1A2tKUQC?si=abc123",
+            "https://open.spotify.com/track/4uLU6hMCjMI75M1A2tKUQC",
+        ),
+        (
+            "https://open.spotify.com/intl-pt-br/album/1DFixLWuPkv3KT3TnV35m3",
+            "https://open.spotify.com/album/1DFixLWuPkv3KT3TnV35m3",
+        ),
+        (
+            "spotify:track:4uLU6hMCjMI75M1A2tKUQC",
+            "https://open.spotify.com/track/4uLU6hMCjMI75M1A2tKUQC",
+        ),
+        (
+            "https://open.spotify.com/embed/track/4uLU6hMCjMI75M1A2tKUQC",
+            "https://open.spotify.com/track/4uLU6hMCjMI75M1A2tKUQC",
+        ),
+        # YouTube: short links, timestamps and YouTube Music share one key.
+        ("https://youtu.be/dQw4w9WgXcQ?si=xyz", "https://www.youtube.com/watch?v=dQw4w9WgXcQ"),
+        (
+            "https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=30",
+            "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+        ),
+        (
+            "https://music.youtube.com/watch?v=dQw4w9WgXcQ&feature=share",
+            "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+        ),
+        (
+            "https://m.youtube.com/watch?list=PL1&v=dQw4w9WgXcQ",
+            "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+        ),
+        (
+            "https://www.youtube.com/shorts/dQw4w9WgXcQ",
+            "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+        ),
+        # Apple Music: slug and language dropped, storefront and track id kept.
+        (
+            "https://music.apple.com/us/album/lust-for-life/1440857781?i=1440857795&l=es",
+            "https://music.apple.com/us/album/1440857781?i=1440857795",
+        ),
+        (
+            "https://music.apple.com/gb/song/lust-for-life/1440857795",
+            "https://music.apple.com/gb/song/1440857795",
+        ),
+        # Deezer / Tidal / SoundCloud.
+        (
+            "https://www.deezer.com/en/track/3135556?utm_source=x",
+            "https://www.deezer.com/track/3135556",
+        ),
+        ("https://deezer.com/track/3135556", "https://www.deezer.com/track/3135556"),
+        ("https://tidal.com/browse/track/77646169", "https://tidal.com/track/77646169"),
+        ("https://listen.tidal.com/track/77646169/u", "https://tidal.com/track/77646169"),
+        (
+            "https://m.soundcloud.com/artist/track/?si=1&utm_source=clipboard",
+            "https://soundcloud.com/artist/track",
+        ),
+        # Generic: lowercase host, https, no fragment or tracking, sorted query.
+        (
+            "HTTP://Music.Amazon.com/albums/B0?trackAsin=B1&ref=dm_sh#frag",
+            "https://music.amazon.com/albums/B0?trackAsin=B1",
+        ),
+    ],
+)
+def test_canonicalize(url: str, expected: str) -> None:
+    assert canonicalize(url) == expected
+    assert canonicalize(expected) == expected  # idempotent
+
+
+@pytest.mark.parametrize("url", ["not a url", "mailto:x@y.test", "https://"])
+def test_canonicalize_leaves_non_urls_alone(url: str) -> None:
+    assert canonicalize(url) == url
+
+
+@pytest.mark.parametrize(
+    "url,expected",
+    [
+        ("https://open.spotify.com/track/abc", True),
+        ("https://music.apple.com/us/album/x/123", True),
+        ("https://youtu.be/xYz", True),
+        ("https://www.youtube.com/watch?v=abc", True),
+        ("https://soundcloud.com/artist/track", True),
+        ("https://song.link/s/abc", True),
+        ("https://example.com/whatever", False),
+        ("https://twitter.com/x/status/1", False),
+        ("not a url", False),
+    ],
+)
+def test_is_music_url(url: str, expected: bool) -> None:
+    assert is_music_url(url) is expected
+
+
+def test_is_music_url_accepts_canonical_spotify_uri() -> None:
+    assert not is_music_url("spotify:track:4uLU6hMCjMI75M1A2tKUQC")
+    assert is_music_url(canonicalize("spotify:track:4uLU6hMCjMI75M1A2tKUQC"))
+
+
+@pytest.mark.parametrize(
+    "url,expected",
+    [
+        (
+            "https://open.spotify.com/intl-fr/track/4uLU6hMCjMI75M1A2tKUQC?si=x",
+            ("spotify", "4uLU6hMCjMI75M1A2tKUQC"),
+        ),
+        ("https://youtu.be/dQw4w9WgXcQ", ("youtube", "dQw4w9WgXcQ")),
+        ("https://music.youtube.com/watch?v=dQw4w9WgXcQ", ("youtube", "dQw4w9WgXcQ")),
+        (
+            "https://geo.music.apple.com/us/album/_/1440857781?i=1440857795&mt=1&app=music",
+            ("appleMusic", "1440857795"),
+        ),
+        ("https://music.apple.com/us/song/lust-for-life/1440857795", ("appleMusic", "1440857795")),
+        ("https://www.deezer.com/fr/track/3135556", ("deezer", "3135556")),
+        ("https://listen.tidal.com/track/77646169", ("tidal", "77646169")),
+        ("https://soundcloud.com/Iggy-Pop/Lust-For-Life", ("soundcloud", "iggy-pop/lust-for-life")),
+        ("https://music.amazon.com/albums/B0001?trackAsin=B0002", ("amazonMusic", "B0002")),
+        # Not single tracks.
+        ("https://open.spotify.com/album/1DFixLWuPkv3KT3TnV35m3", None),
+        ("https://music.apple.com/us/album/lust-for-life/1440857781", None),
+        ("https://soundcloud.com/artist/sets/playlist", None),
+        ("https://song.link/s/abc", None),
+    ],
+)
+def test_extract_platform_id(url: str, expected: tuple[str, str] | None) -> None:
+    assert extract_platform_id(url) == expected
+
+
+def test_platform_ids_collects_every_known_link() -> None:
+    links = {
+        "spotify": "https://open.spotify.com/track/abc",
+        "youtube": "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+        "youtubeMusic": "https://music.youtube.com/watch?v=dQw4w9WgXcQ",
+        "pandora": "https://www.pandora.com/artist/x",
+    }
+    assert platform_ids(links) == {("spotify", "abc"), ("youtube", "dQw4w9WgXcQ")}
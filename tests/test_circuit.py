@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+import httpx
+import respx
+
+from banger_link.db.connection import Database
+from banger_link.db.repo import Repo
+from banger_link.services.circuit import CircuitBreaker, CircuitState
+from banger_link.services.resolution_cache import ResolutionCache
+from banger_link.services.songlink import SonglinkClient
+from tests.test_songlink import API, SAMPLE_PAYLOAD
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1_700_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_opens_after_threshold_and_rejects() -> None:
+    breaker = CircuitBreaker(name="t", failure_threshold=3, reset_timeout=10, clock=_Clock())
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state is CircuitState.CLOSED
+    breaker.record_failure()
+    assert breaker.state is CircuitState.OPEN
+    assert not breaker.allow()
+    assert breaker.snapshot()["rejected"] == 1
+
+
+def test_success_resets_the_failure_count() -> None:
+    breaker = CircuitBreaker(name="t", failure_threshold=2, clock=_Clock())
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state is CircuitState.CLOSED
+
+
+def test_half_open_lets_one_probe_through() -> None:
+    clock = _Clock()
+    breaker = CircuitBreaker(name="t", failure_threshold=1, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    clock.now += 10
+    assert breaker.state is CircuitState.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # probe already in flight
+
+    breaker.record_failure()  # probe failed → straight back to open
+    assert breaker.state is CircuitState.OPEN
+    assert breaker.snapshot()["times_opened"] == 2
+
+    clock.now += 10
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state is CircuitState.CLOSED
+
+
+def test_released_and_stale_probes_free_the_slot() -> None:
+    clock = _Clock()
+    breaker = CircuitBreaker(
+        name="t", failure_threshold=1, reset_timeout=10, probe_timeout=5, clock=clock
+    )
+    breaker.record_failure()
+    clock.now += 10
+    assert breaker.allow()
+    breaker.release_probe()  # gave up before sending: no verdict either way
+    assert breaker.state is CircuitState.HALF_OPEN
+    assert breaker.ready()
+
+    assert breaker.allow()  # ...and this one never reports back at all
+    assert not breaker.allow()
+    clock.now += 5
+    assert breaker.allow()
+
+
+@respx.mock
+async def test_cancelled_probe_does_not_wedge_the_circuit() -> None:
+    sent = asyncio.Event()
+
+    async def hang(request: httpx.Request) -> httpx.Response:
+        sent.set()
+        await asyncio.Event().wait()
+        raise AssertionError("unreachable")
+
+    route = respx.get(API).mock(side_effect=hang)
+    clock = _Clock()
+    breaker = CircuitBreaker(name="songlink", failure_threshold=1, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    clock.now += 10
+    async with httpx.AsyncClient() as http:
+        client = SonglinkClient(client=http, max_retries=0, breaker=breaker)
+        probe = asyncio.create_task(client.resolve("https://open.spotify.com/track/abc"))
+        await sent.wait()
+        assert not breaker.ready()
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+
+        assert breaker.state is CircuitState.HALF_OPEN
+        route.mock(return_value=httpx.Response(200, json=SAMPLE_PAYLOAD))
+        assert await client.resolve("https://open.spotify.com/track/abc") is not None
+    assert breaker.state is CircuitState.CLOSED
+
+
+@respx.mock
+async def test_open_circuit_serves_stale_cache_without_calling_songlink(tmp_path: Path) -> None:
+    clock = _Clock()
+    route = respx.get(API).mock(return_value=httpx.Response(200, json=SAMPLE_PAYLOAD))
+    db = await Database(tmp_path / "test.db").connect()
+    try:
+        cache = ResolutionCache(Repo(db), ttl_seconds=60, negative_ttl_seconds=60, clock=clock)
+        breaker = CircuitBreaker(name="songlink", failure_threshold=1, reset_timeout=30)
+        async with httpx.AsyncClient() as http:
+            client = SonglinkClient(client=http, max_retries=0, cache=cache, breaker=breaker)
+            url = "https://open.spotify.com/track/abc"
+            assert await client.resolve(url) is not None
+
+            clock.now += 120  # entry has expired
+            breaker.record_failure()  # ...and Songlink is down
+            stale = await client.resolve(url)
+            missing = await client.resolve("https://open.spotify.com/track/other")
+    finally:
+        await db.close()
+
+    assert stale is not None and stale.title == "Lust for Life"
+    assert missing is None
+    assert route.call_count == 1
+    stats = client.stats()
+    assert stats["short_circuited"] == 2
+    assert stats["circuit"]["state"] == "open"  # type: ignore[index]
+
+
+@respx.mock
+async def test_server_errors_trip_the_breaker() -> None:
+    route = respx.get(API).mock(return_value=httpx.Response(503))
+    breaker = CircuitBreaker(name="songlink", failure_threshold=2, reset_timeout=30)
+    async with httpx.AsyncClient() as http:
+        client = SonglinkClient(client=http, max_retries=5, breaker=breaker)
+        assert await client.resolve("https://open.spotify.com/track/abc") is None
+        assert await client.resolve("https://open.spotify.com/track/def") is None
+    # Retries stop as soon as the circuit opens, and the second call never goes out.
+    assert route.call_count == 2
+    assert breaker.state is CircuitState.OPEN
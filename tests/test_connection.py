@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import sqlite3
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import aiosqlite
+import pytest
+
+from banger_link.db import connection
+from banger_link.db.connection import SCHEMA_VERSION, Database
+from banger_link.db.repo import Repo
+
+# The schema as shipped at user_version 1, before the resolution cache existed.
+V1_SCHEMA = """
+CREATE TABLE songs (
+    id INTEGER PRIMARY KEY, entity_id TEXT NOT NULL, title TEXT NOT NULL,
+    artist TEXT NOT NULL, thumbnail_url TEXT, platform_links TEXT NOT NULL,
+    created_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
+CREATE UNIQUE INDEX songs_entity_id ON songs(entity_id);
+CREATE TABLE chat_songs (
+    id INTEGER PRIMARY KEY, chat_id INTEGER NOT NULL,
+    song_id INTEGER NOT NULL REFERENCES songs(id) ON DELETE CASCADE,
+    first_user_id INTEGER NOT NULL, first_user_name TEXT NOT NULL,
+    mentions INTEGER NOT NULL DEFAULT 1,
+    first_seen_at TEXT NOT NULL DEFAULT (datetime('now')),
+    last_seen_at TEXT NOT NULL DEFAULT (datetime('now')),
+    UNIQUE(chat_id, song_id)
+);
+CREATE INDEX chat_songs_by_chat ON chat_songs(chat_id, last_seen_at DESC);
+CREATE TABLE reactions (
+    chat_song_id INTEGER NOT NULL REFERENCES chat_songs(id) ON DELETE CASCADE,
+    user_id INTEGER NOT NULL,
+    kind TEXT NOT NULL CHECK (kind IN ('like', 'dislike')),
+    reacted_at TEXT NOT NULL DEFAULT (datetime('now')),
+    PRIMARY KEY (chat_song_id, user_id)
+);
+CREATE TABLE chats (
+    chat_id INTEGER PRIMARY KEY, title TEXT,
+    digest_weekly INTEGER NOT NULL DEFAULT 1, digest_monthly INTEGER NOT NULL DEFAULT 1,
+    last_active_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
+PRAGMA user_version = 1;
+"""
+
+
+async def test_migrates_v1_database(tmp_path: Path) -> None:
+    path = tmp_path / "old.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(V1_SCHEMA)
+    conn.execute(
+        "INSERT INTO songs (entity_id, title, artist, platform_links) VALUES (?, ?, ?, ?)",
+        ("SPOTIFY_SONG::abc", "T", "A", '{"spotify": "https://open.spotify.com/track/abc"}'),
+    )
+    conn.execute(
+        "INSERT INTO chat_songs (chat_id, song_id, first_user_id, first_user_name) "
+        "VALUES (-1, 1, 1, 'Alice')"
+    )
+    conn.executemany(
+        "INSERT INTO reactions (chat_song_id, user_id, kind) VALUES (1, ?, ?)",
+        [(10, "like"), (11, "like"), (12, "dislike")],
+    )
+    conn.commit()
+    conn.close()
+
+    db = await Database(path).connect()
+    try:
+        async with db.conn.execute("PRAGMA user_version") as cur:
+            row = await cur.fetchone()
+        assert row is not None and row[0] == SCHEMA_VERSION
+        repo = Repo(db)
+        assert await repo.get_cached_resolution("https://x") is None
+        assert (
+            await repo.get_cached_search(platform="youtube", title_key="t", artist_key="a") is None
+        )
+        assert await repo.get_quota_used(provider="youtube", day="2026-01-01") == 0
+        # The backfilled Spotify ID may have come from a fallback search, so it
+        # isn't trusted until Songlink returns it again.
+        assert await repo.find_song_by_platform_id(platform="spotify", native_id="abc") is None
+        await repo.record_song_refresh(
+            song_id=1,
+            thumbnail_url=None,
+            platform_links={"spotify": "https://open.spotify.com/track/abc"},
+        )
+        # Songs get their normalized title/artist keys.
+        assert await repo.catalog_links(title="t", artist="a") == {
+            "spotify": "https://open.spotify.com/track/abc"
+        }
+        # Alias tables exist: a new entity sharing the song's Spotify ID folds into it.
+        song = await repo.find_song_by_platform_id(platform="spotify", native_id="abc")
+        assert song is not None
+        assert (
+            await repo.upsert_song(
+                entity_id="ITUNES_SONG::1",
+                title="T",
+                artist="A",
+                thumbnail_url=None,
+                platform_links={"spotify": "https://open.spotify.com/track/abc"},
+            )
+            == song.id
+        )
+        # Reaction counters are backfilled, and kept current from then on.
+        view = await repo.get_chat_song(1)
+        assert view is not None and (view.likes, view.dislikes) == (2, 1)
+        state = await repo.toggle_reaction(chat_song_id=1, user_id=12, kind="like")
+        assert (state.likes, state.dislikes) == (3, 0)
+        # Migrated songs are due for a refresh (no refreshed_at yet).
+        await db.conn.execute("UPDATE songs SET refreshed_at = NULL")
+        await db.conn.commit()
+        due = await repo.songs_needing_refresh(
+            stale_before=datetime.now(tz=UTC) + timedelta(seconds=1),
+            incomplete_before=datetime.now(tz=UTC),
+            expected_platforms=("spotify",),
+            limit=10,
+        )
+        assert [s.entity_id for s in due] == ["SPOTIFY_SONG::abc"]
+    finally:
+        await db.close()
+
+
+async def test_failed_migration_is_rolled_back_and_retried(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = tmp_path / "old.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(V1_SCHEMA)
+    conn.close()
+
+    async def boom(conn: aiosqlite.Connection) -> None:
+        raise RuntimeError("backfill failed")
+
+    monkeypatch.setitem(connection._BACKFILLS, 7, boom)
+    db = Database(path)
+    with pytest.raises(RuntimeError, match="backfill failed"):
+        await db.connect()
+    await db.close()
+
+    conn = sqlite3.connect(path)
+    # Steps before 7 are in; 7's ALTER TABLEs are rolled back with its backfill.
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 6
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(songs)")}
+    assert "refreshed_at" in columns and "title_key" not in columns
+    conn.close()
+
+    monkeypatch.undo()
+    db = await Database(path).connect()
+    try:
+        async with db.conn.execute("PRAGMA user_version") as cur:
+            row = await cur.fetchone()
+        assert row is not None and row[0] == SCHEMA_VERSION
+    finally:
+        await db.close()
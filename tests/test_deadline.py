@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+import respx
+
+from banger_link.services.deadline import Deadline, DeadlineExceeded
+from banger_link.services.fallback_resolver import FallbackResolver
+from banger_link.services.songlink import SonglinkClient
+from tests.test_fallback_resolver import _resolved, _StubClient
+from tests.test_songlink import API, SAMPLE_PAYLOAD
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_remaining_timeout_and_reserve_follow_the_clock() -> None:
+    clock = _Clock()
+    deadline = Deadline.after(10, clock=clock)
+    clock.now += 4
+    assert deadline.remaining() == 6
+    assert deadline.timeout(8.0) == 6
+    assert deadline.timeout(2.0) == 2
+    assert deadline.reserve(2).remaining() == 4
+
+    clock.now += 7
+    assert deadline.remaining() == 0
+    assert deadline.expired
+    with pytest.raises(DeadlineExceeded, match="reply"):
+        deadline.check("reply")
+
+
+async def test_run_cancels_work_that_outlives_the_deadline() -> None:
+    cancelled = False
+
+    async def slow() -> None:
+        nonlocal cancelled
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+
+    with pytest.raises(DeadlineExceeded, match="slow stage"):
+        await Deadline.after(0.02).run(slow(), "slow stage")
+    assert cancelled
+
+
+async def test_run_refuses_to_start_once_expired() -> None:
+    started = False
+
+    async def work() -> None:
+        nonlocal started
+        started = True
+
+    with pytest.raises(DeadlineExceeded):
+        await Deadline.after(0).run(work(), "late stage")
+    assert not started
+
+
+async def test_run_leaves_the_stage_s_own_timeouts_alone() -> None:
+    async def times_out() -> None:
+        raise TimeoutError("upstream")
+
+    with pytest.raises(TimeoutError, match="upstream") as info:
+        await Deadline.after(5).run(times_out(), "stage")
+    assert not isinstance(info.value, DeadlineExceeded)
+
+
+@respx.mock
+async def test_songlink_skips_retries_that_cannot_fit() -> None:
+    route = respx.get(API).mock(
+        side_effect=[httpx.Response(500), httpx.Response(200, json=SAMPLE_PAYLOAD)]
+    )
+    async with httpx.AsyncClient() as http:
+        songlink = SonglinkClient(client=http, max_retries=2)
+        # The first backoff is 0.5s; with less than that left, don't retry.
+        result = await songlink.resolve(
+            "https://open.spotify.com/track/abc", deadline=Deadline.after(0.3)
+        )
+    assert result is None
+    assert route.call_count == 1
+
+
+@respx.mock
+async def test_songlink_attempt_timeout_shrinks_to_the_deadline() -> None:
+    seen: list[float] = []
+
+    def record(request: httpx.Request) -> httpx.Response:
+        seen.append(request.extensions["timeout"]["read"])
+        return httpx.Response(200, json=SAMPLE_PAYLOAD)
+
+    respx.get(API).mock(side_effect=record)
+    async with httpx.AsyncClient() as http:
+        songlink = SonglinkClient(client=http, timeout_seconds=8.0)
+        await songlink.resolve("https://open.spotify.com/track/abc", deadline=Deadline.after(3))
+    assert len(seen) == 1
+    assert 0 < seen[0] <= 3
+
+
+async def test_fill_keeps_what_finished_before_the_deadline() -> None:
+    class _HangingClient(_StubClient):
+        async def search(self, *, title: str, artist: str, **_: object) -> str | None:
+            await asyncio.sleep(10)
+            return self.url
+
+    spotify = _StubClient(url="https://open.spotify.com/track/A")
+    youtube = _HangingClient(url="https://www.youtube.com/watch?v=C")
+    resolver = FallbackResolver(spotify=spotify, itunes=None, youtube=youtube)  # type: ignore[arg-type]
+
+    result = await resolver.fill(_resolved(), deadline=Deadline.after(0.05))
+
+    assert result.platform_links["spotify"] == "https://open.spotify.com/track/A"
+    assert "youtube" not in result.platform_links
+    assert resolver.stats()["single_flight"]["in_flight"] == 0  # type: ignore[index]
@@ -1,6 +1,10 @@
 from __future__ import annotations
 
+import asyncio
+import json
 import time
+from dataclasses import replace
+from pathlib import Path
 
 import httpx
 import pytest
@@ -12,7 +16,9 @@ from banger_link.services.fallback_resolver import (
     SpotifyAnonymousClient,
     YouTubeSearchClient,
     _spotify_totp,
+    _spotify_totp_secret,
 )
+from banger_link.services.scheduler import Priority
 from banger_link.services.songlink import ResolvedSong
 
 
@@ -188,6 +194,95 @@ async def test_spotify_token_endpoint_failure_returns_none() -> None:
         await client.aclose()
 
 
+def test_spotify_totp_secret_is_memoized() -> None:
+    assert _spotify_totp_secret() is _spotify_totp_secret()
+
+
+def _token_json(token: str, ttl: float = 3600) -> dict[str, object]:
+    return {
+        "accessToken": token,
+        "accessTokenExpirationTimestampMs": int((time.time() + ttl) * 1000),
+        "isAnonymous": True,
+    }
+
+
+_SEARCH_HIT = {
+    "tracks": {"items": [{"external_urls": {"spotify": "https://open.spotify.com/track/x"}}]}
+}
+
+
+@respx.mock
+async def test_spotify_token_survives_a_restart(tmp_path: Path) -> None:
+    token_route = respx.get("https://open.spotify.com/api/token").respond(json=_token_json("tok"))
+    search_route = respx.get("https://api.spotify.com/v1/search").respond(json=_SEARCH_HIT)
+    path = tmp_path / "spotify_token.json"
+
+    first = SpotifyAnonymousClient(token_path=path)
+    try:
+        await first.search(title="a", artist="b")
+    finally:
+        await first.aclose()
+    assert json.loads(path.read_text())["access_token"] == "tok"
+
+    second = SpotifyAnonymousClient(token_path=path)
+    try:
+        assert await second.search(title="a", artist="b") == "https://open.spotify.com/track/x"
+    finally:
+        await second.aclose()
+    assert token_route.call_count == 1
+    assert search_route.calls.last.request.headers["Authorization"] == "Bearer tok"
+
+
+async def test_spotify_ignores_an_unreadable_token_file(tmp_path: Path) -> None:
+    path = tmp_path / "spotify_token.json"
+    path.write_text("{not json")
+    client = SpotifyAnonymousClient(token_path=path)
+    try:
+        assert client._token is None
+    finally:
+        await client.aclose()
+
+
+@respx.mock
+async def test_spotify_refresher_renews_ahead_of_expiry() -> None:
+    # Inside REFRESH_AHEAD but outside the lazy 30s margin: only the
+    # background refresher would replace it.
+    token_route = respx.get("https://open.spotify.com/api/token").mock(
+        side_effect=[
+            httpx.Response(200, json=_token_json("old", ttl=120)),
+            httpx.Response(200, json=_token_json("new")),
+        ]
+    )
+    client = SpotifyAnonymousClient()
+    client.RETRY_MIN = 0.01
+    try:
+        client.start()
+        for _ in range(100):
+            if client.refreshes >= 2:
+                break
+            await asyncio.sleep(0.01)
+        assert client._token == "new"
+        assert client.stats()["refreshes"] == 2
+    finally:
+        await client.aclose()
+    assert token_route.call_count == 2
+
+
+@respx.mock
+async def test_spotify_search_does_not_wait_on_the_refresher() -> None:
+    token_route = respx.get("https://open.spotify.com/api/token").respond(status_code=500)
+    search_route = respx.get("https://api.spotify.com/v1/search").respond(json=_SEARCH_HIT)
+    client = SpotifyAnonymousClient()
+    try:
+        client.start()
+        await asyncio.sleep(0)
+        assert await client.search(title="a", artist="b") is None
+        assert token_route.call_count == 1  # the refresher's own attempt only
+        assert not search_route.called
+    finally:
+        await client.aclose()
+
+
 # ---------------------------------------------------------------------------
 # iTunes Search
 # ---------------------------------------------------------------------------
@@ -283,13 +378,16 @@ class _StubClient:
         self.url = url
         self.calls: list[tuple[str, str]] = []
 
-    async def search(self, *, title: str, artist: str) -> str | None:
+    async def search(self, *, title: str, artist: str, **_: object) -> str | None:
         self.calls.append((title, artist))
         return self.url
 
     async def aclose(self) -> None:
         pass
 
+    def stats(self) -> dict[str, object]:
+        return {}
+
 
 async def test_fill_only_calls_missing_platforms() -> None:
     spotify = _StubClient(url="https://open.spotify.com/track/A")
@@ -336,7 +434,7 @@ async def test_fill_skips_disabled_subclients() -> None:
 
 async def test_fill_swallows_subclient_exceptions() -> None:
     class _RaisingClient(_StubClient):
-        async def search(self, *, title: str, artist: str) -> str | None:
+        async def search(self, *, title: str, artist: str, **_: object) -> str | None:
             raise RuntimeError("boom")
 
     spotify = _RaisingClient()
@@ -346,6 +444,86 @@ async def test_fill_swallows_subclient_exceptions() -> None:
     assert "spotify" not in result.platform_links
 
 
+async def test_concurrent_fills_share_one_search_per_platform() -> None:
+    class _SlowClient(_StubClient):
+        async def search(self, *, title: str, artist: str, **_: object) -> str | None:
+            self.calls.append((title, artist))
+            await asyncio.sleep(0.01)
+            return self.url
+
+    spotify = _SlowClient(url="https://open.spotify.com/track/A")
+    resolver = FallbackResolver(spotify=spotify, itunes=None, youtube=None)  # type: ignore[arg-type]
+    results = await asyncio.gather(*(resolver.fill(_resolved()) for _ in range(3)))
+
+    assert len(spotify.calls) == 1
+    assert all(r.platform_links["spotify"] == "https://open.spotify.com/track/A" for r in results)
+
+
+async def test_live_and_studio_fills_search_separately() -> None:
+    class _SlowClient(_StubClient):
+        async def search(self, *, title: str, artist: str, **_: object) -> str | None:
+            self.calls.append((title, artist))
+            await asyncio.sleep(0.01)
+            return f"https://open.spotify.com/track/{title}"
+
+    spotify = _SlowClient()
+    resolver = FallbackResolver(spotify=spotify, itunes=None, youtube=None)  # type: ignore[arg-type]
+    live = replace(_resolved(), title="Lust for Life - Live at Wembley")
+    studio, live = await asyncio.gather(resolver.fill(_resolved()), resolver.fill(live))
+
+    assert len(spotify.calls) == 2
+    assert studio.platform_links["spotify"] != live.platform_links["spotify"]
+
+
+async def test_live_fill_does_not_join_a_refused_background_search() -> None:
+    class _MeteredClient(_StubClient):
+        async def search(
+            self, *, title: str, artist: str, priority: Priority = Priority.LIVE, **_: object
+        ) -> str | None:
+            self.calls.append((title, artist))
+            await asyncio.sleep(0.01)
+            # Background quota is spent; the live reserve isn't.
+            return self.url if priority is Priority.LIVE else None
+
+    youtube = _MeteredClient(url="https://www.youtube.com/watch?v=C")
+    resolver = FallbackResolver(spotify=None, itunes=None, youtube=youtube)  # type: ignore[arg-type]
+    background, live = await asyncio.gather(
+        resolver.fill(_resolved(), priority=Priority.REFRESH),
+        resolver.fill(_resolved(), priority=Priority.LIVE),
+    )
+
+    assert "youtube" not in background.platform_links
+    assert live.platform_links["youtube"] == "https://www.youtube.com/watch?v=C"
+    assert len(youtube.calls) == 2
+
+
+async def test_fill_many_fills_every_song_and_survives_failures() -> None:
+    class _PickyClient(_StubClient):
+        async def search(self, *, title: str, artist: str, **_: object) -> str | None:
+            if artist == "Broken":
+                raise RuntimeError("boom")
+            return f"https://open.spotify.com/track/{title}"
+
+    resolver = FallbackResolver(spotify=_PickyClient(), itunes=None, youtube=None)  # type: ignore[arg-type]
+    songs = [
+        ResolvedSong(
+            entity_id=str(i),
+            title=f"t{i}",
+            artist="Broken" if i == 2 else "Iggy Pop",
+            thumbnail_url=None,
+            page_url="",
+            platform_links={"appleMusic": "https://a"},
+        )
+        for i in range(5)
+    ]
+
+    results = {song.entity_id: filled async for song, filled in resolver.fill_many(songs)}
+
+    assert len(results) == 5
+    assert results["0"].platform_links["spotify"] == "https://open.spotify.com/track/t0"
+    assert "spotify" not in results["2"].platform_links
+
+
 async def test_fill_no_op_when_no_title_or_artist() -> None:
     spotify = _StubClient(url="https://s/")
     resolver = FallbackResolver(spotify=spotify, itunes=None, youtube=None)  # type: ignore[arg-type]
@@ -356,6 +534,86 @@ async def test_fill_no_op_when_no_title_or_artist() -> None:
     assert spotify.calls == []
 
 
+async def test_fill_budget_returns_what_finished_and_cancels_the_rest() -> None:
+    class _HangingClient(_StubClient):
+        cancelled = False
+
+        async def search(self, *, title: str, artist: str, **_: object) -> str | None:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                self.cancelled = True
+                raise
+            return self.url
+
+    spotify = _StubClient(url="https://open.spotify.com/track/A")
+    youtube = _HangingClient(url="https://www.youtube.com/watch?v=C")
+    resolver = FallbackResolver(spotify=spotify, itunes=None, youtube=youtube)  # type: ignore[arg-type]
+
+    result = await resolver.fill(_resolved(), budget=0.05)
+
+    assert set(result.platform_links) == {"appleMusic", "spotify"}
+    assert youtube.cancelled
+
+
+def test_request_timeout_follows_provider_latency() -> None:
+    client = ITunesSearchClient()
+    assert client.request_timeout() == client.DEFAULT_TIMEOUT  # no samples yet
+    for _ in range(50):
+        client.latency.record(1.5)
+    assert client.request_timeout() == 3.0
+    for _ in range(200):
+        client.latency.record(0.05)
+    assert client.request_timeout() == client.MIN_TIMEOUT
+    for _ in range(200):
+        client.latency.record(30.0)
+    assert client.request_timeout() == client.DEFAULT_TIMEOUT
+
+
+@respx.mock
+async def test_search_requests_use_the_adaptive_timeout_and_report_latency() -> None:
+    route = respx.get("https://itunes.apple.com/search").respond(json={"results": []})
+    client = ITunesSearchClient()
+    for _ in range(50):
+        client.latency.record(0.8)
+    resolver = FallbackResolver(spotify=None, itunes=client, youtube=None)
+    try:
+        await client.search(title="T", artist="A")
+    finally:
+        await resolver.aclose()
+    assert route.calls.last.request.extensions["timeout"]["read"] == 1.6
+    stats = resolver.stats()["appleMusic"]
+    assert stats["timeout_s"] == 1.6  # type: ignore[index]
+    assert stats["latency"]["samples"] == 51  # type: ignore[index]
+
+
+async def test_fill_takes_links_from_the_catalog_before_searching() -> None:
+    class _Catalog:
+        async def catalog_links(self, *, title: str, artist: str, **_: object) -> dict[str, str]:
+            assert (title, artist) == ("Lust for Life", "Iggy Pop")
+            return {"spotify": "https://open.spotify.com/track/known", "deezer": "https://d"}
+
+    spotify = _StubClient(url="https://open.spotify.com/track/searched")
+    youtube = _StubClient(url="https://www.youtube.com/watch?v=C")
+    resolver = FallbackResolver(
+        spotify=spotify,
+        itunes=None,
+        youtube=youtube,
+        catalog=_Catalog(),  # type: ignore[arg-type]
+    )
+
+    result = await resolver.fill(_resolved())
+
+    assert result.platform_links == {
+        "appleMusic": "https://a",
+        "spotify": "https://open.spotify.com/track/known",
+        "youtube": "https://www.youtube.com/watch?v=C",
+    }
+    assert spotify.calls == []
+    assert youtube.calls
+    assert resolver.stats()["catalog_hits"] == 1
+
+
 @pytest.fixture(autouse=True)
 def _reset_respx() -> None:
     # respx.mock decorator handles its own routes per test; this is just a
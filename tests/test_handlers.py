@@ -1,28 +1,25 @@
 from __future__ import annotations
 
+import asyncio
+from dataclasses import replace
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
 import pytest
 
+from banger_link.db.connection import Database
+from banger_link.db.repo import MentionResult, Repo
+from banger_link.handlers import _state
 from banger_link.handlers.callbacks import KIND_FROM_LETTER
 from banger_link.handlers.commands import _parse_limit
-from banger_link.handlers.messages import _extract_url, _is_ignored, _is_music_url
-
-
-@pytest.mark.parametrize(
-    "url,expected",
-    [
-        ("https://open.spotify.com/track/abc", True),
-        ("https://music.apple.com/us/album/x/123", True),
-        ("https://youtu.be/xYz", True),
-        ("https://www.youtube.com/watch?v=abc", True),
-        ("https://soundcloud.com/artist/track", True),
-        ("https://song.link/s/abc", True),
-        ("https://example.com/whatever", False),
-        ("https://twitter.com/x/status/1", False),
-        ("not a url", False),
-    ],
+from banger_link.handlers.messages import (
+    _extract_url,
+    _fill_and_edit,
+    _is_ignored,
+    handle_message,
 )
-def test_is_music_url(url: str, expected: bool) -> None:
-    assert _is_music_url(url) is expected
+from banger_link.services.songlink import ResolvedSong
 
 
 @pytest.mark.parametrize(
@@ -33,6 +30,10 @@ def test_is_music_url(url: str, expected: bool) -> None:
         ("at end: https://x.test/song.", "https://x.test/song"),  # trailing punctuation stripped
         ("(https://x.test/song)", "https://x.test/song"),
         ("first https://a.test/x and https://b.test/y", "https://a.test/x"),
+        (
+            "from desktop: spotify:track:4uLU6hMCjMI75M1A2tKUQC",
+            "spotify:track:4uLU6hMCjMI75M1A2tKUQC",
+        ),
     ],
 )
 def test_extract_url(text: str, expected: str | None) -> None:
@@ -64,3 +65,144 @@ def test_parse_limit(args: list[str] | None, expected: int) -> None:
 
 def test_callback_kind_letter_mapping() -> None:
     assert KIND_FROM_LETTER == {"l": "like", "d": "dislike"}
+
+
+class _StubFallback:
+    def __init__(self, extra: dict[str, str]) -> None:
+        self._extra = extra
+
+    async def fill(self, resolved: ResolvedSong, **_: object) -> ResolvedSong:
+        return replace(resolved, platform_links={**resolved.platform_links, **self._extra})
+
+
+async def _share(repo: Repo) -> tuple[ResolvedSong, MentionResult]:
+    song = ResolvedSong(
+        entity_id="x",
+        title="Lust for Life",
+        artist="Iggy Pop",
+        thumbnail_url=None,
+        page_url="https://song.link/s/x",
+        platform_links={"appleMusic": "https://music.apple.com/us/song/1"},
+    )
+    song_id = await repo.upsert_song(
+        entity_id=song.entity_id,
+        title=song.title,
+        artist=song.artist,
+        thumbnail_url=None,
+        platform_links=song.platform_links,
+    )
+    mention = await repo.record_mention(chat_id=-1, song_id=song_id, user_id=1, user_name="A")
+    return song, mention
+
+
+async def test_fill_and_edit_stores_and_edits_new_links(tmp_path: Path) -> None:
+    db = await Database(tmp_path / "test.db").connect()
+    try:
+        repo = Repo(db)
+        song, mention = await _share(repo)
+        await repo.toggle_reaction(chat_song_id=mention.chat_song_id, user_id=5, kind="like")
+        reply = AsyncMock()
+        fallback = _StubFallback({"spotify": "https://open.spotify.com/track/abc"})
+
+        await _fill_and_edit(
+            fallback=fallback,  # type: ignore[arg-type]
+            repo=repo,
+            reply=reply,
+            resolved=song,
+            mention=mention,
+        )
+
+        view = await repo.get_chat_song(mention.chat_song_id)
+    finally:
+        await db.close()
+
+    assert view is not None and "spotify" in view.platform_links
+    reply.edit_text.assert_awaited_once()
+    text = reply.edit_text.await_args.args[0]
+    assert "open.spotify.com/track/abc" in text
+    keyboard = reply.edit_text.await_args.kwargs["reply_markup"]
+    assert keyboard.inline_keyboard[0][0].text == "👍 1"  # counts survive the edit
+
+
+async def test_fill_and_edit_skips_edit_when_nothing_new(tmp_path: Path) -> None:
+    db = await Database(tmp_path / "test.db").connect()
+    try:
+        repo = Repo(db)
+        song, mention = await _share(repo)
+        reply = AsyncMock()
+        await _fill_and_edit(
+            fallback=_StubFallback({}),  # type: ignore[arg-type]
+            repo=repo,
+            reply=reply,
+            resolved=song,
+            mention=mention,
+        )
+    finally:
+        await db.close()
+    reply.edit_text.assert_not_awaited()
+
+
+async def test_share_is_answered_once_committed_even_if_late(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from banger_link import config
+
+    monkeypatch.setattr(config.settings, "reply_deadline_seconds", 0.3)
+    monkeypatch.setattr(config.settings, "reply_reserve_seconds", 0.1)
+
+    class _SlowRepo(Repo):
+        async def touch_chat(self, **kwargs: object) -> None:  # type: ignore[override]
+            await super().touch_chat(**kwargs)  # type: ignore[arg-type]
+            await asyncio.sleep(0.3)  # the writes run past the deadline
+
+    class _Songlink:
+        async def resolve(self, url: str, **_: object) -> ResolvedSong:
+            return ResolvedSong(
+                entity_id="x",
+                title="Lust for Life",
+                artist="Iggy Pop",
+                thumbnail_url=None,
+                page_url="https://song.link/s/x",
+                platform_links={"spotify": url},
+            )
+
+    message = SimpleNamespace(text="https://open.spotify.com/track/abc", reply_html=AsyncMock())
+    update = SimpleNamespace(
+        effective_message=message,
+        effective_chat=SimpleNamespace(id=-1, title="Chat"),
+        effective_user=SimpleNamespace(id=1, first_name="A", last_name=None),
+    )
+    db = await Database(tmp_path / "test.db").connect()
+    try:
+        repo = _SlowRepo(db)
+        fallback = _StubFallback({})
+        create_task = MagicMock()
+        context = SimpleNamespace(
+            bot_data={
+                _state.REPO_KEY: repo,
+                _state.SONGLINK_KEY: _Songlink(),
+                _state.FALLBACK_KEY: fallback,
+            },
+            application=SimpleNamespace(create_task=create_task),
+        )
+        await handle_message(update, context)  # type: ignore[arg-type]
+        top = await repo.search_chat(chat_id=-1, query="Lust")
+    finally:
+        await db.close()
+
+    assert [view.mentions for view in top] == [1]
+    message.reply_html.assert_awaited_once()
+    assert message.reply_html.await_args.kwargs["read_timeout"] == 0.1
+
+    # The platforms Songlink missed are filled in afterwards, on this reply.
+    create_task.assert_called_once()
+    (fill,), kwargs = create_task.call_args
+    try:
+        assert fill.cr_code is _fill_and_edit.__code__
+        args = fill.cr_frame.f_locals
+        assert args["fallback"] is fallback and args["repo"] is repo
+        assert args["reply"] is message.reply_html.return_value
+        assert args["mention"].chat_song_id == top[0].chat_song_id
+        assert kwargs == {"update": update, "name": f"fallback-fill:{top[0].chat_song_id}"}
+    finally:
+        fill.close()
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+
+from banger_link.services.hedge import Hedger
+from banger_link.services.latency import LatencyTracker
+from banger_link.services.ratelimit import RateLimiter
+from banger_link.services.songlink import SonglinkClient
+from tests.test_songlink import SAMPLE_PAYLOAD
+
+
+def _warm_tracker(seconds: float = 0.01, n: int = 5) -> LatencyTracker:
+    tracker = LatencyTracker(window=1000, min_samples=n)
+    for _ in range(n):
+        tracker.record(seconds)
+    return tracker
+
+
+class _Upstream:
+    """Serves the i-th call after delays[i] seconds; records cancellations."""
+
+    def __init__(self, *delays: float, fail_first: bool = False) -> None:
+        self._delays = list(delays)
+        self._fail_first = fail_first
+        self.calls = 0
+        self.cancelled = 0
+
+    async def __call__(self) -> int:
+        n = self.calls
+        self.calls += 1
+        try:
+            await asyncio.sleep(self._delays[n])
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self._fail_first and n == 0:
+            raise RuntimeError("boom")
+        return n
+
+
+def test_latency_tracker_percentiles_and_ewma() -> None:
+    tracker = LatencyTracker(window=100, alpha=0.5, min_samples=3)
+    tracker.record(1.0)
+    tracker.record(2.0)
+    assert tracker.percentile(0.5) is None and tracker.ewma is None  # not enough data
+    for value in range(3, 101):
+        tracker.record(float(value))
+    assert tracker.percentile(0.5) == 50.0
+    assert tracker.percentile(0.95) == 95.0
+    assert tracker.percentile(1.0) == 100.0
+    assert tracker.ewma == pytest.approx(99.0, abs=0.01)
+
+
+async def test_no_hedge_until_latency_is_known() -> None:
+    upstream = _Upstream(0.05)
+    hedger = Hedger(latency=LatencyTracker(min_samples=5), budget_fraction=1.0)
+    assert await hedger.run(upstream) == 0
+    assert upstream.calls == 1 and hedger.fired == 0
+
+
+async def test_slow_primary_is_hedged_and_loser_cancelled() -> None:
+    upstream = _Upstream(1.0, 0.0)
+    hedger = Hedger(latency=_warm_tracker(), budget_fraction=1.0, min_delay=0.01)
+
+    assert await hedger.run(upstream) == 1  # the backup answered first
+    await asyncio.sleep(0)
+    assert upstream.cancelled == 1
+    assert hedger.stats()["fired"] == 1
+    assert hedger.stats()["won"] == 1
+
+
+async def test_failed_primary_falls_through_to_the_backup() -> None:
+    upstream = _Upstream(0.05, 0.1, fail_first=True)
+    hedger = Hedger(latency=_warm_tracker(), budget_fraction=1.0, min_delay=0.01)
+    assert await hedger.run(upstream) == 1
+
+
+async def test_budget_caps_extra_traffic() -> None:
+    # Plenty of fast history, so the slow calls below don't move the p95.
+    hedger = Hedger(latency=_warm_tracker(n=200), budget_fraction=0.5, min_delay=0.01)
+    for _ in range(4):
+        await hedger.run(_Upstream(0.05, 0.05))
+    # 4 requests × 0.5 banks two hedges.
+    assert hedger.fired == 2
+    assert hedger.skipped == 2
+
+
+async def test_may_hedge_can_veto_the_backup() -> None:
+    upstream = _Upstream(0.05)
+    hedger = Hedger(latency=_warm_tracker(), budget_fraction=1.0, min_delay=0.01)
+    assert await hedger.run(upstream, may_hedge=lambda: False) == 0
+    assert upstream.calls == 1 and hedger.skipped == 1
+
+
+async def test_songlink_hedges_a_stalled_request() -> None:
+    calls = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(5)  # the first request stalls
+        return httpx.Response(200, json=SAMPLE_PAYLOAD)
+
+    hedger = Hedger(latency=_warm_tracker(), budget_fraction=1.0, min_delay=0.01)
+    limiter = RateLimiter(rate=100.0, burst=5)
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+        client = SonglinkClient(client=http, hedger=hedger, limiter=limiter)
+        song = await asyncio.wait_for(client.resolve("https://open.spotify.com/track/abc"), 1)
+
+    assert song is not None
+    assert calls == 2
+    assert limiter.stats()["acquired"] == 2  # the hedge took its own token
+    assert client.stats()["hedging"]["won"] == 1  # type: ignore[index]
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from banger_link.canonical import extract_platform_id
+from banger_link.db.repo import SongIdentity
+from banger_link.services.identity import cluster_songs, title_matches
+
+
+def _song(
+    song_id: int, title: str, artist: str, *, searched: tuple[str, ...] = (), **links: str
+) -> SongIdentity:
+    """A song whose links all came from Songlink, except the `searched` ones."""
+    songlink_ids = frozenset(
+        key
+        for platform, url in links.items()
+        if platform not in searched and (key := extract_platform_id(url)) is not None
+    )
+    return SongIdentity(
+        id=song_id,
+        title_key=title,
+        artist_key=artist,
+        platform_links=links,
+        songlink_ids=songlink_ids,
+    )
+
+
+def test_clusters_join_on_platform_ids_transitively() -> None:
+    songs = [
+        _song(1, "lust for life", "iggy pop", spotify="https://open.spotify.com/track/abc"),
+        _song(2, "other", "someone", spotify="https://open.spotify.com/track/zzz"),
+        _song(
+            3,
+            "lust for life",
+            "iggy pop",
+            spotify="https://open.spotify.com/track/abc",
+            deezer="https://www.deezer.com/track/1",
+        ),
+        _song(4, "lust for life remastered", "iggy pop", deezer="https://www.deezer.com/track/1"),
+        _song(5, "solo", "nobody", youtube="https://www.youtube.com/watch?v=yt2yt2yt2yt"),
+    ]
+    assert cluster_songs(songs) == [[1, 3, 4]]
+
+
+def test_live_and_studio_versions_stay_separate() -> None:
+    songs = [
+        _song(1, "lust for life", "iggy pop", spotify="https://open.spotify.com/track/studio"),
+        # Same normalized title once "(Live)" is stripped, but its own recording.
+        _song(2, "lust for life", "iggy pop", spotify="https://open.spotify.com/track/live"),
+    ]
+    assert cluster_songs(songs) == []
+    assert title_matches(songs) == [[1, 2]]
+
+
+def test_searched_links_never_join_songs() -> None:
+    songs = [
+        _song(1, "lust for life", "iggy pop", spotify="https://open.spotify.com/track/studio"),
+        # A fallback search for the live version came back with the studio track.
+        _song(
+            2,
+            "lust for life",
+            "iggy pop",
+            searched=("spotify",),
+            deezer="https://www.deezer.com/track/live",
+            spotify="https://open.spotify.com/track/studio",
+        ),
+    ]
+    assert cluster_songs(songs) == []
+
+
+def test_canonical_is_the_lowest_id_whatever_the_order() -> None:
+    link = {"deezer": "https://www.deezer.com/track/1"}
+    songs = [_song(9, "a", "b", **link), _song(4, "a", "b", **link), _song(7, "a", "b", **link)]
+    assert cluster_songs(songs) == [[4, 7, 9]]
+
+
+def test_songs_without_links_never_match() -> None:
+    songs = [_song(1, "a", "b"), _song(2, "a", "b")]
+    assert cluster_songs(songs) == []
+    assert title_matches(songs) == [[1, 2]]
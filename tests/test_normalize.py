@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import pytest
+
+from banger_link.normalize import normalize_artist, normalize_title
+
+
+@pytest.mark.parametrize(
+    "title",
+    [
+        "Lust for Life",
+        "Lust For Life",
+        "  lust   for life ",
+        "Lust for Life - Remastered 2020",
+        "Lust for Life (Remastered)",
+        "Lust for Life [2020 Remaster]",
+        "Lust for Life (feat. Someone Else)",
+        "Lust for Life!",
+    ],
+)
+def test_title_variants_share_a_key(title: str) -> None:
+    assert normalize_title(title) == "lust for life"
+
+
+def test_title_keeps_meaningful_parentheses_and_never_empties() -> None:
+    assert normalize_title("Song 2 (Live)") == "song 2 live"
+    assert normalize_title("(Untitled)") == "untitled"
+    assert normalize_title("Café del Mar") == "cafe del mar"
+
+
+def test_strict_title_keeps_edition_markers() -> None:
+    assert normalize_title("LUST FOR LIFE (feat. Someone)", strict=True) == "lust for life"
+    assert normalize_title("Lust for Life - Live at the Ritz") == "lust for life"
+    assert normalize_title("Lust for Life - Live at the Ritz", strict=True) == (
+        "lust for life live at the ritz"
+    )
+    assert normalize_title("Lust for Life (Remastered)", strict=True) == "lust for life remastered"
+
+
+@pytest.mark.parametrize(
+    "artist,expected",
+    [
+        ("Beyoncé", "beyonce"),
+        ("Iggy Pop feat. David Bowie", "iggy pop"),
+        ("Simon & Garfunkel", "simon and garfunkel"),
+        ("AC/DC", "ac dc"),
+        ("!!!", "!!!"),
+    ],
+)
+def test_normalize_artist(artist: str, expected: str) -> None:
+    assert normalize_artist(artist) == expected
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+import pytest
+
+from banger_link.db.connection import Database
+from banger_link.db.pool import ReadPool
+from banger_link.db.repo import Repo
+
+
+@pytest.fixture
+async def db(tmp_path: Path) -> AsyncIterator[Database]:
+    db = await Database(tmp_path / "test.db", read_pool_size=2).connect()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+async def _share(repo: Repo) -> int:
+    song_id = await repo.upsert_song(
+        entity_id="A", title="Song", artist="X", thumbnail_url=None, platform_links={}
+    )
+    mention = await repo.record_mention(chat_id=-1, song_id=song_id, user_id=1, user_name="A")
+    await repo.toggle_reaction(chat_song_id=mention.chat_song_id, user_id=1, kind="like")
+    return mention.chat_song_id
+
+
+async def test_readers_cannot_write(db: Database) -> None:
+    async with db.reader() as conn:
+        with pytest.raises(sqlite3.OperationalError, match="readonly"):
+            await conn.execute("DELETE FROM songs")
+
+
+async def test_reads_run_while_a_write_is_open(db: Database) -> None:
+    repo = Repo(db)
+    chat_song_id = await _share(repo)
+
+    async with repo.unit_of_work() as uow:
+        await repo.touch_chat(chat_id=-1, title="Renamed", uow=uow)
+        await db.conn.execute("UPDATE chat_songs SET mentions = 99 WHERE id = ?", (chat_song_id,))
+        # The writer is busy, but reads don't wait for it, and only see what's
+        # already committed.
+        top, view = await asyncio.wait_for(
+            asyncio.gather(repo.top_for_chat(chat_id=-1), repo.get_chat_song(chat_song_id)),
+            timeout=1,
+        )
+        assert [row.chat_song_id for row in top] == [chat_song_id]
+        assert view is not None and view.mentions == 1
+
+    view = await repo.get_chat_song(chat_song_id)
+    assert view is not None and view.mentions == 99
+
+
+async def test_pool_counts_waits_when_exhausted(tmp_path: Path) -> None:
+    await (await Database(tmp_path / "test.db").connect()).close()
+    pool = ReadPool(tmp_path / "test.db", size=1)
+    await pool.open()
+    try:
+        release = asyncio.Event()
+
+        async def hold() -> None:
+            async with pool.acquire():
+                await release.wait()
+
+        async def borrow() -> None:
+            async with pool.acquire():
+                pass
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(borrow())
+        await asyncio.sleep(0.01)
+        assert pool.stats()["in_use"] == 1 and not waiter.done()
+        release.set()
+        await holder
+        await waiter
+        stats = pool.stats()
+        assert stats["acquired"] == 2 and stats["waited"] == 1
+        assert float(stats["max_wait_ms"]) > 0  # type: ignore[arg-type]
+    finally:
+        await pool.close()
+
+
+async def test_stats_report_writer_and_pool(db: Database) -> None:
+    await _share(Repo(db))
+    stats = db.stats()
+    assert stats["writer"]["ops"] == 3  # type: ignore[index]
+    assert stats["read_pool"]["size"] == 2  # type: ignore[index]
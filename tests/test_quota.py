@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+from datetime import UTC, datetime
+from pathlib import Path
+
+import pytest
+import respx
+
+from banger_link.db.connection import Database
+from banger_link.db.repo import Repo
+from banger_link.services.fallback_resolver import YouTubeSearchClient
+from banger_link.services.quota import QuotaLedger
+from banger_link.services.scheduler import Priority
+
+YOUTUBE = "https://www.googleapis.com/youtube/v3/search"
+
+
+class _Clock:
+    def __init__(self) -> None:
+        # 23:30 Pacific (PST, UTC-8) on 14 January.
+        self.now = datetime(2026, 1, 15, 7, 30, tzinfo=UTC).timestamp()
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+async def repo(tmp_path: Path):
+    db = await Database(tmp_path / "test.db").connect()
+    try:
+        yield Repo(db)
+    finally:
+        await db.close()
+
+
+@pytest.fixture
+def clock() -> _Clock:
+    return _Clock()
+
+
+async def _ledger(repo: Repo, clock: _Clock) -> QuotaLedger:
+    ledger = QuotaLedger(repo, provider="youtube", daily_budget=500, live_reserve=200, clock=clock)
+    await ledger.load()
+    return ledger
+
+
+async def test_background_work_stops_at_the_live_reserve(repo: Repo, clock: _Clock) -> None:
+    ledger = await _ledger(repo, clock)
+    assert await ledger.try_spend(100, priority=Priority.REFRESH)
+    assert await ledger.try_spend(200, priority=Priority.IMPORT)
+    assert not await ledger.try_spend(100, priority=Priority.REFRESH)
+    assert await ledger.try_spend(100, priority=Priority.LIVE)
+    assert await ledger.try_spend(100, priority=Priority.LIVE)
+    assert not await ledger.try_spend(100, priority=Priority.LIVE)
+
+    stats = ledger.stats()
+    assert stats["day"] == "2026-01-14"
+    assert stats["used"] == 500 and stats["remaining"] == 0
+    assert stats["refused"] == 2
+
+
+async def test_spend_survives_a_restart_and_resets_at_pacific_midnight(
+    repo: Repo, clock: _Clock
+) -> None:
+    first = await _ledger(repo, clock)
+    assert await first.try_spend(300)
+
+    second = await _ledger(repo, clock)
+    assert second.stats()["used"] == 300
+    assert not await second.try_spend(100, priority=Priority.REFRESH)
+
+    clock.now += 31 * 60  # 00:01 Pacific, 15 January
+    assert second.stats()["used"] == 0
+    assert await second.try_spend(100, priority=Priority.REFRESH)
+    assert second.stats()["day"] == "2026-01-15"
+
+
+@respx.mock
+async def test_youtube_skips_the_request_once_its_share_is_spent(repo: Repo, clock: _Clock) -> None:
+    route = respx.get(YOUTUBE).respond(json={"items": [{"id": {"videoId": "abc"}}]})
+    ledger = QuotaLedger(repo, provider="youtube", daily_budget=200, live_reserve=100, clock=clock)
+    client = YouTubeSearchClient(api_key="dummy", quota=ledger)
+    try:
+        assert await client.search(title="T", artist="A", priority=Priority.REFRESH)
+        assert await client.search(title="T", artist="A", priority=Priority.REFRESH) is None
+        assert await client.search(title="T", artist="A", priority=Priority.LIVE)
+        assert await client.search(title="T", artist="A", priority=Priority.LIVE) is None
+    finally:
+        await client.aclose()
+    assert route.call_count == 2
+    assert client.stats()["quota"]["remaining"] == 0  # type: ignore[index]
+
+
+@respx.mock
+async def test_youtube_quota_error_exhausts_the_day(repo: Repo, clock: _Clock) -> None:
+    respx.get(YOUTUBE).respond(
+        status_code=403,
+        json={"error": {"code": 403, "errors": [{"reason": "quotaExceeded"}]}},
+    )
+    ledger = await _ledger(repo, clock)
+    client = YouTubeSearchClient(api_key="dummy", quota=ledger)
+    try:
+        assert await client.search(title="T", artist="A") is None
+    finally:
+        await client.aclose()
+    assert ledger.stats()["remaining"] == 0
+    assert await repo.get_quota_used(provider="youtube", day="2026-01-14") == 500
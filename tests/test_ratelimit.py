@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import httpx
+import respx
+
+from banger_link.services.ratelimit import RateLimiter, parse_retry_after
+from banger_link.services.songlink import SonglinkClient
+from tests.test_songlink import API, SAMPLE_PAYLOAD
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_burst_then_refill() -> None:
+    clock = _Clock()
+    limiter = RateLimiter(rate=1.0, burst=3, clock=clock)
+    assert [limiter.try_acquire() for _ in range(4)] == [True, True, True, False]
+    clock.now += 1.0
+    assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+
+
+def test_retry_after_blocks_everyone_until_it_elapses() -> None:
+    clock = _Clock()
+    limiter = RateLimiter(rate=10.0, burst=5, clock=clock)
+    limiter.on_rate_limited(retry_after=30)
+    clock.now += 29
+    assert not limiter.try_acquire()
+    clock.now += 1.5
+    assert limiter.try_acquire()
+
+
+def test_rate_backs_off_and_recovers() -> None:
+    limiter = RateLimiter(rate=1.0, burst=1, min_rate=0.2, recovery_step=0.25, clock=_Clock())
+    limiter.on_rate_limited()
+    limiter.on_rate_limited()
+    assert limiter.rate == 0.25
+    limiter.on_rate_limited()
+    assert limiter.rate == 0.2  # floored at min_rate
+    for _ in range(10):
+        limiter.on_success()
+    assert limiter.rate == 1.0  # capped at the configured ceiling
+
+
+async def test_acquire_paces_sustained_load() -> None:
+    limiter = RateLimiter(rate=50.0, burst=1)
+    started = time.monotonic()
+    await asyncio.gather(*(limiter.acquire() for _ in range(6)))
+    # One token up front, five more at 20ms each.
+    assert time.monotonic() - started >= 0.09
+    assert limiter.stats()["throttled"] == 5
+
+
+def test_parse_retry_after() -> None:
+    assert parse_retry_after("12") == 12.0
+    assert parse_retry_after(" 1.5 ") == 1.5
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") is None
+    assert parse_retry_after("-3") is None
+
+
+@respx.mock
+async def test_songlink_429_feeds_the_limiter() -> None:
+    respx.get(API).mock(
+        side_effect=[
+            httpx.Response(429, headers={"Retry-After": "0"}),
+            httpx.Response(200, json=SAMPLE_PAYLOAD),
+        ]
+    )
+    limiter = RateLimiter(rate=1000.0, burst=2)
+    async with httpx.AsyncClient() as http:
+        client = SonglinkClient(client=http, max_retries=1, limiter=limiter)
+        assert await client.resolve("https://open.spotify.com/track/abc") is not None
+    stats = limiter.stats()
+    assert stats["acquired"] == 2
+    assert stats["rate_limited"] == 1
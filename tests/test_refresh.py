@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+from collections.abc import AsyncIterator, Iterable
+from dataclasses import replace
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from banger_link.db.connection import Database
+from banger_link.db.repo import Repo
+from banger_link.handlers import _state
+from banger_link.jobs.refresh import refresh_stale_songs
+from banger_link.services.songlink import ResolvedSong
+
+
+class _StubSonglink:
+    def __init__(self, *, available: bool = True) -> None:
+        self.available = available
+        self.urls: list[str] = []
+        self.used_cache: bool | None = None
+
+    async def resolve_many(
+        self, urls: Iterable[str], *, use_cache: bool = True, **_: object
+    ) -> AsyncIterator[tuple[str, ResolvedSong | None]]:
+        self.used_cache = use_cache
+        for url in urls:
+            self.urls.append(url)
+            yield url, None  # Songlink has nothing new
+
+
+class _StubFallback:
+    async def fill_many(
+        self, songs: Iterable[ResolvedSong], **_: object
+    ) -> AsyncIterator[tuple[ResolvedSong, ResolvedSong]]:
+        for song in songs:
+            links = {
+                **song.platform_links,
+                "youtube": "https://www.youtube.com/watch?v=abcdefghijk",
+            }
+            yield song, replace(song, platform_links=links)
+
+
+@pytest.fixture
+async def repo(tmp_path: Path):
+    db = await Database(tmp_path / "test.db").connect()
+    try:
+        yield Repo(db)
+    finally:
+        await db.close()
+
+
+def _context(repo: Repo, songlink: _StubSonglink) -> SimpleNamespace:
+    return SimpleNamespace(
+        bot_data={
+            _state.REPO_KEY: repo,
+            _state.SONGLINK_KEY: songlink,
+            _state.FALLBACK_KEY: _StubFallback(),
+        }
+    )
+
+
+async def _seed_incomplete_song(repo: Repo) -> int:
+    song_id = await repo.upsert_song(
+        entity_id="E",
+        title="Lust for Life",
+        artist="Iggy Pop",
+        thumbnail_url=None,
+        platform_links={"spotify": "https://open.spotify.com/track/abc"},
+    )
+    await repo._conn.execute(
+        "UPDATE songs SET created_at = datetime('now', '-3 days'), refreshed_at = NULL"
+    )
+    await repo._conn.commit()
+    return song_id
+
+
+async def test_refresh_fills_missing_platforms(repo: Repo) -> None:
+    song_id = await _seed_incomplete_song(repo)
+    songlink = _StubSonglink()
+
+    await refresh_stale_songs(_context(repo, songlink))  # type: ignore[arg-type]
+
+    assert songlink.urls == ["https://open.spotify.com/track/abc"]
+    assert songlink.used_cache is False  # a refresh asks Songlink again
+    stored = await repo.find_song_by_platform_id(platform="spotify", native_id="abc")
+    assert stored is not None and stored.id == song_id
+    assert "youtube" in stored.platform_links
+    # A searched link is stored, but doesn't identify the song.
+    assert await repo.find_song_by_platform_id(platform="youtube", native_id="abcdefghijk") is None
+
+
+async def test_refresh_waits_out_an_open_circuit(repo: Repo) -> None:
+    await _seed_incomplete_song(repo)
+    songlink = _StubSonglink(available=False)
+    await refresh_stale_songs(_context(repo, songlink))  # type: ignore[arg-type]
+    assert songlink.urls == []
+
+
+async def test_refresh_stamps_every_song_in_the_batch(repo: Repo) -> None:
+    # A link with no platform ID to index, so both rows keep it.
+    shared = {"pandora": "https://www.pandora.com/artist/x/y/z/TRz"}
+    for entity_id, links in (("A", shared), ("B", shared), ("C", {})):
+        await repo.upsert_song(
+            entity_id=entity_id,
+            title=entity_id,
+            artist="X",
+            thumbnail_url=None,
+            platform_links=links,
+        )
+    # A link only a fallback search found is never what Songlink gets asked about.
+    await repo.upsert_song(
+        entity_id="D",
+        title="D",
+        artist="X",
+        thumbnail_url=None,
+        platform_links={"spotify": "https://open.spotify.com/track/guess"},
+        fallback_platforms={"spotify"},
+    )
+    await repo._conn.execute(
+        "UPDATE songs SET created_at = datetime('now', '-60 days'), refreshed_at = NULL"
+    )
+    await repo._conn.commit()
+    songlink = _StubSonglink()
+
+    await refresh_stale_songs(_context(repo, songlink))  # type: ignore[arg-type]
+
+    # Songs sharing a link are asked about once; songs without one not at all.
+    assert songlink.urls == ["https://www.pandora.com/artist/x/y/z/TRz"]
+    now = datetime.now(tz=UTC)
+    due = await repo.songs_needing_refresh(
+        stale_before=now - timedelta(days=1),
+        incomplete_before=now - timedelta(days=1),
+        expected_platforms=(),
+        limit=10,
+    )
+    assert due == []
+    assert len(await repo.song_identities()) == 4
@@ -1,12 +1,14 @@
 from __future__ import annotations
 
+import asyncio
+import sqlite3
 from datetime import UTC, datetime, timedelta
 from pathlib import Path
 
 import pytest
 
 from banger_link.db.connection import Database
-from banger_link.db.repo import Repo
+from banger_link.db.repo import Repo, UnitOfWork
 
 
 @pytest.fixture
@@ -18,7 +20,9 @@ async def repo(tmp_path: Path):
         await db.close()
 
 
-async def _seed_song(repo: Repo, *, entity_id: str = "SPOTIFY_SONG::abc") -> int:
+async def _seed_song(
+    repo: Repo, *, entity_id: str = "SPOTIFY_SONG::abc", uow: UnitOfWork | None = None
+) -> int:
     return await repo.upsert_song(
         entity_id=entity_id,
         title="Lust for Life",
@@ -28,6 +32,7 @@ async def _seed_song(repo: Repo, *, entity_id: str = "SPOTIFY_SONG::abc") -> int
             "spotify": "https://open.spotify.com/track/abc",
             "youtube": "https://youtu.be/abc",
         },
+        uow=uow,
     )
 
 
@@ -59,6 +64,125 @@ async def test_toggle_reaction_full_cycle(repo: Repo) -> None:
     assert s3.likes == 0 and s3.dislikes == 1 and s3.user_reaction == "dislike"
 
 
+async def _counted(repo: Repo) -> list[tuple[int, int, int]]:
+    async with repo._conn.execute(
+        """
+        SELECT cs.id,
+               cs.likes    - COUNT(CASE WHEN r.kind = 'like' THEN 1 END),
+               cs.dislikes - COUNT(CASE WHEN r.kind = 'dislike' THEN 1 END)
+        FROM chat_songs cs LEFT JOIN reactions r ON r.chat_song_id = cs.id
+        GROUP BY cs.id
+        """
+    ) as cur:
+        return [tuple(row) for row in await cur.fetchall()]
+
+
+async def test_reaction_counters_match_the_reactions_table(repo: Repo) -> None:
+    song_a = await repo.upsert_song(
+        entity_id="A", title="A", artist="X", thumbnail_url=None, platform_links={"spotify": "a"}
+    )
+    song_b = await repo.upsert_song(
+        entity_id="B", title="A", artist="X", thumbnail_url=None, platform_links={"deezer": "b"}
+    )
+    cs_a = await repo.record_mention(chat_id=-1, song_id=song_a, user_id=1, user_name="Alice")
+    cs_b = await repo.record_mention(chat_id=-1, song_id=song_b, user_id=1, user_name="Alice")
+    for user_id, kind in [(10, "like"), (11, "dislike"), (10, "dislike"), (12, "like")]:
+        await repo.toggle_reaction(chat_song_id=cs_a.chat_song_id, user_id=user_id, kind=kind)
+        await repo.toggle_reaction(chat_song_id=cs_b.chat_song_id, user_id=user_id + 5, kind=kind)
+    await repo.toggle_reaction(chat_song_id=cs_a.chat_song_id, user_id=12, kind="like")
+    assert {(likes, dislikes) for _, likes, dislikes in await _counted(repo)} == {(0, 0)}
+
+    await repo.merge_songs(canonical_id=song_a, duplicate_ids=[song_b])
+    counted = await _counted(repo)
+    assert [(cs_id, likes, dislikes) for cs_id, likes, dislikes in counted] == [
+        (cs_a.chat_song_id, 0, 0)
+    ]
+    view = await repo.get_chat_song(cs_a.chat_song_id)
+    assert view is not None and (view.likes, view.dislikes) == (1, 4)
+
+
+async def test_top_for_chat_reads_the_score_index(repo: Repo) -> None:
+    async with repo._conn.execute(
+        """
+        EXPLAIN QUERY PLAN
+        SELECT cs.id FROM chat_songs cs
+        WHERE cs.chat_id = ? AND cs.likes + cs.dislikes > 0
+        ORDER BY cs.likes - cs.dislikes DESC, cs.mentions DESC, cs.last_seen_at DESC
+        LIMIT 10
+        """,
+        (-1,),
+    ) as cur:
+        plan = " ".join(str(row["detail"]) for row in await cur.fetchall())
+    assert "chat_songs_by_score" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+async def test_concurrent_taps_apply_one_after_another(repo: Repo) -> None:
+    song_id = await _seed_song(repo)
+    mention = await repo.record_mention(chat_id=-100, song_id=song_id, user_id=1, user_name="Alice")
+
+    # Five users double-tap like while five others tap dislike once, all at once.
+    taps = [
+        repo.toggle_reaction(chat_song_id=mention.chat_song_id, user_id=user_id, kind=kind)
+        for user_id, kind in [(u, "like") for u in range(10, 15)] * 2
+        + [(u, "dislike") for u in range(20, 25)]
+    ]
+    states = await asyncio.gather(*taps)
+
+    # Taps are applied in arrival order, each seeing exactly the ones before it.
+    assert [(s.likes, s.dislikes) for s in states] == [
+        *((n, 0) for n in range(1, 6)),
+        *((n, 0) for n in range(4, -1, -1)),
+        *((0, n) for n in range(1, 6)),
+    ]
+    final = await repo.get_chat_song(mention.chat_song_id)
+    assert final is not None and (final.likes, final.dislikes) == (0, 5)
+    assert {(likes, dislikes) for _, likes, dislikes in await _counted(repo)} == {(0, 0)}
+
+
+async def test_failed_write_rolls_back_and_releases_the_lock(repo: Repo) -> None:
+    with pytest.raises(sqlite3.IntegrityError):
+        await repo.toggle_reaction(chat_song_id=12345, user_id=1, kind="like")
+    song_id = await _seed_song(repo)
+    mention = await repo.record_mention(chat_id=-100, song_id=song_id, user_id=1, user_name="Alice")
+    state = await repo.toggle_reaction(chat_song_id=mention.chat_song_id, user_id=1, kind="like")
+    assert state.likes == 1
+
+
+async def test_unit_of_work_commits_a_share_once(
+    repo: Repo, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    commits = 0
+    commit = repo._conn.commit
+
+    async def counting_commit() -> None:
+        nonlocal commits
+        commits += 1
+        await commit()
+
+    monkeypatch.setattr(repo._conn, "commit", counting_commit)
+    async with repo.unit_of_work() as uow:
+        song_id = await _seed_song(repo, uow=uow)
+        mention = await repo.record_mention(
+            chat_id=-100, song_id=song_id, user_id=1, user_name="Alice", uow=uow
+        )
+        await repo.touch_chat(chat_id=-100, title="Chat", uow=uow)
+    assert commits == 1
+    assert await repo.get_chat_song(mention.chat_song_id) is not None
+
+    with pytest.raises(RuntimeError, match="closed"):
+        await repo.touch_chat(chat_id=-100, title="Chat", uow=uow)
+
+
+async def test_unit_of_work_rolls_back_everything_on_error(repo: Repo) -> None:
+    with pytest.raises(sqlite3.IntegrityError):
+        async with repo.unit_of_work() as uow:
+            await _seed_song(repo, uow=uow)
+            await repo.record_mention(chat_id=-100, song_id=999, user_id=1, user_name="A", uow=uow)
+    assert await repo.find_song_by_platform_id(platform="spotify", native_id="abc") is None
+    assert await repo.song_identities() == []
+
+
 async def test_top_for_chat_orders_by_score(repo: Repo) -> None:
     song_a = await repo.upsert_song(
         entity_id="A", title="A", artist="X", thumbnail_url=None, platform_links={"spotify": "a"}
@@ -129,3 +253,242 @@ async def test_chats_with_digest_returns_active_chats(repo: Repo) -> None:
 
     weekly = await repo.chats_with_digest(kind="weekly")
     assert set(weekly) == {-1, -2}
+
+
+async def test_upsert_song_indexes_platform_ids(repo: Repo) -> None:
+    song_id = await _seed_song(repo)
+    found = await repo.find_song_by_platform_id(platform="spotify", native_id="abc")
+    assert found is not None
+    assert found.id == song_id
+    assert found.title == "Lust for Life"
+    assert found.platform_links["youtube"] == "https://youtu.be/abc"
+    assert await repo.find_song_by_platform_id(platform="spotify", native_id="nope") is None
+
+
+async def test_platform_id_stays_with_first_song(repo: Repo) -> None:
+    first = await _seed_song(repo, entity_id="SPOTIFY_SONG::abc")
+    await _seed_song(repo, entity_id="ITUNES_SONG::123")  # same Spotify link
+    found = await repo.find_song_by_platform_id(platform="spotify", native_id="abc")
+    assert found is not None and found.id == first
+
+
+async def test_fallback_ids_are_indexed_but_never_matched(repo: Repo) -> None:
+    guessed = await repo.upsert_song(
+        entity_id="DEEZER_SONG::1",
+        title="Lust for Life (Live)",
+        artist="Iggy Pop",
+        thumbnail_url=None,
+        platform_links={
+            "deezer": "https://www.deezer.com/track/1",
+            "spotify": "https://open.spotify.com/track/abc",
+        },
+        fallback_platforms={"spotify"},
+    )
+    assert await repo.find_song_by_platform_id(platform="spotify", native_id="abc") is None
+    found = await repo.find_song_by_platform_id(platform="deezer", native_id="1")
+    assert found is not None and found.id == guessed
+
+    # Songlink saying the ID belongs to another song takes it over.
+    studio = await _seed_song(repo)
+    assert studio != guessed
+    found = await repo.find_song_by_platform_id(platform="spotify", native_id="abc")
+    assert found is not None and found.id == studio
+
+
+async def test_upsert_folds_a_new_entity_into_the_song_sharing_its_ids(repo: Repo) -> None:
+    first = await _seed_song(repo, entity_id="SPOTIFY_SONG::abc")
+    again = await repo.upsert_song(
+        entity_id="ITUNES_SONG::123",
+        title="Lust For Life (Remastered)",
+        artist="Iggy Pop",
+        thumbnail_url=None,
+        platform_links={
+            "spotify": "https://open.spotify.com/track/abc",
+            "appleMusic": "https://music.apple.com/us/song/123",
+        },
+    )
+    assert again == first
+    # The alias sticks even once the shared link is gone from the payload.
+    assert (
+        await repo.upsert_song(
+            entity_id="ITUNES_SONG::123",
+            title="Lust for Life",
+            artist="Iggy Pop",
+            thumbnail_url=None,
+            platform_links={},
+        )
+        == first
+    )
+    found = await repo.find_song_by_platform_id(platform="appleMusic", native_id="123")
+    assert found is not None and found.id == first
+    assert found.title == "Lust for Life"
+    assert set(found.platform_links) == {"spotify", "youtube", "appleMusic"}
+
+
+async def test_upsert_never_folds_on_a_searched_link(repo: Repo) -> None:
+    studio = await _seed_song(repo)
+    # The fill for the live version found the studio track by title.
+    live = await repo.upsert_song(
+        entity_id="DEEZER_SONG::live",
+        title="Lust for Life (Live)",
+        artist="Iggy Pop",
+        thumbnail_url=None,
+        platform_links={
+            "deezer": "https://www.deezer.com/track/9",
+            "spotify": "https://open.spotify.com/track/abc",
+        },
+        fallback_platforms={"spotify"},
+    )
+    assert live != studio
+    found = await repo.find_song_by_platform_id(platform="spotify", native_id="abc")
+    assert found is not None and found.id == studio
+
+
+async def test_merge_songs_combines_mentions_and_reactions(repo: Repo) -> None:
+    keep = await repo.upsert_song(
+        entity_id="A", title="Song", artist="X", thumbnail_url=None, platform_links={"spotify": "a"}
+    )
+    dupe = await repo.upsert_song(
+        entity_id="B", title="Song", artist="X", thumbnail_url=None, platform_links={"deezer": "b"}
+    )
+    other_chat = await repo.record_mention(chat_id=-2, song_id=dupe, user_id=3, user_name="Cat")
+    kept = await repo.record_mention(chat_id=-1, song_id=keep, user_id=1, user_name="Alice")
+    await repo._conn.execute(
+        "UPDATE chat_songs SET first_seen_at = datetime('now', '-1 day') WHERE id = ?",
+        (kept.chat_song_id,),
+    )
+    await repo._conn.commit()
+    merged = await repo.record_mention(chat_id=-1, song_id=dupe, user_id=2, user_name="Bob")
+    await repo.toggle_reaction(chat_song_id=kept.chat_song_id, user_id=10, kind="like")
+    await repo.toggle_reaction(chat_song_id=merged.chat_song_id, user_id=11, kind="like")
+    await repo.toggle_reaction(chat_song_id=merged.chat_song_id, user_id=10, kind="dislike")
+    await repo._conn.execute(
+        "UPDATE reactions SET reacted_at = datetime('now', '-1 hour') WHERE chat_song_id = ?",
+        (kept.chat_song_id,),
+    )
+    await repo._conn.commit()
+
+    await repo.merge_songs(canonical_id=keep, duplicate_ids=[dupe])
+
+    top = await repo.top_for_chat(chat_id=-1, limit=10)
+    assert len(top) == 1
+    assert top[0].mentions == 2 and top[0].first_user_name == "Alice"
+    # User 10's later dislike wins over their like on the canonical row.
+    assert (top[0].likes, top[0].dislikes) == (1, 1)
+    # Reply keyboards posted for the merged row still work.
+    state = await repo.toggle_reaction(chat_song_id=merged.chat_song_id, user_id=12, kind="like")
+    assert (state.likes, state.dislikes) == (2, 1)
+    view = await repo.get_chat_song(merged.chat_song_id)
+    assert view is not None and view.chat_song_id == kept.chat_song_id
+    # Chats that only had the duplicate are simply repointed.
+    moved = await repo.get_chat_song(other_chat.chat_song_id)
+    assert moved is not None and moved.platform_links == {"spotify": "a", "deezer": "b"}
+    # Shares of the duplicate entity land on the canonical song from now on.
+    assert (
+        await repo.upsert_song(
+            entity_id="B", title="Song", artist="X", thumbnail_url=None, platform_links={}
+        )
+        == keep
+    )
+    assert [s.id for s in await repo.song_identities()] == [keep]
+
+
+async def _age_songs(repo: Repo, *, days: float) -> None:
+    await repo._conn.execute(
+        "UPDATE songs SET created_at = datetime('now', ?), refreshed_at = NULL",
+        (f"-{days} days",),
+    )
+    await repo._conn.commit()
+
+
+async def test_songs_needing_refresh_picks_stale_and_incomplete(repo: Repo) -> None:
+    complete = await repo.upsert_song(
+        entity_id="C",
+        title="C",
+        artist="X",
+        thumbnail_url=None,
+        platform_links={"spotify": "s", "appleMusic": "a", "youtube": "y"},
+    )
+    incomplete = await repo.upsert_song(
+        entity_id="I", title="I", artist="X", thumbnail_url=None, platform_links={"spotify": "s"}
+    )
+    await _age_songs(repo, days=2)
+    now = datetime.now(tz=UTC)
+    expected = ("spotify", "appleMusic", "youtube")
+
+    due = await repo.songs_needing_refresh(
+        stale_before=now - timedelta(days=30),
+        incomplete_before=now - timedelta(days=1),
+        expected_platforms=expected,
+        limit=10,
+    )
+    assert [s.id for s in due] == [incomplete]
+
+    due = await repo.songs_needing_refresh(
+        stale_before=now - timedelta(days=1),
+        incomplete_before=now - timedelta(days=1),
+        expected_platforms=expected,
+        limit=10,
+    )
+    assert {s.id for s in due} == {complete, incomplete}
+
+
+async def test_record_song_refresh_merges_links_and_requeues(repo: Repo) -> None:
+    song_id = await _seed_song(repo)
+    await _age_songs(repo, days=2)
+    await repo.record_song_refresh(
+        song_id=song_id,
+        thumbnail_url=None,
+        platform_links={"appleMusic": "https://music.apple.com/us/song/42"},
+    )
+
+    stored = await repo.find_song_by_platform_id(platform="appleMusic", native_id="42")
+    assert stored is not None and stored.id == song_id
+    assert set(stored.platform_links) == {"spotify", "youtube", "appleMusic"}
+    assert stored.thumbnail_url == "https://thumb"  # kept when the refresh had none
+    due = await repo.songs_needing_refresh(
+        stale_before=datetime.now(tz=UTC) - timedelta(days=1),
+        incomplete_before=datetime.now(tz=UTC) - timedelta(days=1),
+        expected_platforms=("spotify", "appleMusic", "youtube"),
+        limit=10,
+    )
+    assert due == []
+
+
+async def test_catalog_links_pool_songlink_links_of_one_recording(repo: Repo) -> None:
+    await _seed_song(repo)
+    await repo.upsert_song(
+        entity_id="ITUNES_SONG::1",
+        title="LUST FOR LIFE (feat. Nobody)",
+        artist="IGGY POP",
+        thumbnail_url=None,
+        platform_links={
+            "spotify": "https://open.spotify.com/track/newer",
+            "appleMusic": "https://music.apple.com/us/song/1",
+            "youtube": "https://www.youtube.com/watch?v=searchedxyz",
+        },
+        fallback_platforms={"youtube"},
+    )
+    await repo.upsert_song(
+        entity_id="DEEZER_SONG::live",
+        title="Lust for Life - Live at the Ritz",
+        artist="Iggy Pop",
+        thumbnail_url=None,
+        platform_links={"youtube": "https://www.youtube.com/watch?v=liveliveliv"},
+    )
+    await repo._conn.execute(
+        "UPDATE songs SET refreshed_at = datetime('now', '-1 day') WHERE entity_id = ?",
+        ("SPOTIFY_SONG::abc",),
+    )
+    await repo._conn.commit()
+
+    links = await repo.catalog_links(title="Lust for Life", artist="Iggy Pop")
+
+    # No searched link, and nothing from the live recording.
+    assert links == {
+        "spotify": "https://open.spotify.com/track/newer",  # most recently refreshed wins
+        "appleMusic": "https://music.apple.com/us/song/1",
+    }
+    live = await repo.catalog_links(title="Lust for Life - Live at the Ritz", artist="Iggy Pop")
+    assert live == {"youtube": "https://www.youtube.com/watch?v=liveliveliv"}
+    assert await repo.catalog_links(title="Unknown", artist="Nobody") == {}
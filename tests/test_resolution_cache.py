@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import httpx
+import pytest
+import respx
+
+from banger_link.db.connection import Database
+from banger_link.db.repo import Repo
+from banger_link.services.resolution_cache import MemoryResolutionCache, ResolutionCache
+from banger_link.services.songlink import ResolvedSong, SonglinkClient
+from tests.test_songlink import API, SAMPLE_PAYLOAD
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1_700_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+async def repo(tmp_path: Path):
+    db = await Database(tmp_path / "test.db").connect()
+    try:
+        yield Repo(db)
+    finally:
+        await db.close()
+
+
+@pytest.fixture
+def clock() -> _Clock:
+    return _Clock()
+
+
+@pytest.fixture
+def cache(repo: Repo, clock: _Clock) -> ResolutionCache:
+    return ResolutionCache(repo, ttl_seconds=3600, negative_ttl_seconds=60, clock=clock)
+
+
+@pytest.fixture
+async def client(cache: ResolutionCache):
+    async_client = httpx.AsyncClient(timeout=httpx.Timeout(2.0))
+    yield SonglinkClient(client=async_client, max_retries=0, cache=cache)
+    await async_client.aclose()
+
+
+@respx.mock
+async def test_second_resolve_is_served_from_cache(
+    client: SonglinkClient, cache: ResolutionCache
+) -> None:
+    route = respx.get(API).respond(json=SAMPLE_PAYLOAD)
+    first = await client.resolve("https://open.spotify.com/track/abc")
+    second = await client.resolve("https://open.spotify.com/track/abc")
+    assert route.call_count == 1
+    assert first == second
+    assert cache.stats() == {"hits": 1, "negative_hits": 0, "stale_hits": 0, "misses": 1}
+
+
+@respx.mock
+async def test_404_is_negatively_cached_until_expiry(
+    client: SonglinkClient, cache: ResolutionCache, clock: _Clock
+) -> None:
+    route = respx.get(API).respond(status_code=404)
+    assert await client.resolve("https://open.spotify.com/track/missing") is None
+    assert await client.resolve("https://open.spotify.com/track/missing") is None
+    assert route.call_count == 1
+    assert cache.negative_hits == 1
+
+    clock.now += 61
+    assert await client.resolve("https://open.spotify.com/track/missing") is None
+    assert route.call_count == 2
+
+
+@respx.mock
+async def test_transient_failures_are_not_cached(client: SonglinkClient) -> None:
+    route = respx.get(API).mock(
+        side_effect=[httpx.Response(503), httpx.Response(200, json=SAMPLE_PAYLOAD)]
+    )
+    assert await client.resolve("https://open.spotify.com/track/abc") is None
+    assert await client.resolve("https://open.spotify.com/track/abc") is not None
+    assert route.call_count == 2
+
+
+async def test_prune_drops_only_expired_rows(
+    repo: Repo, cache: ResolutionCache, clock: _Clock
+) -> None:
+    await cache.put("https://a", None)  # 60s TTL
+    await cache.put("https://b", None)
+    clock.now += 30
+    await cache.put("https://c", None)
+    clock.now += 45
+    assert await cache.prune() == 2
+    assert await repo.get_cached_resolution("https://c") is not None
+
+
+def _song(entity_id: str = "x") -> ResolvedSong:
+    return ResolvedSong(
+        entity_id=entity_id,
+        title="Lust for Life",
+        artist="Iggy Pop",
+        thumbnail_url=None,
+        page_url="https://song.link/s/x",
+        platform_links={"spotify": "https://open.spotify.com/track/x"},
+    )
+
+
+def test_memory_cache_evicts_least_recently_used(clock: _Clock) -> None:
+    memory = MemoryResolutionCache(
+        max_entries=2, max_bytes=1 << 20, ttl_seconds=60, negative_ttl_seconds=10, clock=clock
+    )
+    memory.put("https://a", _song("a"))
+    memory.put("https://b", _song("b"))
+    assert memory.get("https://a") is not None  # a is now most recent
+    memory.put("https://c", _song("c"))
+
+    assert memory.get("https://b") is None
+    assert memory.get("https://a") is not None
+    assert memory.stats()["evictions"] == 1
+
+
+def test_memory_cache_respects_byte_budget(clock: _Clock) -> None:
+    memory = MemoryResolutionCache(
+        max_entries=100, max_bytes=1500, ttl_seconds=60, negative_ttl_seconds=10, clock=clock
+    )
+    for i in range(10):
+        memory.put(f"https://{i}", _song(str(i)))
+    stats = memory.stats()
+    assert 0 < stats["entries"] < 10
+    assert stats["bytes"] <= 1500
+
+
+def test_memory_cache_uses_separate_negative_ttl(clock: _Clock) -> None:
+    memory = MemoryResolutionCache(
+        max_entries=10, max_bytes=1 << 20, ttl_seconds=60, negative_ttl_seconds=10, clock=clock
+    )
+    memory.put("https://pos", _song())
+    memory.put("https://neg", None)
+    clock.now += 11
+    assert memory.get("https://neg") is None
+    entry = memory.get("https://pos")
+    assert entry is not None and entry.song is not None
+    assert memory.stats()["expirations"] == 1
+
+
+@respx.mock
+async def test_memory_tier_answers_without_touching_sqlite(repo: Repo, clock: _Clock) -> None:
+    memory = MemoryResolutionCache(
+        max_entries=10, max_bytes=1 << 20, ttl_seconds=60, negative_ttl_seconds=10, clock=clock
+    )
+    cache = ResolutionCache(
+        repo, ttl_seconds=3600, negative_ttl_seconds=60, memory=memory, clock=clock
+    )
+    respx.get(API).respond(json=SAMPLE_PAYLOAD)
+    async with httpx.AsyncClient() as http:
+        client = SonglinkClient(client=http, max_retries=0, cache=cache)
+        await client.resolve("https://open.spotify.com/track/abc")
+        await client.resolve("https://open.spotify.com/track/abc")
+
+    stats = cache.stats()
+    assert stats["memory_hits"] == 1
+    assert stats["hits"] == 0  # SQLite tier never consulted for the repeat
+
+
+async def test_sqlite_hits_are_promoted_into_memory(repo: Repo, clock: _Clock) -> None:
+    await ResolutionCache(repo, ttl_seconds=3600, negative_ttl_seconds=60, clock=clock).put(
+        "https://a", _song()
+    )
+    memory = MemoryResolutionCache(
+        max_entries=10, max_bytes=1 << 20, ttl_seconds=60, negative_ttl_seconds=10, clock=clock
+    )
+    cache = ResolutionCache(
+        repo, ttl_seconds=3600, negative_ttl_seconds=60, memory=memory, clock=clock
+    )
+    assert await cache.get("https://a") is not None
+    assert len(memory) == 1
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Hashable
+
+import pytest
+
+from banger_link.services.scheduler import Priority, WorkScheduler
+
+
+async def _run(
+    scheduler: WorkScheduler,
+    order: list[str],
+    label: str,
+    priority: Priority,
+    *,
+    key: Hashable = None,
+    release: asyncio.Event | None = None,
+) -> None:
+    async with scheduler.slot(priority, key=key):
+        order.append(label)
+        if release is not None:
+            await release.wait()
+        else:
+            await asyncio.sleep(0)
+
+
+async def test_live_work_jumps_ahead_of_queued_batch_work() -> None:
+    scheduler = WorkScheduler(capacity=1)
+    order: list[str] = []
+    release = asyncio.Event()
+    blocker = asyncio.create_task(_run(scheduler, order, "blocker", Priority.LIVE, release=release))
+    await asyncio.sleep(0)
+
+    tasks = [
+        asyncio.create_task(_run(scheduler, order, "import", Priority.IMPORT)),
+        asyncio.create_task(_run(scheduler, order, "refresh", Priority.REFRESH)),
+        asyncio.create_task(_run(scheduler, order, "live", Priority.LIVE)),
+    ]
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(blocker, *tasks)
+
+    assert order == ["blocker", "live", "refresh", "import"]
+
+
+async def test_batch_cap_keeps_a_slot_free_for_live_work() -> None:
+    scheduler = WorkScheduler(capacity=2, limits={Priority.REFRESH: 1})
+    order: list[str] = []
+    release = asyncio.Event()
+    refreshes = [
+        asyncio.create_task(
+            _run(scheduler, order, f"refresh{i}", Priority.REFRESH, release=release)
+        )
+        for i in range(3)
+    ]
+    await asyncio.sleep(0)
+    assert order == ["refresh0"]  # capped at one even though two slots exist
+
+    await _run(scheduler, order, "live", Priority.LIVE)  # doesn't wait for batch work
+    assert order == ["refresh0", "live"]
+    stats = scheduler.stats()
+    assert stats["refresh"] == {"running": 1, "queued": 2, "admitted": 1, "limit": 1}
+
+    release.set()
+    await asyncio.gather(*refreshes)
+
+
+async def test_keys_within_a_class_are_served_round_robin() -> None:
+    scheduler = WorkScheduler(capacity=1)
+    order: list[str] = []
+    release = asyncio.Event()
+    blocker = asyncio.create_task(_run(scheduler, order, "blocker", Priority.LIVE, release=release))
+    await asyncio.sleep(0)
+
+    tasks = [
+        asyncio.create_task(_run(scheduler, order, f"{chat}{i}", Priority.LIVE, key=chat))
+        for chat, count in (("a", 3), ("b", 1), ("c", 1))
+        for i in range(count)
+    ]
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(blocker, *tasks)
+
+    assert order == ["blocker", "a0", "b0", "c0", "a1", "a2"]
+
+
+async def test_cancelled_waiter_gives_up_its_place() -> None:
+    scheduler = WorkScheduler(capacity=1)
+    order: list[str] = []
+    release = asyncio.Event()
+    blocker = asyncio.create_task(_run(scheduler, order, "blocker", Priority.LIVE, release=release))
+    await asyncio.sleep(0)
+    doomed = asyncio.create_task(_run(scheduler, order, "doomed", Priority.LIVE))
+    await asyncio.sleep(0)
+    doomed.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await doomed
+
+    release.set()
+    await blocker
+    await _run(scheduler, order, "after", Priority.LIVE)
+    assert order == ["blocker", "after"]
+    assert scheduler.stats()["live"] == {"running": 0, "queued": 0, "admitted": 2, "limit": 1}
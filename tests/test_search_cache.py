@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+import respx
+
+from banger_link.db.connection import Database
+from banger_link.db.repo import Repo
+from banger_link.services.fallback_resolver import ITunesSearchClient, YouTubeSearchClient
+from banger_link.services.search_cache import SearchCache, SearchTTL
+
+ITUNES = "https://itunes.apple.com/search"
+YOUTUBE = "https://www.googleapis.com/youtube/v3/search"
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1_700_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+async def repo(tmp_path: Path):
+    db = await Database(tmp_path / "test.db").connect()
+    try:
+        yield Repo(db)
+    finally:
+        await db.close()
+
+
+@pytest.fixture
+def clock() -> _Clock:
+    return _Clock()
+
+
+@pytest.fixture
+def cache(repo: Repo, clock: _Clock) -> SearchCache:
+    return SearchCache(
+        repo,
+        default_ttl=SearchTTL(positive=3600, negative=60),
+        platform_ttls={"youtube": SearchTTL(positive=7200, negative=600)},
+        clock=clock,
+    )
+
+
+@respx.mock
+async def test_hit_skips_the_request_across_spellings(cache: SearchCache) -> None:
+    route = respx.get(ITUNES).respond(
+        json={"results": [{"trackViewUrl": "https://music.apple.com/track/B"}]}
+    )
+    client = ITunesSearchClient(cache=cache)
+    try:
+        first = await client.search(title="Lust for Life", artist="Iggy Pop")
+        second = await client.search(title="Lust For Life (feat. Nobody)", artist="IGGY POP")
+    finally:
+        await client.aclose()
+    assert first == second == "https://music.apple.com/track/B"
+    assert route.call_count == 1
+    assert cache.stats() == {"hits": 1, "negative_hits": 0, "misses": 1}
+
+
+async def test_live_and_studio_titles_do_not_share_an_entry(cache: SearchCache) -> None:
+    await cache.put("spotify", title="Song - Live at Wembley", artist="A", url="https://x/live")
+    assert await cache.get("spotify", title="Song", artist="A") is None
+    await cache.put("spotify", title="Song", artist="A", url="https://x/studio")
+    live = await cache.get("spotify", title="Song - Live at Wembley", artist="A")
+    assert live is not None and live.url == "https://x/live"
+    assert await cache.get("spotify", title="Song (Remastered 2011)", artist="A") is None
+
+
+@respx.mock
+async def test_empty_results_are_cached_as_negative_until_they_expire(
+    cache: SearchCache, clock: _Clock
+) -> None:
+    route = respx.get(ITUNES).respond(json={"results": []})
+    client = ITunesSearchClient(cache=cache)
+    try:
+        assert await client.search(title="T", artist="A") is None
+        assert await client.search(title="T", artist="A") is None
+        assert route.call_count == 1
+        clock.now += 61
+        assert await client.search(title="T", artist="A") is None
+        assert route.call_count == 2
+    finally:
+        await client.aclose()
+    assert cache.stats()["negative_hits"] == 1
+
+
+@respx.mock
+async def test_failures_are_not_cached(cache: SearchCache) -> None:
+    route = respx.get(YOUTUBE).respond(status_code=403)  # quota exceeded
+    client = YouTubeSearchClient(api_key="dummy", cache=cache)
+    try:
+        assert await client.search(title="T", artist="A") is None
+        assert await client.search(title="T", artist="A") is None
+    finally:
+        await client.aclose()
+    assert route.call_count == 2
+
+
+async def test_ttls_are_per_platform(cache: SearchCache, clock: _Clock) -> None:
+    await cache.put("youtube", title="T", artist="A", url="https://youtu.be/x")
+    await cache.put("spotify", title="T", artist="A", url="https://open.spotify.com/track/x")
+    clock.now += 3601
+    assert await cache.get("spotify", title="T", artist="A") is None
+    hit = await cache.get("youtube", title="T", artist="A")
+    assert hit is not None and hit.url == "https://youtu.be/x"
+
+    clock.now += 3600
+    assert await cache.prune() == 2
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from banger_link.services.singleflight import SingleFlight
+
+
+async def test_concurrent_calls_share_one_execution() -> None:
+    flights: SingleFlight[str, int] = SingleFlight()
+    calls = 0
+    release = asyncio.Event()
+
+    async def work() -> int:
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return 42
+
+    waiters = [asyncio.create_task(flights.do("k", work)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+    assert await asyncio.gather(*waiters) == [42] * 5
+    assert calls == 1
+    assert flights.stats() == {"in_flight": 0, "started": 1, "coalesced": 4}
+
+
+async def test_errors_propagate_and_are_not_cached() -> None:
+    flights: SingleFlight[str, int] = SingleFlight()
+    attempts = 0
+
+    async def flaky() -> int:
+        nonlocal attempts
+        attempts += 1
+        await asyncio.sleep(0)
+        if attempts == 1:
+            raise RuntimeError("boom")
+        return 7
+
+    results = await asyncio.gather(
+        flights.do("k", flaky), flights.do("k", flaky), return_exceptions=True
+    )
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert await flights.do("k", flaky) == 7
+    assert attempts == 2
+
+
+async def test_cancelled_waiter_does_not_cancel_others() -> None:
+    flights: SingleFlight[str, str] = SingleFlight()
+    release = asyncio.Event()
+
+    async def work() -> str:
+        await release.wait()
+        return "done"
+
+    first = asyncio.create_task(flights.do("k", work))
+    second = asyncio.create_task(flights.do("k", work))
+    await asyncio.sleep(0)
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    release.set()
+    assert await second == "done"
+
+
+async def test_task_is_cancelled_once_every_waiter_leaves() -> None:
+    flights: SingleFlight[str, None] = SingleFlight()
+    cancelled = asyncio.Event()
+
+    async def work() -> None:
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    waiter = asyncio.create_task(flights.do("k", work))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+    await asyncio.sleep(0)
+    assert len(flights) == 0
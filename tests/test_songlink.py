@@ -1,10 +1,18 @@
 from __future__ import annotations
 
+import asyncio
+import json
+from collections.abc import Callable
+from pathlib import Path
+
 import httpx
 import pytest
 import respx
 
-from banger_link.services.songlink import SonglinkClient
+from banger_link.db.connection import Database
+from banger_link.db.repo import Repo
+from banger_link.services.resolution_cache import ResolutionCache
+from banger_link.services.songlink import SonglinkClient, _decode, _parse
 
 API = "https://api.song.link/v1-alpha.1/links"
 
@@ -109,6 +117,23 @@ async def test_resolve_skips_podcasts(client: SonglinkClient) -> None:
     assert result is None
 
 
+@respx.mock
+async def test_concurrent_resolves_of_same_url_share_one_request(client: SonglinkClient) -> None:
+    route = respx.get(API).respond(json=SAMPLE_PAYLOAD)
+    results = await asyncio.gather(
+        *(client.resolve("https://open.spotify.com/track/abc") for _ in range(4))
+    )
+    assert route.call_count == 1
+    assert all(r is not None and r.entity_id == "SPOTIFY_SONG::abc" for r in results)
+
+
+@respx.mock
+async def test_resolve_sends_canonical_url(client: SonglinkClient) -> None:
+    route = respx.get(API).respond(json=SAMPLE_PAYLOAD)
+    await client.resolve("https://open.spotify.com/intl-de/track/abc?si=share")
+    assert route.calls.last.request.url.params["url"] == "https://open.spotify.com/track/abc"
+
+
 def test_primary_link_prefers_display_order() -> None:
     from banger_link.services.songlink import ResolvedSong
 
@@ -121,3 +146,96 @@ def test_primary_link_prefers_display_order() -> None:
         platform_links={"deezer": "https://d", "spotify": "https://s"},
     )
     assert rs.primary_link() == "https://s"
+
+
+@respx.mock
+async def test_resolve_many_streams_results_and_skips_the_network_for_cache_hits(
+    tmp_path: Path,
+) -> None:
+    route = respx.get(API).mock(
+        side_effect=lambda request: (
+            httpx.Response(404)
+            if "missing" in str(request.url)
+            else httpx.Response(200, json=SAMPLE_PAYLOAD)
+        )
+    )
+    db = await Database(tmp_path / "test.db").connect()
+    try:
+        cache = ResolutionCache(Repo(db), ttl_seconds=3600, negative_ttl_seconds=60)
+        async with httpx.AsyncClient() as http:
+            client = SonglinkClient(client=http, cache=cache)
+            await client.resolve("https://open.spotify.com/track/cached")
+            urls = [
+                "https://open.spotify.com/track/a",
+                "https://open.spotify.com/track/missing",
+                "https://open.spotify.com/intl-de/track/cached?si=x",
+            ]
+            results = [pair async for pair in client.resolve_many(urls, concurrency=2)]
+    finally:
+        await db.close()
+
+    # The cache hit comes back first, keyed by the URL as given.
+    assert results[0][0] == "https://open.spotify.com/intl-de/track/cached?si=x"
+    by_url = dict(results)
+    assert by_url["https://open.spotify.com/track/a"] is not None
+    assert by_url["https://open.spotify.com/track/missing"] is None
+    assert route.call_count == 3  # one for the warm-up, two for the misses
+
+
+@respx.mock
+async def test_resolve_many_can_skip_the_cache(tmp_path: Path) -> None:
+    route = respx.get(API).mock(return_value=httpx.Response(200, json=SAMPLE_PAYLOAD))
+    db = await Database(tmp_path / "test.db").connect()
+    try:
+        cache = ResolutionCache(Repo(db), ttl_seconds=3600, negative_ttl_seconds=60)
+        async with httpx.AsyncClient() as http:
+            client = SonglinkClient(client=http, cache=cache)
+            url = "https://open.spotify.com/track/cached"
+            await client.resolve(url)
+            results = [pair async for pair in client.resolve_many([url], use_cache=False)]
+    finally:
+        await db.close()
+
+    assert results[0][1] is not None
+    assert route.call_count == 2
+
+
+def test_decode_matches_the_lenient_parser() -> None:
+    body = json.dumps(SAMPLE_PAYLOAD).encode()
+    assert _decode(body) == _parse(SAMPLE_PAYLOAD)
+
+
+def test_decode_falls_back_on_off_schema_payloads() -> None:
+    # A non-string thumbnail and a non-dict link fail the schema; the lenient
+    # walk still gets the song out of it.
+    payload = json.loads(json.dumps(SAMPLE_PAYLOAD))
+    payload["entitiesByUniqueId"]["SPOTIFY_SONG::abc"]["thumbnailUrl"] = 42
+    payload["linksByPlatform"]["tidal"] = "not-an-object"
+    song = _decode(json.dumps(payload).encode())
+    assert song is not None
+    assert song.thumbnail_url is None
+    assert "tidal" not in song.platform_links
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        lambda p: p["entitiesByUniqueId"].pop("SPOTIFY_SONG::abc"),
+        lambda p: p["entitiesByUniqueId"]["SPOTIFY_SONG::abc"].update(type="podcastEpisode"),
+        lambda p: p["entitiesByUniqueId"]["SPOTIFY_SONG::abc"].pop("title"),
+        lambda p: p.update(entityUniqueId=""),
+        lambda p: p.pop("linksByPlatform"),
+        lambda p: p.update(linksByPlatform={}, pageUrl=""),
+    ],
+)
+def test_decode_agrees_with_the_lenient_parser_on_edge_cases(
+    change: Callable[[dict], object],
+) -> None:
+    payload = json.loads(json.dumps(SAMPLE_PAYLOAD))
+    change(payload)
+    assert _decode(json.dumps(payload).encode()) == _parse(payload)
+
+
+def test_decode_rejects_non_json() -> None:
+    with pytest.raises(ValueError):
+        _decode(b"<html>oops</html>")
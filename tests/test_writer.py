@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+import aiosqlite
+import pytest
+
+from banger_link.db.writer import WriteOp, Writer, WriterClosed
+
+
+@pytest.fixture
+async def conn(tmp_path: Path) -> AsyncIterator[aiosqlite.Connection]:
+    conn = await aiosqlite.connect(tmp_path / "test.db")
+    await conn.execute("CREATE TABLE t (v INTEGER PRIMARY KEY)")
+    await conn.commit()
+    try:
+        yield conn
+    finally:
+        await conn.close()
+
+
+def _insert(value: int) -> WriteOp[int]:
+    async def op(conn: aiosqlite.Connection) -> int:
+        await conn.execute("INSERT INTO t (v) VALUES (?)", (value,))
+        return value
+
+    return op
+
+
+async def _committed(path: Path) -> list[int]:
+    # A second connection only sees what's been committed.
+    async with (
+        aiosqlite.connect(path) as other,
+        other.execute("SELECT v FROM t ORDER BY v") as cur,
+    ):
+        return [int(row[0]) for row in await cur.fetchall()]
+
+
+async def test_concurrent_writes_share_commits(conn: aiosqlite.Connection, tmp_path: Path) -> None:
+    writer = Writer(conn, max_batch=8)
+    results = await asyncio.gather(*(writer.submit(_insert(v)) for v in range(20)))
+    assert results == list(range(20))
+    assert await _committed(tmp_path / "test.db") == list(range(20))
+    # 20 writes queued at once: the first runs alone, the rest fill batches of 8.
+    assert writer.batches < 20
+    assert writer.largest_batch == 8
+    await writer.close()
+
+
+async def test_failed_write_fails_alone(conn: aiosqlite.Connection, tmp_path: Path) -> None:
+    writer = Writer(conn)
+    results = await asyncio.gather(
+        writer.submit(_insert(1)),
+        writer.submit(_insert(1)),  # duplicate key
+        writer.submit(_insert(2)),
+        return_exceptions=True,
+    )
+    assert results[0] == 1 and results[2] == 2
+    assert isinstance(results[1], sqlite3.IntegrityError)
+    assert await _committed(tmp_path / "test.db") == [1, 2]
+    assert writer.stats()["failed_ops"] == 1
+    await writer.close()
+
+
+async def test_transaction_block_commits_or_rolls_back(
+    conn: aiosqlite.Connection, tmp_path: Path
+) -> None:
+    writer = Writer(conn)
+    async with writer.transaction():
+        await conn.execute("INSERT INTO t (v) VALUES (1)")
+    with pytest.raises(ValueError):
+        async with writer.transaction():
+            await conn.execute("INSERT INTO t (v) VALUES (2)")
+            raise ValueError("boom")
+    async with writer.transaction():
+        await conn.execute("INSERT INTO t (v) VALUES (3)")
+    assert await _committed(tmp_path / "test.db") == [1, 3]
+    await writer.close()
+
+
+async def test_caller_cancelled_while_queued_does_not_stall_the_writer(
+    conn: aiosqlite.Connection, tmp_path: Path
+) -> None:
+    writer = Writer(conn)
+    release = asyncio.Event()
+
+    async def slow(conn: aiosqlite.Connection) -> None:
+        await release.wait()
+
+    blocker = asyncio.create_task(writer.submit(slow))
+
+    async def hold_and_write() -> None:
+        async with writer.transaction():
+            await conn.execute("INSERT INTO t (v) VALUES (1)")
+
+    queued = asyncio.create_task(hold_and_write())
+    await asyncio.sleep(0.01)
+    queued.cancel()
+    release.set()
+    await blocker
+    assert await writer.submit(_insert(2)) == 2
+    assert await _committed(tmp_path / "test.db") == [2]
+    await writer.close()
+
+
+async def test_latency_holds_the_batch_open_for_stragglers(conn: aiosqlite.Connection) -> None:
+    writer = Writer(conn, max_latency=0.05)
+    first = asyncio.create_task(writer.submit(_insert(1)))
+    await asyncio.sleep(0.01)
+    await asyncio.gather(first, writer.submit(_insert(2)))
+    assert writer.batches == 1
+    await writer.close()
+
+
+async def test_close_runs_what_is_queued_then_refuses(conn: aiosqlite.Connection) -> None:
+    writer = Writer(conn)
+    pending = asyncio.create_task(writer.submit(_insert(1)))
+    await asyncio.sleep(0)
+    await writer.close()
+    assert await pending == 1
+    with pytest.raises(WriterClosed):
+        await writer.submit(_insert(2))